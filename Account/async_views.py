@@ -0,0 +1,17 @@
+# Account/async_views.py
+from django.views.decorators.http import require_GET
+
+from Data.async_views import body_param, gather_named, json_response, not_authenticated, read_replica
+from .views import top_attendance_payload, top_attendance_queries
+
+
+@require_GET
+@read_replica
+async def top_attendance(request):
+    """GET /accounts/async/users/top_attendance/ - see UserViewSet.top_attendance"""
+    if not request.user.is_authenticated:
+        return not_authenticated()
+
+    max_users = int(body_param(request, 'max_users', 5))
+    results = await gather_named(top_attendance_queries(max_users))
+    return json_response(top_attendance_payload(results))
@@ -0,0 +1,209 @@
+"""
+Per-request SQL and serializer instrumentation.
+
+QueryInstrumentationMiddleware (Account.middleware) profiles a sample of
+requests.  For a sampled request it installs a RequestProfile on every
+database connection with connection.execute_wrapper() and records:
+
+  * the number of queries and the time spent executing them;
+  * a fingerprint of each statement (numbers and IN lists collapsed), so a
+    statement repeated DUPLICATE_THRESHOLD or more times is reported as a
+    likely N+1;
+  * the time spent in serializer.data, including the queries it triggers.
+
+The numbers go out as a Server-Timing header (visible in the browser's
+network panel), a JSON log line on the Account.instrumentation logger, and
+per-endpoint totals kept per process, see GET /accounts/query-profile/.
+Unsampled requests run untouched.  Queries that async views send to worker
+threads (Data.async_views.gather_queries) run on other connections and are
+not counted.
+
+    QUERY_INSTRUMENTATION = {
+        'ENABLED': True,
+        'SAMPLE_RATE': 0.05,
+        'DUPLICATE_THRESHOLD': 5,
+        'SERVER_TIMING': True,
+    }
+"""
+import contextvars
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 0.05, # fraction of requests profiled
+    'DUPLICATE_THRESHOLD': 5, # runs of one statement reported as an N+1
+    'SERVER_TIMING': True,
+}
+
+_IN_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_active_profile = contextvars.ContextVar('request_profile', default=None)
+
+
+def instrumentation_config():
+    return {**DEFAULTS, **getattr(settings, 'QUERY_INSTRUMENTATION', {})}
+
+
+def fingerprint(sql):
+    """The statement with its literal numbers and IN lists collapsed."""
+    return _NUMBER.sub('N', _IN_LIST.sub('(%s...)', sql))
+
+
+class RequestProfile:
+    """Query and serializer timings of one request; an execute_wrapper."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.fingerprints = Counter()
+        self._in_serializer = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self, threshold):
+        """(fingerprint, runs) of the statements repeated at least `threshold` times, most repeated first."""
+        return [(sql, runs) for sql, runs in self.fingerprints.most_common() if runs >= threshold]
+
+    def activate(self):
+        return _active_profile.set(self)
+
+    def deactivate(self, token):
+        _active_profile.reset(token)
+
+
+def _timed_data(data):
+    def wrapper(self):
+        profile = _active_profile.get()
+        if profile is None or profile._in_serializer:
+            return data.fget(self)
+        profile._in_serializer = True
+        started = time.perf_counter()
+        try:
+            return data.fget(self)
+        finally:
+            profile.serializer_time += time.perf_counter() - started
+            profile._in_serializer = False
+    wrapper.timed = True
+    return property(wrapper, doc=data.__doc__)
+
+
+def install_serializer_timing():
+    """Time serializer.data of the outermost serializer while a profile is active."""
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        data = cls.__dict__['data']
+        if not getattr(data.fget, 'timed', False):
+            cls.data = _timed_data(data)
+
+
+def server_timing(profile, total, threshold):
+    metrics = [
+        f'db;dur={profile.sql_time * 1000:.1f};desc="{profile.queries} queries"',
+        f'serializer;dur={profile.serializer_time * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ]
+    duplicates = profile.duplicates(threshold)
+    if duplicates:
+        metrics.append(f'dup;desc="{len(duplicates)} repeated statements, max {duplicates[0][1]} runs"')
+    return ', '.join(metrics)
+
+
+def log_profile(endpoint, request, response, profile, total, threshold):
+    duplicates = profile.duplicates(threshold)
+    record = {
+        'endpoint': endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(total * 1000, 2),
+        'queries': profile.queries,
+        'sql_ms': round(profile.sql_time * 1000, 2),
+        'serializer_ms': round(profile.serializer_time * 1000, 2),
+        'duplicates': [{'sql': sql[:300], 'runs': runs} for sql, runs in duplicates[:5]],
+    }
+    logger.log(logging.WARNING if duplicates else logging.INFO, json.dumps(record))
+
+
+class EndpointStats:
+    """Per-process totals of the sampled requests, keyed by endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def add(self, endpoint, profile, total, threshold):
+        duplicates = profile.duplicates(threshold)
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, {
+                'requests': 0, 'total_ms': 0.0, 'sql_ms': 0.0, 'serializer_ms': 0.0,
+                'queries': 0, 'max_queries': 0, 'duplicate_requests': 0, 'worst_duplicate': None,
+            })
+            stats['requests'] += 1
+            stats['total_ms'] += total * 1000
+            stats['sql_ms'] += profile.sql_time * 1000
+            stats['serializer_ms'] += profile.serializer_time * 1000
+            stats['queries'] += profile.queries
+            stats['max_queries'] = max(stats['max_queries'], profile.queries)
+            if duplicates:
+                stats['duplicate_requests'] += 1
+                sql, runs = duplicates[0]
+                if stats['worst_duplicate'] is None or runs > stats['worst_duplicate']['runs']:
+                    stats['worst_duplicate'] = {'sql': sql[:300], 'runs': runs}
+
+    def summary(self):
+        """Averages per endpoint, the most SQL time first."""
+        with self._lock:
+            endpoints = [(endpoint, dict(stats)) for endpoint, stats in self._endpoints.items()]
+        rows = []
+        for endpoint, stats in endpoints:
+            requests = stats['requests']
+            rows.append({
+                'endpoint': endpoint,
+                'requests': requests,
+                'avg_ms': round(stats['total_ms'] / requests, 2),
+                'avg_queries': round(stats['queries'] / requests, 1),
+                'max_queries': stats['max_queries'],
+                'avg_sql_ms': round(stats['sql_ms'] / requests, 2),
+                'avg_serializer_ms': round(stats['serializer_ms'] / requests, 2),
+                'total_sql_ms': round(stats['sql_ms'], 2),
+                'duplicate_requests': stats['duplicate_requests'],
+                'worst_duplicate': stats['worst_duplicate'],
+            })
+        return sorted(rows, key=lambda row: row['total_sql_ms'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+endpoint_stats = EndpointStats()
+
+
+def should_sample(config):
+    return config['ENABLED'] and random.random() < config['SAMPLE_RATE']
+
+
+@receiver(setting_changed)
+def reset_endpoint_stats(setting, **kwargs):
+    if setting == 'QUERY_INSTRUMENTATION':
+        endpoint_stats.clear()
@@ -1,8 +1,16 @@
+import time
+from contextlib import ExitStack
 from datetime import timedelta
 from django.utils import timezone
 from django.conf import settings
+from django.db import connections
 from rest_framework.authtoken.models import Token
 
+from .instrumentation import (
+    RequestProfile, endpoint_stats, install_serializer_timing, instrumentation_config, log_profile,
+    server_timing, should_sample,
+)
+
 class TokenRenewalMiddleware:
     """
     Middleware to automatically renew tokens when they're about to expire
@@ -26,4 +34,40 @@ class TokenRenewalMiddleware:
                 token.created = timezone.now()
                 token.save()
         
-        return response
\ No newline at end of file
+        return response
+
+class QueryInstrumentationMiddleware:
+    """
+    Profile a sample of requests: query count, SQL time, repeated statements
+    and serializer time (see Account.instrumentation).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_serializer_timing()
+
+    def __call__(self, request):
+        config = instrumentation_config()
+        if not should_sample(config):
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = profile.activate()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            profile.deactivate(token)
+        total = time.perf_counter() - started
+
+        match = request.resolver_match
+        endpoint = f'{request.method} {match.view_name if match else "unresolved"}'
+        threshold = config['DUPLICATE_THRESHOLD']
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = server_timing(profile, total, threshold)
+        log_profile(endpoint, request, response, profile, total, threshold)
+        endpoint_stats.add(endpoint, profile, total, threshold)
+        return response
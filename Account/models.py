@@ -9,6 +9,8 @@ class User(AbstractUser):
     gender = models.CharField(max_length=10, default='Male')
     occupation = models.CharField(max_length=128, default='Student')
     profile_picture = models.ImageField(upload_to='profile_pictures', null=True, blank=True)
+    profile_picture_digest = models.CharField(max_length=64, blank=True, default='', editable=False,
+                                              db_index=True) # Data.thumbnails
     is_admin = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     logged_in_times = models.PositiveIntegerField(default=0)
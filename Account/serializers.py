@@ -1,22 +1,42 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework.validators import UniqueValidator
+from Data.fieldsets import SparseFieldsetMixin
+from Data.thumbnails import ImageVariantsField
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer): 
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer): 
     class Meta:
         model = User
         fields = ('id', 'phone_number', 'username', 'profile_picture', 'gender', 'occupation', 'is_admin', 'fname', 
                   'lname', 'divisions', 'is_active', 'logged_in_times')
-        
-    
-    
+
+
+class MembershipSerializer(serializers.Serializer):
+    """What a session needs to know about one of the user's divisions"""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    role = serializers.CharField()
+    userRole = serializers.CharField()
+    is_active = serializers.BooleanField()
+
+
+class SessionUserSerializer(UserSerializer):
+    """The login / refresh / users/me payload (Account.session)"""
+    MEMBERSHIP_FIELDS = ('id', 'name', 'role', 'userRole', 'is_active')
+
+    memberships = MembershipSerializer(source='divisions', many=True, read_only=True)
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ('memberships',)
+
+
 
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, min_length=4)
     username = serializers.CharField(required=True)
-    divisions = serializers.SerializerMethodField()
+    divisions = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
 
     class Meta:
         model = User
@@ -61,25 +81,15 @@ class UserCreateSerializer(serializers.ModelSerializer):
         if divisions:
             user.divisions.set(divisions)
         return user
-        
-    def get_divisions(self, obj):
-        """Safely handle divisions for different user types"""
-        if not isinstance(obj, User) or obj.is_anonymous:
-            return []
-            
-        from Data.serializers import DivisionDetailSerializer
-        return DivisionDetailSerializer(
-            obj.divisions.all(),
-            many=True,
-            context=self.context
-        ).data
-    
-    
-    
-class PublicUserSerializer(serializers.ModelSerializer):
+
+
+class PublicUserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    profile_picture_variants = ImageVariantsField('profile_picture')
+
     class Meta:
         model = User
-        fields = ('id', 'username', 'fname', 'lname', 'divisions', 'is_admin', 'is_active', 'profile_picture')
+        fields = ('id', 'username', 'fname', 'lname', 'divisions', 'is_admin', 'is_active', 'profile_picture',
+                  'profile_picture_variants')
         read_only_fields = ('username', 'fname', 'lname', 'divisions')
    
    
@@ -0,0 +1,112 @@
+"""
+Compact, cached session payload.
+
+Login, signup, token refresh and GET users/me/ return the user's own
+columns plus a summary of each division they belong to,
+
+    "memberships": [{"id": 3, "name": "Brass", "role": "Senior", "userRole": "Member", "is_active": true}]
+
+rather than anything about the divisions' venues, attendance or ratings:
+clients load those from /divisions/<id>/ and
+/divisions/user/<id>/venues/ when a screen needs them.
+
+The payload is cached per user in SESSION_CACHE['CACHE_ALIAS'], so a token
+refresh normally renders it without loading the divisions.  Each user has a version key;
+Account.signals calls invalidate_session() when the user, their
+memberships or one of their divisions changes, which replaces the version
+when the transaction commits (as Data.caching does), so a request racing
+the write can't leave a stale payload behind.  The cache has to be shared
+by every process and not the DatabaseCache (Database/caches.py);
+otherwise payloads are rendered on every call.  Nothing should
+trust a cached payload to authorize anything; RefreshTokenView reads
+is_active from the database.
+
+    SESSION_CACHE = {
+        'ENABLED': True,
+        'CACHE_ALIAS': 'default',
+        'TIMEOUT': 3600,
+    }
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Prefetch
+
+from Database.caches import saves_queries
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 3600,
+}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'SESSION_CACHE', {})}
+
+
+def _cache():
+    return caches[_config()['CACHE_ALIAS']]
+
+
+def is_enabled():
+    config = _config()
+    return config['ENABLED'] and saves_queries(config['CACHE_ALIAS'])
+
+
+def _version_key(user_id):
+    return f'session:v:{user_id}'
+
+
+def _payload_key(user_id):
+    return f'session:{user_id}'
+
+
+def render_session(user_id):
+    """The payload of `user_id` from the database (two queries), or None when there is no such user."""
+    from Data.models import Division
+    from .serializers import SessionUserSerializer
+
+    memberships = Division.objects.only(*SessionUserSerializer.MEMBERSHIP_FIELDS).order_by('name', 'pk')
+    user = (
+        get_user_model().objects.filter(pk=user_id)
+        .prefetch_related(Prefetch('divisions', queryset=memberships)).first()
+    )
+    return None if user is None else SessionUserSerializer(user).data
+
+
+def session_payload(user_id):
+    """The cached payload of `user_id`, rendered on a miss. None when there is no such user."""
+    if not is_enabled():
+        return render_session(user_id)
+    config = _config()
+
+    cache = _cache()
+    cached = cache.get_many([_version_key(user_id), _payload_key(user_id)])
+    version = cached.get(_version_key(user_id))
+    entry = cached.get(_payload_key(user_id))
+    if version is not None and entry is not None and entry[0] == version:
+        return entry[1]
+
+    if version is None:
+        version = uuid.uuid4().hex
+        # add(): a concurrent invalidation wins over this first version
+        if not cache.add(_version_key(user_id), version, timeout=None):
+            version = cache.get(_version_key(user_id))
+    payload = render_session(user_id)
+    if payload is not None:
+        cache.set(_payload_key(user_id), (version, dict(payload)), timeout=config['TIMEOUT'])
+    return payload
+
+
+def invalidate_session(*user_ids, using=None):
+    """Expire the cached payloads of these users when the transaction commits."""
+    if not user_ids or not is_enabled():
+        return
+
+    def bump():
+        _cache().set_many({_version_key(user_id): uuid.uuid4().hex for user_id in user_ids}, timeout=None)
+    transaction.on_commit(bump, using=using)
@@ -1,9 +1,12 @@
 # accounts/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
 
+from Data.models import Division
+from .session import invalidate_session
+
 User = get_user_model()
 
 @receiver(post_save, sender=User)
@@ -12,4 +15,32 @@ def create_auth_token(sender, instance=None, created=False, **kwargs):
     Create a Token for a newly created User
     """
     if created:
-        Token.objects.create(user=instance)
\ No newline at end of file
+        Token.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def expire_session_payload(sender, instance, using, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which the payload doesn't render
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_session(instance.pk, using=using)
+
+
+@receiver(m2m_changed, sender=User.divisions.through)
+def expire_session_payload_on_membership(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse: # user.divisions.add(...)
+        invalidate_session(instance.pk, using=using)
+    elif action == 'pre_clear': # division.users.clear(): the members are still there to be found
+        invalidate_session(*instance.users.values_list('pk', flat=True), using=using)
+    else:
+        invalidate_session(*pk_set, using=using)
+
+
+@receiver(post_save, sender=Division)
+@receiver(pre_delete, sender=Division)
+def expire_member_session_payloads(sender, instance, using, **kwargs):
+    """Members' payloads show the division's name and role"""
+    invalidate_session(*instance.users.using(using).values_list('pk', flat=True), using=using)
@@ -1,3 +1,118 @@
-from django.test import TestCase
+import json
+from datetime import date, time
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from Data.models import Division, Feedback, PendingRequest, Venue
+from .instrumentation import endpoint_stats, fingerprint
+
+User = get_user_model()
+
+SAMPLE_ALL = {'ENABLED': True, 'SAMPLE_RATE': 1.0, 'DUPLICATE_THRESHOLD': 5, 'SERVER_TIMING': True}
+
+
+@override_settings(QUERY_INSTRUMENTATION=SAMPLE_ALL, RESPONSE_CACHE={'ENABLED': False})
+class QueryInstrumentationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', password='secret', fname='Ann', lname='Lee',
+                                              is_admin=True)
+        for index in range(6):
+            Feedback.objects.create(user=self.admin, title=f'Feedback {index}', highlighted_title='Well done')
+        self.client.force_login(self.admin)
+        endpoint_stats.clear()
+
+    def test_fingerprint_collapses_literals(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 21'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) LIMIT 5'),
+        )
+
+    def test_sampled_request_reports_timings_and_repeated_statements(self):
+        with self.assertLogs('Account.instrumentation', level='INFO') as logs:
+            response = self.client.get('/feedbacks/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", serializer;dur=[\d.]+')
+        self.assertIn('dup;desc=', response['Server-Timing'])
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(record['endpoint'], 'GET feedback-list')
+        self.assertGreaterEqual(record['duplicates'][0]['runs'], 5)
+
+        summary = self.client.get('/accounts/query-profile/').json()
+        feedback = next(row for row in summary if row['endpoint'] == 'GET feedback-list')
+        self.assertEqual(feedback['requests'], 1)
+        self.assertEqual(feedback['duplicate_requests'], 1)
+
+    def test_unsampled_requests_are_untouched(self):
+        with self.settings(QUERY_INSTRUMENTATION={**SAMPLE_ALL, 'SAMPLE_RATE': 0}):
+            response = self.client.get('/feedbacks/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(endpoint_stats.summary(), [])
+
+    def test_summary_is_admin_only(self):
+        member = User.objects.create_user(username='member', password='secret')
+        self.client.force_login(member)
+        self.assertEqual(self.client.get('/accounts/query-profile/').status_code, 403)
+
+
+class SessionPayloadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret', fname='Ann', lname='Lee')
+        self.brass = Division.objects.create(name='Brass', role='Senior')
+        self.user.divisions.add(self.brass)
+        venue = Venue.objects.create(date=date.today(), startTime=time(9))
+        PendingRequest.objects.create(venue=venue, division=self.brass, user=self.user)
+
+    def login(self):
+        response = self.client.post('/accounts/login/', {'username': 'member', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['user']
+
+    def test_login_returns_memberships_only(self):
+        user = self.login()
+        self.assertEqual(user['divisions'], [self.brass.id])
+        self.assertEqual(user['memberships'], [
+            {'id': self.brass.id, 'name': 'Brass', 'role': 'Senior', 'userRole': 'Member', 'is_active': True},
+        ])
+        self.assertEqual(user['logged_in_times'], 1)
+
+    def test_refresh_is_served_from_the_cached_payload(self):
+        self.login()
+        del self.client.cookies['access_token'] # expired by the time clients refresh
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/accounts/refresh-token/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['memberships'][0]['name'], 'Brass')
+        # Only the is_active check reads the user
+        self.assertEqual(len([query for query in queries if 'FROM "Account_user"' in query['sql']]), 1)
+        self.assertFalse([query for query in queries if 'FROM "Data_division"' in query['sql']])
+
+    def test_refresh_checks_is_active_in_the_database(self):
+        self.login()
+        # No signals, so the cached payload still says active
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.post('/accounts/refresh-token/').status_code, 401)
+
+    def test_changes_expire_the_payload(self):
+        self.login()
+        self.brass.name = 'Wind'
+        # Payloads are expired when the writes commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brass.save()
+            choir = Division.objects.create(name='Choir', role='Junior')
+            choir.users.add(self.user)
+        response = self.client.post('/accounts/refresh-token/')
+        self.assertEqual([row['name'] for row in response.json()['user']['memberships']], ['Choir', 'Wind'])
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get('/accounts/users/me/').json()['divisions'], [choir.id, self.brass.id])
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.post('/accounts/refresh-token/').status_code, 401)
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (UserViewSet, PublicUserViewSet, SignupView, LoginView, ManageUserView, LogoutView, 
-    RefreshTokenView, get_csrf_token)
+    RefreshTokenView, QueryProfileView, get_csrf_token)
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -14,5 +15,7 @@ urlpatterns = [
     path('users/me/', ManageUserView.as_view(), name='current-user'),
     path('refresh-token/', RefreshTokenView.as_view(), name='refresh-token'),
     path('csrf-token/', get_csrf_token, name='csrf-token'),
+    path('query-profile/', QueryProfileView.as_view(), name='query-profile'),
+    path('async/users/top_attendance/', async_views.top_attendance, name='async-top-attendance'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -9,25 +9,56 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from .serializers import UserSerializer, UserCreateSerializer, PublicUserSerializer, AuthTokenSerializer
 from rest_framework.decorators import action
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.conf import settings
 from django.contrib.auth import get_user_model, login, logout
 from django.conf import settings
 from rest_framework.authtoken.views import ObtainAuthToken
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.db.models import Sum, Value
-from django.db.models.functions import Coalesce
 
 from django.views.decorators.csrf import ensure_csrf_cookie
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from Tokens.blacklist import RefreshToken
 from django.middleware.csrf import get_token
+from Tokens.usercache import invalidate_user
+from Data.caching import cache_response
+from Database.replicas import read_replica
+from Data.leaderboard import rank as user_rank, top as top_users
+from Data.models import AttendanceRollup, LeaderboardScore
+from Data.rollups import rollup_totals
+from .instrumentation import endpoint_stats
+from .session import session_payload
 import logging
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
+
+def top_attendance_queries(max_users):
+    """The independent queries of UserViewSet.top_attendance (shared with Account.async_views)."""
+    # Each user is credited with their own approved requests (Data.leaderboard),
+    # the band totals come from the attendance rollup
+    return {
+        'top': lambda: [{
+            'name': entry['name'],
+            'total_attendance': entry['attended']
+        } for entry in top_users(max_users)],
+        'totals': lambda: rollup_totals(AttendanceRollup.objects.all()),
+        'active_users': lambda: User.objects.filter(is_active=True).count(),
+    }
+
+
+def top_attendance_payload(results):
+    totals = results['totals']
+    return {
+        'top': results['top'],
+        'attendance': totals['attended'],
+        'sessions': totals['sessions'] + totals['absent_sessions'],
+        'active_users': results['active_users'],
+    }
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -97,37 +128,37 @@ class UserViewSet(viewsets.ModelViewSet):
         return Response({'sucess': False})
     
     @action(detail=False, methods=['get'])
+    @read_replica
+    @cache_response(User, LeaderboardScore, AttendanceRollup)
     def top_attendance(self, request):
         max_users = int(request.data.get('max_users', 5))
-        
-        # Get top users with total attendance annotation
-        top_users = User.objects.annotate(
-            total_attendance=Coalesce(Sum('divisions__attendance__attendance'), Value(0))
-        ).order_by('-total_attendance')[:max_users]
-        
-        # Get all user stats with proper annotations
-        all_user_stat = User.objects.annotate(
-            attendance=Coalesce(Sum('divisions__attendance__attendance'), Value(0)),
-            sessions=Coalesce(Sum('divisions__attendance__sessions'), Value(0)),
-            absent=Coalesce(Sum('divisions__absent__sessions'), Value(0))
-        )  # Removed incorrect ordering
-        
-        # Calculate totals using aggregate instead of looping
-        totals = all_user_stat.aggregate(
-            total_attendance=Sum('attendance'),
-            total_sessions=Sum('sessions'),
-            total_absent=Sum('absent')
-        )
-        
-        return Response({
-            'top': [{
-                'name': f'{user.fname[0]}. {user.lname}',
-                'total_attendance': user.total_attendance
-            } for user in top_users],
-            'attendance': totals['total_attendance'] or 0,
-            'sessions': (totals['total_sessions'] or 0) + (totals['total_absent'] or 0),
-            'active_users': User.objects.filter(is_active=True).count(),
-        })
+        results = {name: query() for name, query in top_attendance_queries(max_users).items()}
+        return Response(top_attendance_payload(results))
+
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        """
+        GET /users/leaderboard/?window=all|month|range&limit=10
+        month takes ?month=YYYY-MM (default: this month), range ?startDate=&endDate=
+        """
+        params = request.query_params
+        window = params.get('window', 'all')
+        try:
+            limit = max(1, min(int(params.get('limit', 10)), 100))
+            if window == 'month' and params.get('month'):
+                start, end = datetime.strptime(params['month'], '%Y-%m').date(), None
+            else:
+                start = datetime.strptime(params['startDate'], '%Y-%m-%d').date() if params.get('startDate') else None
+                end = datetime.strptime(params['endDate'], '%Y-%m-%d').date() if params.get('endDate') else None
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD (month: YYYY-MM).'}, status=400)
+
+        try:
+            top = top_users(limit, window, start, end)
+            me = user_rank(request.user.pk, window, start, end)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        return Response({'window': window, 'top': top, 'me': me})
     
 class PublicUserViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
@@ -220,11 +251,9 @@ class SignupView(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Refresh user to include is_admin changes
+        # Rendered from the database, so it includes the is_admin change
         user = serializer.instance
-        user.refresh_from_db()
-
-        response =  Response({ 'user': UserSerializer(user, context=self.get_serializer_context()).data })
+        response =  Response({ 'user': session_payload(user.pk) })
         return set_auth_cookies(response, user, request)
         
         
@@ -246,7 +275,7 @@ class LoginView(ObtainAuthToken):
             user.logged_in_times += 1
             user.save(update_fields=['logged_in_times'])
 
-        response = Response({ 'user': UserSerializer(user).data})
+        response = Response({ 'user': session_payload(user.pk) })
         return set_auth_cookies(response, user, request)
         
 
@@ -264,6 +293,7 @@ class LogoutView(APIView):
                 token.blacklist()
         except Exception as e:
             logger.error(f"Error blacklisting token: {str(e)}")
+        invalidate_user(request.user.pk)
         
         response = Response({'message': 'Logout successful'})
         
@@ -298,19 +328,24 @@ class RefreshTokenView(APIView):
                 if not user_id:
                     raise TokenError("Invalid token payload")
                 
-                # Import User model here to avoid circular imports
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                user = User.objects.get(id=user_id)
+                # is_active from the database, the rest from the cached session payload
+                if not User.objects.filter(pk=user_id, is_active=True).exists():
+                    raise TokenError("User not found or inactive")
+                payload = session_payload(user_id)
+                if payload is None:
+                    raise TokenError("User not found or inactive")
+
+                if jwt_settings.ROTATE_REFRESH_TOKENS and jwt_settings.BLACKLIST_AFTER_ROTATION:
+                    refresh.blacklist()
                 
                 # Create response with user data
                 response = Response({
                     'message': 'Token refreshed successfully',
-                    'user': UserSerializer(user).data
+                    'user': payload
                 })
                 
-                # Set new tokens in cookies
-                return set_auth_cookies(response, user, request)
+                # Set new tokens in cookies; only the user's pk goes into them
+                return set_auth_cookies(response, User(pk=user_id), request)
                 
             except (TokenError, InvalidToken) as e:
                 logger.warning(f"Invalid refresh token: {str(e)}")
@@ -331,6 +366,22 @@ class RefreshTokenView(APIView):
                 status=500
             )
         
+class QueryProfileView(APIView):
+    """Per endpoint query and timing averages of the requests this worker sampled (admins only)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_admin:
+            return Response({'detail': 'Only admins can view query profiles.'}, status=403)
+        return Response(endpoint_stats.summary())
+
+    def delete(self, request):
+        if not request.user.is_admin:
+            return Response({'detail': 'Only admins can reset query profiles.'}, status=403)
+        endpoint_stats.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
@@ -339,10 +390,12 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         """Retrieve and return authenticated user"""
         return self.request.user
- 
-    def get_object(self):
-        """Retrieve and return authenticated user"""
-        return self.request.user
+
+    def retrieve(self, request, *args, **kwargs):
+        # ?fields= / ?expand= trim the serializer; the cached payload is the full one
+        if 'fields' in request.query_params or 'expand' in request.query_params:
+            return super().retrieve(request, *args, **kwargs)
+        return Response(session_payload(request.user.pk))
     
     
     
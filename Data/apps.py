@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class DataConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'Data'
\ No newline at end of file
+    name = 'Data'
+    
+    def ready(self):
+        import Data.signals
+        import Database.checks
@@ -0,0 +1,205 @@
+"""
+Async (ASGI) read path for the heaviest GET endpoints.
+
+Plain Django async views returning the same payloads as their DRF actions:
+
+    /async/divisions/user/stat/                         DivisionViewSet.get_user_divisions_details
+    /async/divisions/get_all_users_divisions_details/   DivisionViewSet.get_all_users_divisions_details
+    /async/divisions/user/<user_id>/venues/             DivisionViewSet.user_venues
+    /async/attendances/monthly_attendance/              AttendanceViewSet.monthly_attendance
+    /accounts/async/users/top_attendance/               UserViewSet.top_attendance (Account.async_views)
+
+Served by uvicorn workers a slow stats query parks a coroutine instead of
+blocking a whole worker:
+
+    gunicorn Database.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+They reuse the sync endpoints' service functions in Data.views, and
+@read_replica routes their reads like the sync handlers'.  The independent
+queries of one request go through gather_queries(), which runs them
+concurrently on a small, process-wide thread pool (ASYNC_QUERY_THREADS).
+The pool's threads keep their database connections between requests, with
+CONN_MAX_AGE and the health checks applied as for request threads.
+`manage.py benchmark_read_path` compares both paths at equal worker counts.
+"""
+import asyncio
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+
+from Database.replicas import reading, replica_for
+from Tokens.authentication import JWTAuthFromCookie
+from .models import Division
+from .views import (
+    all_users_stat_payload, all_users_stat_queries, date_range, monthly_attendance_data,
+    user_stat_divisions, user_stat_payload, user_stat_queries, user_venues_data,
+)
+
+User = get_user_model()
+
+
+def json_response(data, status=200, headers=None):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json',
+                        headers=headers)
+
+
+def not_authenticated():
+    # Same answer as DRF's IsAuthenticated behind JWTAuthFromCookie
+    return json_response({'detail': 'Authentication credentials were not provided.'}, status=401,
+                         headers={'WWW-Authenticate': 'Bearer'})
+
+
+def not_found(model):
+    return json_response({'detail': f'No {model._meta.object_name} matches the given query.'}, status=404)
+
+
+async def authenticate(request):
+    """The user DRF would resolve: the JWT access cookie first, then the session."""
+    raw_token = request.COOKIES.get('access_token')
+    if raw_token:
+        auth = JWTAuthFromCookie()
+        try:
+            token = auth.get_validated_token(raw_token)
+            return await sync_to_async(auth.get_user)(token)
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            pass
+    return await request.auser()
+
+
+def body_param(request, name, default):
+    """What request.data.get(name, default) gives the DRF GET handlers."""
+    if request.body and request.content_type == 'application/json':
+        try:
+            return json.loads(request.body).get(name, default)
+        except (ValueError, AttributeError):
+            return default
+    return default
+
+
+def read_replica(view):
+    """
+    Database.replicas.read_replica for these views: reads go to the replica
+    unless the user is pinned to the primary.  Sets request.user.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await authenticate(request)
+        with reading(await sync_to_async(replica_for)(request.user)):
+            return await view(request, *args, **kwargs)
+    return wrapper
+
+
+_executor = None
+
+
+def query_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'ASYNC_QUERY_THREADS', 4), thread_name_prefix='async-query'
+        )
+    return _executor
+
+
+def _run_query(func):
+    # What request_started / request_finished do for request threads: reuse the
+    # thread's connection, but not past CONN_MAX_AGE or once it's broken
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def gather_queries(*funcs):
+    """
+    Run independent sync ORM callables concurrently on the query_executor()
+    threads, in copies of the caller's context (so @read_replica applies).
+    Inside a transaction (e.g. a TestCase) they run one after another on the
+    request's connection, so they see its writes.
+    """
+    in_transaction = await sync_to_async(lambda: connection.in_atomic_block)()
+    if in_transaction or not getattr(settings, 'ASYNC_CONCURRENT_QUERIES', True):
+        return [await sync_to_async(func)() for func in funcs]
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(
+        loop.run_in_executor(query_executor(), contextvars.copy_context().run, _run_query, func) for func in funcs
+    ))
+
+
+async def gather_named(queries):
+    """gather_queries() for {name: callable}, as {name: result}."""
+    return dict(zip(queries, await gather_queries(*queries.values())))
+
+
+@require_GET
+@read_replica
+async def user_divisions_details(request):
+    """GET /async/divisions/user/stat/ - see DivisionViewSet.get_user_divisions_details"""
+    params = request.GET
+    user_id = params.get('userId')
+
+    target_user = None
+    if user_id is not None and user_id != 'all':
+        target_user = await User.objects.filter(id=user_id).afirst()
+        if target_user is None:
+            return not_found(User)
+    user_divisions = user_stat_divisions(target_user, params.get('divId'))
+
+    try:
+        start, end = date_range(params)
+    except ValueError:
+        return json_response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=400)
+
+    with_divisions = params.get('divisions', 'true').lower() != 'false'
+    results = await gather_named(user_stat_queries(target_user, user_divisions, start, end, with_divisions))
+    return json_response(user_stat_payload(results, start, end))
+
+
+@require_GET
+@read_replica
+async def all_users_divisions_details(request):
+    """GET /async/divisions/get_all_users_divisions_details/ - see DivisionViewSet.get_all_users_divisions_details"""
+    params = request.GET
+    div_id = params.get('divId')
+    divisions = Division.objects.all() if div_id == 'all' or div_id is None else Division.objects.filter(id=div_id)
+
+    try:
+        start, end = date_range(params)
+    except ValueError:
+        return json_response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=400)
+
+    results = await gather_named(all_users_stat_queries(divisions))
+    return json_response(all_users_stat_payload(results, start, end))
+
+
+@require_GET
+async def user_venues(request, user_id):
+    """GET /async/divisions/user/<user_id>/venues/ - see DivisionViewSet.user_venues"""
+    target_user = await User.objects.filter(id=user_id).afirst()
+    if target_user is None:
+        return not_found(User)
+    data, = await gather_queries(lambda: user_venues_data(request, target_user))
+    return json_response(data)
+
+
+@require_GET
+@read_replica
+async def monthly_attendance(request):
+    """GET /async/attendances/monthly_attendance/ - see AttendanceViewSet.monthly_attendance"""
+    if not request.user.is_authenticated:
+        return not_authenticated()
+
+    total_months = int(body_param(request, 'totalMonths', 3))
+    data, = await gather_queries(lambda: monthly_attendance_data(total_months))
+    return json_response(data)
@@ -0,0 +1,251 @@
+"""
+Endpoint benchmark harness.
+
+run_benchmark() logs in as a user and requests every endpoint in ENDPOINTS
+through the Django test client against the configured database, recording
+the query count and p50/p95/max latency of each.  compare_to_baseline()
+checks the results against benchmark_baseline.json, which is committed next
+to this module and holds one section per database vendor (sqlite,
+postgresql), since both query plans and timings differ between them.
+
+    manage.py seed_benchmark                     # synthetic data, see --help
+    manage.py run_benchmark                      # fails on a regression
+    manage.py run_benchmark --update-baseline    # after an intended change
+
+Query counts must not grow; Data.tests also checks them on a small seeded
+database, where they can only be lower.  Latency may grow by the tolerance
+(50% by default) plus LATENCY_SLACK_MS of timer noise, and is only compared
+when the database holds the dataset the baseline was recorded on.  The response cache is disabled while measuring so the handlers run.
+
+benchmark_connections() (manage.py benchmark_connections) instead compares
+opening a connection per request with the persistent connections or pool of
+Database/connections.py.
+"""
+import contextlib
+import copy
+import json
+import statistics
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .models import Venue, Division, Attendance, Absent, PendingRequest
+
+User = get_user_model()
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+LATENCY_SLACK_MS = 2.0
+
+# Light endpoints, where connection setup is a large share of the request
+CONNECTION_ENDPOINTS = ('division_average', 'division_attendance_stats', 'top_attendance')
+
+# (name, path); {user} is the benchmark user and {division} one of their divisions.
+# Lists are requested a page at a time: unpaginated they render the whole dataset.
+ENDPOINTS = [
+    ('division_list', '/divisions/?page_size=5'),
+    ('division_detail', '/divisions/{division}/'),
+    ('division_attendance_stats', '/divisions/{division}/attendance_stats/'),
+    ('user_stat', '/divisions/user/stat/?userId={user}&divId=all&startDate=2000-01-01'),
+    ('all_users_details', '/divisions/get_all_users_divisions_details/'),
+    ('user_venues', '/divisions/user/{user}/venues/'),
+    ('venue_list', '/venues/?page_size=50'),
+    ('venues_upcoming', '/venues/upcoming/'),
+    ('upcoming_with_division', '/venues/upcoming-with-division/'),
+    ('monthly_attendance', '/attendances/monthly_attendance/'),
+    ('attendance_matrix', '/attendances/matrix/?startDate=2021-01-01'),
+    ('pending_requests', '/pending-requests/?page_size=50'),
+    ('division_average', '/ratings/division_average/?divId={division}'),
+    ('feedback_list', '/feedbacks/?page_size=50'),
+    ('songs_list', '/songs/?page_size=50'),
+    ('top_attendance', '/accounts/users/top_attendance/'),
+]
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+
+def dataset_size():
+    """Row counts identifying the data a benchmark ran on."""
+    return {
+        'users': User.objects.count(),
+        'divisions': Division.objects.count(),
+        'venues': Venue.objects.count(),
+        'attendances': Attendance.objects.count(),
+        'absents': Absent.objects.count(),
+        'pending_requests': PendingRequest.objects.count(),
+    }
+
+
+def benchmark_endpoint(client, path, iterations=10, warmup=2):
+    for _ in range(warmup):
+        client.get(path)
+
+    timings, queries = [], 0
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(path)
+            timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise BenchmarkError(f'GET {path} answered {response.status_code}')
+        queries = max(queries, len(captured))
+
+    timings.sort()
+    return {
+        'queries': queries,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'max_ms': round(timings[-1], 2),
+    }
+
+
+def run_benchmark(user, iterations=10, warmup=2, names=None):
+    """{endpoint name: result} for the selected ENDPOINTS, requested as `user`."""
+    division = user.divisions.order_by('id').first()
+    if division is None:
+        raise BenchmarkError(f'{user} belongs to no division')
+
+    client = Client()
+    client.force_login(user)
+    results = {}
+    with override_settings(RESPONSE_CACHE={'ENABLED': False}):
+        for name, path in ENDPOINTS:
+            if names and name not in names:
+                continue
+            results[name] = benchmark_endpoint(
+                client, path.format(user=user.pk, division=division.pk), iterations=iterations, warmup=warmup
+            )
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    path = Path(path)
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def save_baseline(results, dataset, path=BASELINE_PATH, vendor=None):
+    """Record `results` as the baseline of this database vendor, keeping the others."""
+    baseline = load_baseline(path)
+    baseline[vendor or connection.vendor] = {'dataset': dataset, 'endpoints': results}
+    Path(path).write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+
+
+def compare_to_baseline(results, baseline, dataset=None, latency_tolerance=0.5, check_latency=True):
+    """
+    Regression messages for `results` against one vendor section of the
+    baseline.  Endpoints missing from the baseline are not checked.
+    """
+    expected_endpoints = baseline.get('endpoints', {})
+    check_latency = check_latency and dataset is not None and dataset == baseline.get('dataset')
+
+    regressions = []
+    for name, result in results.items():
+        expected = expected_endpoints.get(name)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            regressions.append(f"{name}: {result['queries']} queries, baseline {expected['queries']}")
+        limit = expected['p95_ms'] * (1 + latency_tolerance) + LATENCY_SLACK_MS
+        if check_latency and result['p95_ms'] > limit:
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f} ms, baseline {expected['p95_ms']:.1f} ms")
+    return regressions
+
+
+@contextlib.contextmanager
+def connection_mode(mode):
+    """
+    Run the default connection as 'per_request' (CONN_MAX_AGE = 0, no pool),
+    'persistent' (kept and health checked, no pool) or 'configured' (the
+    DATABASES settings as they are).
+    """
+    saved = copy.deepcopy(connection.settings_dict)
+    if mode != 'configured':
+        connection.settings_dict['OPTIONS'] = {
+            key: value for key, value in saved.get('OPTIONS', {}).items() if key != 'pool'
+        }
+    if mode == 'per_request':
+        connection.settings_dict.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+    elif mode == 'persistent':
+        connection.settings_dict.update(CONN_MAX_AGE=saved['CONN_MAX_AGE'] or 600, CONN_HEALTH_CHECKS=True)
+    connection.close() # the next connection is opened with these settings
+    try:
+        yield
+    finally:
+        connection.close()
+        connection.settings_dict.clear()
+        connection.settings_dict.update(saved)
+
+
+def connect_latency(iterations=20):
+    """p50 in ms of opening a new connection to the default database."""
+    timings = []
+    with connection_mode('per_request'):
+        for _ in range(iterations):
+            connection.close()
+            started = time.perf_counter()
+            connection.ensure_connection()
+            timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 2)
+
+
+def benchmark_connections(user, modes=('per_request', 'persistent'), iterations=50, warmup=5, names=None):
+    """
+    {endpoint name: {mode: result}} for CONNECTION_ENDPOINTS (or `names`),
+    requested as `user`.  Each request runs between close_old_connections()
+    calls, as a WSGI/ASGI server does (the test client skips them), and
+    counts the connections it opened.
+    """
+    division = user.divisions.order_by('id').first()
+    if division is None:
+        raise BenchmarkError(f'{user} belongs to no division')
+
+    opened = []
+
+    def count(sender, connection, **kwargs):
+        opened.append(connection.alias)
+
+    client = Client()
+    client.force_login(user)
+    results = {}
+    connection_created.connect(count)
+    try:
+        with override_settings(RESPONSE_CACHE={'ENABLED': False}):
+            for name, path in ENDPOINTS:
+                if name not in (names or CONNECTION_ENDPOINTS):
+                    continue
+                path = path.format(user=user.pk, division=division.pk)
+                results[name] = {}
+                for mode in modes:
+                    with connection_mode(mode):
+                        timings = []
+                        for i in range(warmup + iterations):
+                            if i == warmup:
+                                opened.clear()
+                            started = time.perf_counter()
+                            close_old_connections()
+                            response = client.get(path)
+                            close_old_connections()
+                            if i >= warmup:
+                                timings.append((time.perf_counter() - started) * 1000)
+                            if response.status_code != 200:
+                                raise BenchmarkError(f'GET {path} answered {response.status_code}')
+                    timings.sort()
+                    results[name][mode] = {
+                        'connections_per_request': round(len(opened) / iterations, 2),
+                        'p50_ms': round(statistics.median(timings), 2),
+                        'p95_ms': round(percentile(timings, 0.95), 2),
+                    }
+    finally:
+        connection_created.disconnect(count)
+    return results
@@ -0,0 +1,163 @@
+"""
+Response cache and conditional GET for read-mostly endpoints.
+
+    class SongsLearntViewSet(viewsets.ModelViewSet):
+        @cache_response(SongsLearnt, Division)
+        def list(self, request, *args, **kwargs):
+            return super().list(request, *args, **kwargs)
+
+Every model has a version, a random string kept in Django's cache.
+Data.signals calls invalidate_models() on post_save/post_delete/
+m2m_changed, which replaces the versions of the changed models when the
+transaction commits: a request that read the old data read the old
+versions too, so it can't leave stale data cached under the new version.
+
+A response's fingerprint hashes the view, the path, the sorted query params
+(and body, for the odd GET that reads one), the negotiated format, the user
+(only with per_user=True), today's date (only with per_day=True) and the
+versions of every model the endpoint reads.  From it:
+
+  * the strong ETag is the fingerprint, so If-None-Match is answered with
+    304 before the handler or serializer runs.  There is no Last-Modified:
+    versions don't record when the data changed;
+  * the response data is stored under the fingerprint.  Entries built
+    from old versions stop matching and simply age out; nothing has to
+    find and delete keys.
+
+Uses RESPONSE_CACHE['CACHE_ALIAS'] ('default' by default), which must be
+shared by every web worker and `run_jobs` (Database/caches.py): a version
+bumped in one process has to expire the entries and ETags of all of them.
+On a process-local backend such as LocMemCache, or the DatabaseCache, whose
+lookups cost more queries than they save, the feature switches itself off
+and handlers run uncached.
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from Database.caches import saves_queries
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+def _cache():
+    return caches[_config()['CACHE_ALIAS']]
+
+
+def is_enabled():
+    config = _config()
+    return config['ENABLED'] and saves_queries(config['CACHE_ALIAS'])
+
+
+def _version_key(label):
+    return f'response-cache:v:{label}'
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def invalidate_models(*models, using=None):
+    """Expire every cached response and ETag that reads any of `models` when the transaction commits."""
+    if not is_enabled():
+        return
+    labels = {model._meta.label for model in models}
+
+    def bump():
+        _cache().set_many({_version_key(label): _new_version() for label in labels}, timeout=None)
+    transaction.on_commit(bump, using=using)
+
+
+def _versions(cache, labels):
+    keys = [_version_key(label) for label in labels]
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        # A fresh version for evicted keys too, so old entries can't match again
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def response_fingerprint(view, request, labels, per_user=False, per_day=False):
+    """Hex digest of the response `view` would give `request`."""
+    versions = _versions(_cache(), labels)
+    params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+    parts = [
+        type(view).__name__,
+        view.action or '',
+        request.path,
+        repr(params),
+        hashlib.md5(request.body).hexdigest() if request.body else '',
+        request.accepted_renderer.format if getattr(request, 'accepted_renderer', None) else '',
+        str(request.user.pk) if per_user and request.user.is_authenticated else '',
+        timezone.now().date().isoformat() if per_day else '',
+        repr(versions),
+    ]
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def _not_modified(request, etag):
+    etags = parse_etags(request.headers.get('If-None-Match') or '')
+    return '*' in etags or etag in etags
+
+
+def _set_validators(response, etag, per_user):
+    response['ETag'] = etag
+    # Clients may keep the body but have to revalidate it on every poll
+    response['Cache-Control'] = 'private, no-cache' if per_user else 'no-cache'
+    return response
+
+
+def cache_response(*models, per_user=False, per_day=False):
+    """
+    Cache the 200 responses of a viewset handler until one of `models` changes,
+    and answer conditional GETs for them.  per_user keys entries on
+    request.user (for user-dependent fields such as is_owner); per_day for
+    results relative to today's date.
+    """
+    labels = sorted(model._meta.label for model in models)
+
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(self, request, *args, **kwargs):
+            config = _config()
+            if not is_enabled():
+                return handler(self, request, *args, **kwargs)
+
+            digest = response_fingerprint(self, request, labels, per_user=per_user, per_day=per_day)
+            etag = f'"{digest}"'
+            if _not_modified(request, etag):
+                return _set_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, per_user)
+
+            key = f'response-cache:{digest}'
+            data = _cache().get(key)
+            if data is not None:
+                response = Response(data)
+                response['X-Response-Cache'] = 'hit'
+                return _set_validators(response, etag, per_user)
+
+            response = handler(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                _cache().set(key, response.data, timeout=config['TIMEOUT'])
+                response['X-Response-Cache'] = 'miss'
+                _set_validators(response, etag, per_user)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,67 @@
+"""
+Sparse fieldsets for serializers.
+
+    GET /divisions/?fields=id,name,role      only render these fields
+    GET /divisions/?expand=venue_data        render flat fields plus these relations
+    GET /divisions/?expand=                  render flat fields only
+
+Only the top-level serializer of a safe request is trimmed; nested serializers
+keep their full shape.  Dropped fields are removed in get_fields(), before
+anything is evaluated, so PlannedQuerysetMixin doesn't prefetch or annotate
+them either.
+"""
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def parse_field_list(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def is_relation_field(field):
+    return isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField))
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin honouring ?fields= and ?expand= on the top-level serializer."""
+
+    def is_top_level(self):
+        parent = self.parent
+        if parent is None:
+            return True
+        return isinstance(parent, serializers.ListSerializer) and parent.parent is None
+
+    def get_requested_fieldset(self):
+        """Return (fields, expand) from the context or request, or None when nothing was asked for."""
+        if not self.is_top_level():
+            return None
+
+        only = self.context.get('fields')
+        expand = self.context.get('expand')
+        request = self.context.get('request')
+        if request is not None and request.method in SAFE_METHODS:
+            params = getattr(request, 'query_params', request.GET)
+            if only is None and 'fields' in params:
+                only = parse_field_list(params['fields'])
+            if expand is None and 'expand' in params:
+                expand = parse_field_list(params['expand'])
+
+        if only is None and expand is None:
+            return None
+        return only, expand or set()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.get_requested_fieldset()
+        if requested is None:
+            return fields
+
+        only, expand = requested
+        for name in list(fields):
+            if only is not None:
+                keep = name in only or name in expand
+            else:
+                keep = name in expand or not is_relation_field(fields[name])
+            if not keep:
+                fields.pop(name)
+        return fields
@@ -0,0 +1,230 @@
+"""
+Bulk ingestion of Attendance and Absent rows.
+
+    POST /attendances/bulk_ingest/            [{"venue": 1, "division": 2, "sessions": 2, "attendance": 2}, ...]
+    POST /absents/bulk_ingest/?upsert=true    [{"venue": 1, "division": 2, "reason": "work"}, ...]
+
+Rows are validated in batches without a serializer per row, venue and
+division ids are resolved with one IN query per batch, and valid rows are
+written with bulk_create (or PostgreSQL COPY for large insert-only batches).
+With upsert, rows matching an existing (venue, division) pair are updated
+instead of inserted.  The response is a compact per-row status list rather
+than a re-serialization of every object.  `upsert` may also be given in the
+body ({"rows": [...], "upsert": true}); "true" in any case means yes, as in
+the query string.  Rows written with COPY have no "id" in their status,
+since COPY doesn't return the keys it inserts; send smaller batches (under
+COPY_THRESHOLD rows) or use upsert when the ids are needed.
+"""
+import csv
+import io
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import Venue, Division, Absent
+from .caching import invalidate_models
+from .rollups import mark_rollups_dirty
+
+BATCH_SIZE = 1000
+COPY_THRESHOLD = 500 # smaller batches are not worth a COPY round trip
+
+# field -> (default, max string length or None for integers)
+INGEST_FIELDS = {
+    'sessions': (1, None),
+    'attendance': (0, None),
+    'reason': ('study/work', 128),
+}
+
+
+def _ingest_fields(model):
+    return [name for name in INGEST_FIELDS if name != 'reason' or model is Absent]
+
+
+def _as_int(value, errors, name, minimum=None):
+    try:
+        if isinstance(value, (bool, float)):
+            raise ValueError
+        number = int(value)
+    except (TypeError, ValueError):
+        errors[name] = ['A valid integer is required.']
+        return None
+    if minimum is not None and number < minimum:
+        errors[name] = [f'Ensure this value is greater than or equal to {minimum}.']
+        return None
+    return number
+
+
+def _as_flag(value):
+    """True for true / "true" / "True", whether it came from JSON, a form or the query string."""
+    return str(value).lower() == 'true'
+
+
+def validate_row(model, row):
+    """Return (cleaned values, errors) for one incoming row."""
+    if not isinstance(row, dict):
+        return None, {'non_field_errors': ['Expected an object.']}
+
+    errors = {}
+    cleaned = {}
+    for name in ('venue', 'division'):
+        if row.get(name) in (None, ''):
+            errors[name] = ['This field is required.']
+        else:
+            cleaned[f'{name}_id'] = _as_int(row[name], errors, name, minimum=1)
+
+    for name in _ingest_fields(model):
+        default, max_length = INGEST_FIELDS[name]
+        value = row.get(name, default)
+        if max_length is None:
+            cleaned[name] = _as_int(value, errors, name, minimum=0)
+        elif not isinstance(value, str) or not value.strip():
+            errors[name] = ['This field may not be blank.']
+        elif len(value) > max_length:
+            errors[name] = [f'Ensure this field has no more than {max_length} characters.']
+        else:
+            cleaned[name] = value
+
+    return (None, errors) if errors else (cleaned, None)
+
+
+def _copy_rows(model, objects, using):
+    """Insert objects with PostgreSQL COPY. Ids aren't returned."""
+    columns = ['venue_id', 'division_id', *_ingest_fields(model), 'updated_at']
+    now = timezone.now()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for obj in objects:
+        obj.updated_at = now # COPY bypasses auto_now
+        writer.writerow([getattr(obj, column) for column in columns])
+    buffer.seek(0)
+
+    table = model._meta.db_table
+    column_sql = ', '.join(f'"{column}"' for column in columns)
+    sql = f'COPY "{table}" ({column_sql}) FROM STDIN WITH (FORMAT csv)'
+    with connections[using].cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'): # psycopg2
+            raw.copy_expert(sql, buffer)
+        else: # psycopg 3
+            with raw.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def _ingest_batch(model, batch, upsert, using, results, touched):
+    valid = []
+    for index, row in batch:
+        cleaned, errors = validate_row(model, row)
+        if errors:
+            results[index] = {'index': index, 'status': 'error', 'errors': errors}
+        else:
+            valid.append((index, cleaned))
+
+    venue_dates = dict(Venue.objects.using(using).filter(
+        pk__in={cleaned['venue_id'] for _, cleaned in valid}
+    ).values_list('pk', 'date'))
+    division_ids = set(Division.objects.using(using).filter(
+        pk__in={cleaned['division_id'] for _, cleaned in valid}
+    ).values_list('pk', flat=True))
+
+    resolved = []
+    for index, cleaned in valid:
+        errors = {}
+        if cleaned['venue_id'] not in venue_dates:
+            errors['venue'] = [f'Invalid pk "{cleaned["venue_id"]}" - object does not exist.']
+        if cleaned['division_id'] not in division_ids:
+            errors['division'] = [f'Invalid pk "{cleaned["division_id"]}" - object does not exist.']
+        if errors:
+            results[index] = {'index': index, 'status': 'error', 'errors': errors}
+        else:
+            resolved.append((index, cleaned))
+
+    if upsert:
+        # Several rows for one (venue, division) pair collapse to the last of them
+        last = {}
+        for index, cleaned in resolved:
+            last[(cleaned['venue_id'], cleaned['division_id'])] = index
+        for index, cleaned in resolved:
+            if last[(cleaned['venue_id'], cleaned['division_id'])] != index:
+                results[index] = {'index': index, 'status': 'skipped', 'detail': 'Superseded by a later row.'}
+        resolved = [(index, cleaned) for index, cleaned in resolved if index in last.values()]
+
+    existing = {}
+    if upsert and resolved:
+        pairs = model.objects.using(using).filter(
+            venue_id__in={cleaned['venue_id'] for _, cleaned in resolved},
+            division_id__in={cleaned['division_id'] for _, cleaned in resolved},
+        ).order_by('-pk').values_list('venue_id', 'division_id', 'pk')
+        existing = {(venue_id, division_id): pk for venue_id, division_id, pk in pairs}
+
+    to_create, to_update = [], []
+    for index, cleaned in resolved:
+        touched.add((cleaned['division_id'], venue_dates[cleaned['venue_id']]))
+        pk = existing.get((cleaned['venue_id'], cleaned['division_id']))
+        if pk is not None:
+            to_update.append((index, model(pk=pk, **cleaned)))
+        else:
+            to_create.append((index, model(**cleaned)))
+
+    if to_update:
+        now = timezone.now()
+        for _, obj in to_update:
+            obj.updated_at = now # bulk_update bypasses auto_now
+        model.objects.using(using).bulk_update(
+            [obj for _, obj in to_update], [*_ingest_fields(model), 'updated_at'], batch_size=BATCH_SIZE
+        )
+        for index, obj in to_update:
+            results[index] = {'index': index, 'status': 'updated', 'id': obj.pk}
+
+    objects = [obj for _, obj in to_create]
+    if connections[using].vendor == 'postgresql' and not upsert and len(objects) >= COPY_THRESHOLD:
+        _copy_rows(model, objects, using)
+    elif objects:
+        model.objects.using(using).bulk_create(objects, batch_size=BATCH_SIZE)
+    for index, obj in to_create:
+        results[index] = {'index': index, 'status': 'created'}
+        if obj.pk is not None: # None after COPY
+            results[index]['id'] = obj.pk
+
+
+def ingest_rows(model, rows, upsert=False, batch_size=BATCH_SIZE):
+    """Validate and write `rows` for Attendance or Absent. Returns one status dict per row."""
+    using = router.db_for_write(model)
+    results = [None] * len(rows)
+    touched = set()
+    indexed = list(enumerate(rows))
+
+    with transaction.atomic(using=using):
+        for start in range(0, len(indexed), batch_size):
+            _ingest_batch(model, indexed[start:start + batch_size], upsert, using, results, touched)
+        # bulk writes skip the model signals, so refresh the rollup and cached responses here
+        mark_rollups_dirty(touched, using=using)
+        if touched:
+            invalidate_models(model, using=using)
+
+    return results
+
+
+class BulkIngestMixin:
+    """Adds POST <prefix>/bulk_ingest/ to an Attendance or Absent viewset."""
+
+    @action(detail=False, methods=['post'])
+    def bulk_ingest(self, request):
+        rows = request.data.get('rows') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response({'detail': 'Expected a list of rows.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        upsert = _as_flag(request.query_params.get('upsert', 'false'))
+        if isinstance(request.data, dict) and 'upsert' in request.data:
+            upsert = _as_flag(request.data['upsert'])
+
+        results = ingest_rows(self.get_queryset().model, rows, upsert=upsert)
+        summary = {key: 0 for key in ('created', 'updated', 'skipped', 'error')}
+        for result in results:
+            summary[result['status']] += 1
+
+        status_code = status.HTTP_201_CREATED if summary['created'] or summary['updated'] \
+            else status.HTTP_400_BAD_REQUEST
+        return Response({**summary, 'rows': results}, status=status_code)
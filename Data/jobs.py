@@ -0,0 +1,43 @@
+"""
+Background job handlers of the Data app (see Jobs.queue).
+
+Each runs in a transaction with the job's completion.  The refreshes
+recompute from the source tables, so running one twice or late is
+harmless; they lock the division / user row first so two workers
+refreshing the same rows apply their results in commit order.
+"""
+from datetime import date
+
+from django.contrib.auth import get_user_model
+
+from Jobs.queue import task
+from .caching import invalidate_models
+from .leaderboard import refresh_scores
+from .models import Division, AttendanceRollup, LeaderboardScore
+from .rollups import refresh_attendance_rollup
+from .search import index
+from .thumbnails import generate
+
+
+@task('rollups.refresh')
+def refresh_rollup(division_id, day):
+    list(Division.objects.select_for_update().filter(pk=division_id).values_list('pk', flat=True))
+    refresh_attendance_rollup(division_id, date.fromisoformat(day))
+    invalidate_models(AttendanceRollup)
+
+
+@task('leaderboard.refresh')
+def refresh_leaderboard(user_id, day):
+    list(get_user_model().objects.select_for_update().filter(pk=user_id).values_list('pk', flat=True))
+    refresh_scores(user_id, date.fromisoformat(day))
+    invalidate_models(LeaderboardScore)
+
+
+@task('thumbnails.generate')
+def generate_thumbnails(digest):
+    generate(digest)
+
+
+@task('search.index')
+def index_documents(label, ids):
+    index(label, ids)
@@ -0,0 +1,187 @@
+"""
+Attendance leaderboard.
+
+A user attends a venue when their PendingRequest for it is in the
+'attended' state (see DivisionViewSet.process_venue_response).
+LeaderboardScore keeps, per user, the number of approved requests in three
+kinds of periods: 'all', the venue's month 'm:YYYY-MM' and its day
+'d:YYYY-MM-DD'.  Whenever a request's approval, user or venue (date)
+changes, Data.signals queues a 'leaderboard.refresh' job (Data.jobs) for
+the (user, day) it was and is credited to, which recounts the three rows
+from PendingRequest.  Nothing is recomputed on read:
+
+  * top() for all time or a month is an index scan of leaderboard_rank_idx
+    (period, -attended, user) that stops after `limit` rows, joined to the
+    users for their names;
+  * rank() counts the rows of the period ahead of the user on that index,
+    in the query that reads the user's score;
+  * custom ranges sum the day rows of the range per user.
+
+rebuild_leaderboard() (`manage.py rebuild_leaderboard`) recomputes every
+row from PendingRequest, e.g. after bulk updates that sent no signals.
+"""
+from collections import Counter
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.apps import apps as django_apps
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, Q, Sum
+
+from Jobs.queue import enqueue
+
+ALL_TIME = 'all'
+WINDOWS = ('all', 'month', 'range')
+
+APPROVED = Q(user__isnull=False, venue__isnull=False, state='attended')
+
+
+def month_period(day):
+    return f'm:{day:%Y-%m}'
+
+
+def day_period(day):
+    return f'd:{day.isoformat()}'
+
+
+def periods(day):
+    return (ALL_TIME, month_period(day), day_period(day))
+
+
+def is_approved(request):
+    """Whether a PendingRequest counts as attendance of its user."""
+    return bool(request.user_id and request.venue_id and request.state == 'attended')
+
+
+def _score_model():
+    return django_apps.get_model('Data', 'LeaderboardScore')
+
+
+def schedule_refresh(user_id, day, using=None):
+    """Queue a recount of the user's scores touched by `day`, run after the current transaction commits."""
+    if not user_id or day is None:
+        return
+    enqueue('leaderboard.refresh', {'user_id': user_id, 'day': day.isoformat()},
+            key=f'leaderboard:{user_id}:{day.isoformat()}', using=using)
+
+
+def refresh_scores(user_id, day, using=None):
+    """Recount the user's all-time, month and day scores of `day` from PendingRequest."""
+    PendingRequest = django_apps.get_model('Data', 'PendingRequest')
+    scores = _score_model().objects.using(using)
+    month = day.replace(day=1)
+    counts = PendingRequest.objects.using(using).filter(APPROVED, user_id=user_id).aggregate(
+        all=Count('id'),
+        month=Count('id', filter=Q(venue__date__gte=month, venue__date__lte=month + relativedelta(day=31))),
+        day=Count('id', filter=Q(venue__date=day)),
+    )
+    for period, attended in zip(periods(day), (counts['all'], counts['month'], counts['day'])):
+        if not attended:
+            scores.filter(user_id=user_id, period=period).delete()
+        elif not scores.filter(user_id=user_id, period=period).update(attended=attended):
+            try:
+                with transaction.atomic(using=using):
+                    scores.create(user_id=user_id, period=period, attended=attended)
+            except IntegrityError: # created by a concurrent refresh since the update
+                scores.filter(user_id=user_id, period=period).update(attended=attended)
+
+
+def _window(window, start=None, end=None):
+    """The single period of an 'all'/'month' window, or the (first, last) day periods of a range."""
+    if window == 'all':
+        return ALL_TIME
+    if window == 'month':
+        return month_period(start or date.today())
+    if window == 'range':
+        if start is None or end is None:
+            raise ValueError('A range window needs a start and an end date.')
+        return day_period(start), day_period(end)
+    raise ValueError(f"Unknown window {window!r}; use one of {', '.join(WINDOWS)}.")
+
+
+NAME_FIELDS = ('user__username', 'user__fname', 'user__lname')
+
+
+def _ranked(rows):
+    """
+    (user_id, attended, username, fname, lname) rows in descending order ->
+    entries with display names and competition ranks (1, 2, 2, 4).
+    """
+    entries = []
+    for position, (user_id, attended, *names) in enumerate(rows, start=1):
+        rank = entries[-1]['rank'] if entries and entries[-1]['attended'] == attended else position
+        entries.append({'rank': rank, 'user_id': user_id, 'attended': attended, 'name': _display_name(*names)})
+    return entries
+
+
+def top(limit=5, window='all', start=None, end=None):
+    """The `limit` users with the most approved attendance in the window, best first, with their names."""
+    period = _window(window, start, end)
+    scores = _score_model().objects.filter(attended__gt=0)
+    if isinstance(period, str):
+        rows = (
+            scores.filter(period=period).order_by('-attended', 'user_id')
+            .values_list('user_id', 'attended', *NAME_FIELDS)[:limit]
+        )
+    else:
+        rows = (
+            scores.filter(period__gte=period[0], period__lte=period[1]).order_by()
+            .values('user_id', *NAME_FIELDS).annotate(total=Sum('attended')).order_by('-total', 'user_id')
+            .values_list('user_id', 'total', *NAME_FIELDS)[:limit]
+        )
+    return _ranked(list(rows))
+
+
+def rank(user_id, window='all', start=None, end=None):
+    """{'rank', 'attended'} of one user in the window; rank is None while they have no attendance."""
+    period = _window(window, start, end)
+    if isinstance(period, str):
+        # One statement on the covering index; building the ORM equivalent costs more than running it
+        Score = _score_model()
+        connection = connections[router.db_for_read(Score)]
+        table = connection.ops.quote_name(Score._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT l.attended, (SELECT COUNT(*) FROM {table} s WHERE s.period = l.period '
+                f'AND s.attended > l.attended) FROM {table} l '
+                f'WHERE l.period = %s AND l.user_id = %s AND l.attended > 0',
+                [period, user_id],
+            )
+            row = cursor.fetchone()
+        attended, ahead = row or (0, None)
+    else:
+        scores = _score_model().objects.filter(attended__gt=0, period__gte=period[0], period__lte=period[1])
+        attended = scores.filter(user_id=user_id).aggregate(total=Sum('attended'))['total'] or 0
+        totals = scores.order_by().values('user_id').annotate(total=Sum('attended'))
+        ahead = totals.filter(total__gt=attended).count() if attended else None
+    return {'rank': ahead + 1 if attended else None, 'attended': attended}
+
+
+def _display_name(username, fname, lname):
+    return f'{fname[0]}. {lname}' if fname else username
+
+
+def rebuild_leaderboard():
+    """Drop and recompute every LeaderboardScore row. Returns the number of rows written."""
+    PendingRequest = django_apps.get_model('Data', 'PendingRequest')
+    LeaderboardScore = _score_model()
+
+    scores = Counter()
+    approved = (
+        PendingRequest.objects.filter(APPROVED).order_by()
+        .values('user_id', 'venue__date').annotate(venues=Count('id'))
+    )
+    for row in approved.iterator():
+        for period in periods(row['venue__date']):
+            scores[(row['user_id'], period)] += row['venues']
+
+    with transaction.atomic():
+        LeaderboardScore.objects.all().delete()
+        LeaderboardScore.objects.bulk_create(
+            [
+                LeaderboardScore(user_id=user_id, period=period, attended=attended)
+                for (user_id, period), attended in scores.items()
+            ],
+            batch_size=1000,
+        )
+    return len(scores)
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from Data.benchmark import (
+    CONNECTION_ENDPOINTS, ENDPOINTS, BenchmarkError, benchmark_connections, connect_latency,
+)
+from .seed_benchmark import ADMIN_USERNAME
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare request latency when every request opens its own database connection with persistent '
+        'connections (and the pool, when DATABASE_CONNECTIONS["POOL"] is on). Seed the database with '
+        '`manage.py seed_benchmark` first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='Measured requests per endpoint and mode')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            choices=[name for name, _ in ENDPOINTS],
+                            help=f"Only run this endpoint (repeatable; default {', '.join(CONNECTION_ENDPOINTS)})")
+        parser.add_argument('--username', default=ADMIN_USERNAME, help='User the requests are made as')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No user {options['username']}; run `manage.py seed_benchmark` first.")
+
+        modes = ['per_request', 'persistent']
+        if connection.settings_dict.get('OPTIONS', {}).get('pool'):
+            modes.append('configured')
+        try:
+            setup = connect_latency()
+            results = benchmark_connections(user, modes=modes, iterations=options['iterations'],
+                                            warmup=options['warmup'], names=options['endpoints'])
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f'Opening a {connection.vendor} connection: {setup:.2f} ms (p50)')
+        self.stdout.write(f"{'endpoint':<28} {'mode':<12} {'conn/req':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, by_mode in results.items():
+            for mode, result in by_mode.items():
+                self.stdout.write(
+                    f"{name:<28} {'pool' if mode == 'configured' else mode:<12} "
+                    f"{result['connections_per_request']:>8.2f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}"
+                )
@@ -0,0 +1,84 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+# (name, sync path, async path)
+ENDPOINTS = [
+    ('user_stat', '/divisions/user/stat/?userId={user}&divId=all', '/async/divisions/user/stat/?userId={user}&divId=all'),
+    ('all_users_details', '/divisions/get_all_users_divisions_details/',
+     '/async/divisions/get_all_users_divisions_details/'),
+    ('user_venues', '/divisions/user/{user}/venues/', '/async/divisions/user/{user}/venues/'),
+    ('monthly_attendance', '/attendances/monthly_attendance/', '/async/attendances/monthly_attendance/'),
+    ('top_attendance', '/accounts/users/top_attendance/', '/accounts/async/users/top_attendance/'),
+]
+
+
+def fetch(url, cookie):
+    request = urllib.request.Request(url, headers={'Cookie': f'access_token={cookie}'} if cookie else {})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def run(url, cookie, concurrency, total):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: fetch(url, cookie), range(total)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latency for latency, ok in results if ok)
+    errors = sum(1 for _, ok in results if not ok)
+    if not latencies:
+        return {'rps': 0.0, 'p50': None, 'p95': None, 'errors': errors}
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        'errors': errors,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput of the sync (WSGI) and async (ASGI) read paths. Start both servers with the '
+        'same worker count first, e.g. `gunicorn Database.wsgi -w 4 -b :8000` and '
+        '`gunicorn Database.asgi:application -k uvicorn.workers.UvicornWorker -w 4 -b :8001`'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync-url', default='http://127.0.0.1:8000', help='Base URL of the WSGI server')
+        parser.add_argument('--async-url', default='http://127.0.0.1:8001', help='Base URL of the ASGI server')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            choices=[name for name, _, _ in ENDPOINTS], help='Only run this endpoint (repeatable)')
+        parser.add_argument('--user', type=int, default=1, help='User id for the per-user endpoints')
+        parser.add_argument('--access-token', help='access_token cookie for endpoints that need a login')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and path')
+        parser.add_argument('--warmup', type=int, default=10)
+
+    def handle(self, *args, **options):
+        selected = [endpoint for endpoint in ENDPOINTS
+                    if not options['endpoints'] or endpoint[0] in options['endpoints']]
+        cookie = options['access_token']
+
+        self.stdout.write(f"{'endpoint':<20} {'path':<6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        for name, sync_path, async_path in selected:
+            for label, base, path in (('sync', options['sync_url'], sync_path), ('async', options['async_url'], async_path)):
+                url = base.rstrip('/') + path.format(user=options['user'])
+                if options['warmup']:
+                    run(url, cookie, options['concurrency'], options['warmup'])
+                result = run(url, cookie, options['concurrency'], options['requests'])
+                if result['p50'] is None:
+                    raise CommandError(f'Every request to {url} failed; is the server up and the token valid?')
+                self.stdout.write(
+                    f"{name:<20} {label:<6} {result['rps']:>8.1f} {result['p50']:>8.1f} "
+                    f"{result['p95']:>8.1f} {result['errors']:>7}"
+                )
@@ -0,0 +1,41 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Data.exports import EXPORT_FORMATS, export_lines, export_rows
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date "{value}". Use YYYY-MM-DD.')
+
+
+class Command(BaseCommand):
+    help = 'Stream attendance and absence history as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_date, help='First venue date (YYYY-MM-DD)')
+        parser.add_argument('--end', type=parse_date, help='Last venue date (YYYY-MM-DD)')
+        parser.add_argument('--division', type=int, action='append', dest='divisions',
+                            help='Only export this division id (repeatable)')
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='ndjson')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--output', help='File to write to (defaults to stdout)')
+
+    def handle(self, *args, **options):
+        rows = export_rows(
+            start=options['start'],
+            end=options['end'],
+            division_ids=options['divisions'],
+            chunk_size=options['chunk_size'],
+        )
+        stream = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for line in export_lines(options['format'], rows):
+                stream.write(line)
+        finally:
+            if options['output']:
+                stream.close()
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from Data.thumbnails import backfill_digests, generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Hash uploaded images that have no digest yet and write their missing WebP/AVIF variants '
+        '(Data/thumbnails.py), e.g. for files uploaded before variants existed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lazy', action='store_true',
+                            help='Only set the digests; variants are then generated on first request')
+        parser.add_argument('--recompute', action='store_true', help='Hash every original, not only new ones')
+
+    def handle(self, *args, **options):
+        digests = backfill_digests(recompute=options['recompute'])
+        written = 0
+        if not options['lazy']:
+            for digest in digests:
+                written += len(generate(digest))
+        self.stdout.write(self.style.SUCCESS(f'{len(digests)} images, {written} variants written.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Data.rollups import rebuild_attendance_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per division, per day attendance rollup from Attendance and Absent'
+
+    def handle(self, *args, **options):
+        rows = rebuild_attendance_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} attendance rollup rows.'))
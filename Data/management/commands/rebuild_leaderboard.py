@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Data.leaderboard import rebuild_leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Recompute the attendance leaderboard scores from approved pending requests'
+
+    def handle(self, *args, **options):
+        rows = rebuild_leaderboard()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} leaderboard rows.'))
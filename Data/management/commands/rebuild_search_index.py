@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from Data.models import SearchDocument
+from Data.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rewrite the search documents of every venue, division, pending request and feedback'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--if-empty', action='store_true', help='Only build the documents if there are none yet')
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and SearchDocument.objects.exists():
+            self.stdout.write('Search documents already built.')
+            return
+        documents = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {documents} search documents.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from Data.ratings import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute each division's rating sum, count and histogram from Ratings and repair any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the divisions that drifted')
+
+    def handle(self, *args, **options):
+        drifted = rebuild_rating_aggregates(dry_run=options['dry_run'])
+        verb = 'Would repair' if options['dry_run'] else 'Repaired'
+        ids = f": {', '.join(map(str, drifted))}" if drifted else ''
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} divisions{ids}.'))
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from Data.benchmark import (
+    BASELINE_PATH, ENDPOINTS, BenchmarkError, compare_to_baseline, dataset_size, load_baseline, run_benchmark,
+    save_baseline,
+)
+from .seed_benchmark import ADMIN_USERNAME
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure query counts and p50/p95 latency of the main endpoints through the test client and fail '
+        'when they regress against the committed baseline. Seed the database with `manage.py seed_benchmark` first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            choices=[name for name, _ in ENDPOINTS], help='Only run this endpoint (repeatable)')
+        parser.add_argument('--username', default=ADMIN_USERNAME, help='User the requests are made as')
+        parser.add_argument('--baseline', default=str(BASELINE_PATH))
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Record the results as this database vendor\'s baseline instead of comparing')
+        parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                            help='Allowed p95 growth as a fraction of the baseline')
+        parser.add_argument('--no-latency', action='store_true', help='Only compare query counts')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No user {options['username']}; run `manage.py seed_benchmark` first.")
+
+        try:
+            results = run_benchmark(user, iterations=options['iterations'], warmup=options['warmup'],
+                                    names=options['endpoints'])
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        dataset = dataset_size()
+
+        baseline = load_baseline(options['baseline']).get(connection.vendor, {})
+        expected = baseline.get('endpoints', {})
+        self.stdout.write(f"{'endpoint':<28} {'queries':>7} {'base':>5} {'p50 ms':>8} {'p95 ms':>8} {'base p95':>9}")
+        for name, result in results.items():
+            base = expected.get(name, {})
+            self.stdout.write(
+                f"{name:<28} {result['queries']:>7} {base.get('queries', '-'):>5} {result['p50_ms']:>8.1f} "
+                f"{result['p95_ms']:>8.1f} {base.get('p95_ms', '-'):>9}"
+            )
+
+        if options['update_baseline']:
+            if options['endpoints']:
+                results = {**expected, **results}
+            save_baseline(results, dataset, path=options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Recorded the {connection.vendor} baseline in {options['baseline']}."))
+            return
+
+        if not baseline:
+            self.stdout.write(self.style.WARNING(
+                f'No {connection.vendor} baseline yet; record one with --update-baseline.'
+            ))
+            return
+        if not options['no_latency'] and dataset != baseline.get('dataset'):
+            self.stdout.write(self.style.WARNING(
+                'The database is not the dataset the baseline was recorded on; only query counts are compared.'
+            ))
+
+        regressions = compare_to_baseline(results, baseline, dataset=dataset,
+                                          latency_tolerance=options['latency_tolerance'],
+                                          check_latency=not options['no_latency'])
+        if regressions:
+            raise CommandError('Benchmark regressed:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
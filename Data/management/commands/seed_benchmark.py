@@ -0,0 +1,222 @@
+import random
+from datetime import date, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from Data.caching import invalidate_models
+from Data.models import (
+    Venue, SongsLearnt, Division, Attendance, Absent, Ratings, Performance, PendingRequest, Feedback
+)
+from Data.leaderboard import rebuild_leaderboard
+from Data.ratings import rebuild_rating_aggregates
+from Data.rollups import rebuild_attendance_rollups
+from Data.search import rebuild_search_index
+
+User = get_user_model()
+
+# Everything the command creates carries one of these, so --clear only removes seeded rows
+USER_PREFIX = 'bench'
+NAME_PREFIX = 'Bench '
+ADMIN_USERNAME = 'bench_admin'
+PASSWORD = 'bench-password'
+
+ROLES = ['Brass', 'Woodwind', 'Percussion', 'Strings', 'Choir', 'Colour Guard']
+PLACES = ['Town Hall', 'Cathedral', 'Stadium', 'Park Bandstand', 'School Gym', 'Harbour Stage']
+REASONS = ['study/work', 'sick', 'travel', 'family', 'exam']
+FIRST_NAMES = ['Ann', 'Ben', 'Chloe', 'Dan', 'Emi', 'Femi', 'Grace', 'Hiro', 'Ines', 'Jon', 'Kemi', 'Lars']
+LAST_NAMES = ['Lee', 'Okafor', 'Sato', 'Silva', 'Smith', 'Novak', 'Haddad', 'Kim', 'Ade', 'Berg']
+
+BATCH_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with a synthetic band: users, divisions and years of venues with attendance, '
+        'absences, pending requests, ratings and feedback. Used by `manage.py run_benchmark`.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--divisions', type=int, default=200)
+        parser.add_argument('--years', type=int, default=3, help='Years of venue history before today')
+        parser.add_argument('--venues-per-week', type=int, default=3)
+        parser.add_argument('--divisions-per-venue', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=1, help='Random seed, same seed same data')
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded rows first')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['divisions'] < 1:
+            raise CommandError('--users and --divisions must be at least 1.')
+        if options['clear']:
+            self.stdout.write(f'Removed {clear_seeded()} seeded rows.')
+        elif User.objects.filter(username=ADMIN_USERNAME).exists():
+            raise CommandError('The database is already seeded; pass --clear to seed it again.')
+
+        counts = seed(
+            random.Random(options['seed']),
+            users=options['users'],
+            divisions=options['divisions'],
+            years=options['years'],
+            venues_per_week=options['venues_per_week'],
+            divisions_per_venue=options['divisions_per_venue'],
+        )
+        for label, count in counts.items():
+            self.stdout.write(f'{label:<16} {count:>8}')
+        self.stdout.write(self.style.SUCCESS(f'Seeded. Log in as {ADMIN_USERNAME} / {PASSWORD}.'))
+
+
+def clear_seeded():
+    venues = Venue.objects.filter(place__startswith=NAME_PREFIX)
+    divisions = Division.objects.filter(name__startswith=NAME_PREFIX)
+    with transaction.atomic():
+        removed = PendingRequest.objects.filter(division__in=divisions).delete()[0]
+        removed += Performance.objects.filter(division__in=divisions).delete()[0]
+        removed += SongsLearnt.objects.filter(title__startswith=NAME_PREFIX).delete()[0]
+        removed += venues.delete()[0]
+        removed += divisions.delete()[0]
+        removed += User.objects.filter(username__startswith=USER_PREFIX).delete()[0]
+    rebuild_attendance_rollups()
+    rebuild_leaderboard()
+    rebuild_search_index()
+    return removed
+
+
+def _bulk(model, rows):
+    return model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+@transaction.atomic
+def seed(rng, users=2000, divisions=200, years=3, venues_per_week=3, divisions_per_venue=8):
+    """
+    Create the synthetic dataset with bulk inserts and rebuild the attendance
+    rollup, rating aggregates, leaderboard and search documents afterwards
+    (bulk_create sends no signals).
+    Returns row counts.
+    """
+    today = date.today()
+    password = make_password(PASSWORD)
+
+    division_objs = _bulk(Division, [
+        Division(name=f'{NAME_PREFIX}{index:04d}', role=ROLES[index % len(ROLES)],
+                 title=f'{NAME_PREFIX}division {index}', shortWords='Practice, perform, repeat.')
+        for index in range(divisions)
+    ])
+    division_ids = [division.pk for division in division_objs]
+
+    user_objs = _bulk(User, [
+        User(username=ADMIN_USERNAME, password=password, fname='Bench', lname='Admin', is_admin=True)
+    ] + [
+        User(username=f'{USER_PREFIX}{index:05d}', password=password,
+             fname=rng.choice(FIRST_NAMES), lname=rng.choice(LAST_NAMES),
+             gender=rng.choice(['Male', 'Female']), logged_in_times=rng.randint(0, 200))
+        for index in range(users - 1)
+    ])
+    # bulk_create only returns primary keys on backends that can (PostgreSQL, SQLite 3.35+)
+    user_ids = [user.pk for user in user_objs]
+
+    Membership = User.divisions.through
+    memberships = {(user_ids[0], division_id) for division_id in rng.sample(division_ids, min(5, divisions))}
+    for user_id in user_ids[1:]:
+        for division_id in rng.sample(division_ids, min(rng.randint(1, 3), divisions)):
+            memberships.add((user_id, division_id))
+    _bulk(Membership, [Membership(user_id=user_id, division_id=division_id) for user_id, division_id in memberships])
+    members = {}
+    for user_id, division_id in memberships:
+        members.setdefault(division_id, []).append(user_id)
+
+    song_objs = _bulk(SongsLearnt, [
+        SongsLearnt(title=f'{NAME_PREFIX}song {index}', date=today - timedelta(days=rng.randint(0, years * 365)))
+        for index in range(max(divisions // 2, 1))
+    ])
+    DivisionSongs = Division.songs.through
+    _bulk(DivisionSongs, [
+        DivisionSongs(division_id=division_id, songslearnt_id=song.pk)
+        for division_id in division_ids
+        for song in rng.sample(song_objs, min(4, len(song_objs)))
+    ])
+
+    venue_objs = []
+    day = today - timedelta(days=years * 365)
+    while day <= today + timedelta(days=60):
+        for weekday in sorted(rng.sample(range(7), min(venues_per_week, 7))):
+            start = time(rng.choice([9, 13, 17, 18]))
+            venue_objs.append(Venue(
+                date=day + timedelta(days=weekday), startTime=start, endTime=time(start.hour + rng.choice([1, 2, 3])),
+                place=f'{NAME_PREFIX}{rng.choice(PLACES)}', role=rng.choice(['Rehearsal', 'Concert', 'Parade']),
+            ))
+        day += timedelta(days=7)
+    venue_objs = _bulk(Venue, venue_objs)
+
+    attendances, absents, requests, performances = [], [], [], []
+    for venue in venue_objs:
+        past = venue.date <= today
+        for division_id in rng.sample(division_ids, min(divisions_per_venue, divisions)):
+            division_members = members.get(division_id, [])
+            if past:
+                sessions = rng.randint(1, 3)
+                if rng.random() < 0.85:
+                    attendances.append(Attendance(venue=venue, division_id=division_id, sessions=sessions,
+                                                  attendance=rng.randint(0, sessions)))
+                else:
+                    absents.append(Absent(venue=venue, division_id=division_id, sessions=sessions,
+                                          reason=rng.choice(REASONS)))
+            # One request per member: answered in the past, open for upcoming venues
+            for user_id in division_members:
+                answered = past or rng.random() < 0.3
+                if past:
+                    state = PendingRequest.ATTENDED if rng.random() < 0.8 else PendingRequest.ACCEPTED
+                else:
+                    state = PendingRequest.NEW if answered else PendingRequest.PENDING
+                pending, admin_check, admin_accept, attended = PendingRequest.FLAGS[state]
+                requests.append(PendingRequest(
+                    user_id=user_id, venue=venue, division_id=division_id, state=state,
+                    pending=pending, admin_check=admin_check, admin_accept=admin_accept, attended=attended,
+                    reason=None if answered else rng.choice(REASONS),
+                ))
+            if past and rng.random() < 0.1:
+                performances.append((division_id, venue.pk))
+    _bulk(Attendance, attendances)
+    _bulk(Absent, absents)
+    _bulk(PendingRequest, requests)
+
+    performance_objs = _bulk(Performance, [Performance(division_id=division_id) for division_id, _ in performances])
+    PerformanceVenues = Performance.venue.through
+    _bulk(PerformanceVenues, [
+        PerformanceVenues(performance_id=performance.pk, venue_id=venue_id)
+        for performance, (_, venue_id) in zip(performance_objs, performances)
+    ])
+
+    ratings = [
+        Ratings(user_id=user_id, division_id=division_id, value=rng.randint(2, 10) / 2)
+        for user_id, division_id in memberships if rng.random() < 0.6
+    ]
+    _bulk(Ratings, ratings)
+
+    feedbacks = _bulk(Feedback, [
+        Feedback(user_id=user_id, sender_id=user_ids[0], title=f'Feedback {index}', highlighted_title='Well done',
+                 desc='Keep practising the scales.', completed=rng.random() < 0.5, shown_count=rng.randint(0, 5))
+        for index, user_id in enumerate(user_ids) if index == 0 or rng.random() < 0.5
+    ])
+
+    rollups = rebuild_attendance_rollups()
+    rebuild_rating_aggregates()
+    rebuild_leaderboard()
+    rebuild_search_index()
+    invalidate_models(Venue, SongsLearnt, Division, Attendance, Absent, Ratings, Performance, PendingRequest,
+                      Feedback, User)
+    return {
+        'users': len(user_ids),
+        'divisions': len(division_ids),
+        'memberships': len(memberships),
+        'venues': len(venue_objs),
+        'attendances': len(attendances),
+        'absents': len(absents),
+        'pending requests': len(requests),
+        'performances': len(performance_objs),
+        'ratings': len(ratings),
+        'feedback': len(feedbacks),
+        'rollup rows': rollups,
+    }
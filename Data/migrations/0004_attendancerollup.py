@@ -0,0 +1,84 @@
+# Generated by Django 5.1.5 on 2026-10-18 00:34
+
+import datetime
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Sum
+
+
+def build_rollups(apps, schema_editor):
+    """The rows of Data.rollups.rebuild_attendance_rollups(), from the historical models."""
+    Attendance = apps.get_model('Data', 'Attendance')
+    Absent = apps.get_model('Data', 'Absent')
+    AttendanceRollup = apps.get_model('Data', 'AttendanceRollup')
+    duration = ExpressionWrapper(F('venue__endTime') - F('venue__startTime'), output_field=DurationField())
+    buckets = defaultdict(lambda: {
+        'sessions': 0, 'attended': 0, 'absent_sessions': 0,
+        'attended_duration': datetime.timedelta(0), 'absent_duration': datetime.timedelta(0),
+        'absent_reasons': Counter(),
+    })
+
+    attended = (
+        Attendance.objects.order_by().values('division_id', 'venue__date')
+        .annotate(sessions=Sum('sessions'), attended=Sum('attendance'), duration=Sum(duration))
+    )
+    for row in attended.iterator():
+        bucket = buckets[(row['division_id'], row['venue__date'])]
+        bucket['sessions'] = row['sessions'] or 0
+        bucket['attended'] = row['attended'] or 0
+        bucket['attended_duration'] = row['duration'] or datetime.timedelta(0)
+
+    absent = (
+        Absent.objects.order_by().values('division_id', 'venue__date')
+        .annotate(sessions=Sum('sessions'), duration=Sum(duration))
+    )
+    for row in absent.iterator():
+        bucket = buckets[(row['division_id'], row['venue__date'])]
+        bucket['absent_sessions'] = row['sessions'] or 0
+        bucket['absent_duration'] = row['duration'] or datetime.timedelta(0)
+
+    reasons = Absent.objects.order_by().values('division_id', 'venue__date', 'reason').annotate(rows=Count('id'))
+    for row in reasons.iterator():
+        buckets[(row['division_id'], row['venue__date'])]['absent_reasons'][row['reason']] = row['rows']
+
+    AttendanceRollup.objects.bulk_create(
+        [
+            AttendanceRollup(division_id=division_id, date=day, **{
+                **values, 'absent_reasons': dict(values['absent_reasons'])
+            })
+            for (division_id, day), values in buckets.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Data', '0003_remove_division_membercount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sessions', models.IntegerField(default=0)),
+                ('attended', models.IntegerField(default=0)),
+                ('absent_sessions', models.IntegerField(default=0)),
+                ('attended_duration', models.DurationField(default=datetime.timedelta(0))),
+                ('absent_duration', models.DurationField(default=datetime.timedelta(0))),
+                ('absent_reasons', models.JSONField(blank=True, default=dict)),
+                ('division', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_rollups', to='Data.division')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['date', 'division'], name='Data_attend_date_e06c62_idx')],
+                'constraints': [models.UniqueConstraint(fields=('division', 'date'), name='unique_division_rollup_date')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.5 on 2026-10-18 01:12
+
+from django.db import migrations, models
+
+
+def build_rating_aggregates(apps, schema_editor):
+    from Data.ratings import rebuild_rating_aggregates
+    rebuild_rating_aggregates(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Data', '0006_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='division',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='division',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='division',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='division',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='division',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='division',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='division',
+            name='rating_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(build_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Data', '0008_leaderboardscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='division',
+            name='value_digest',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='pendingactivity',
+            name='poster_digest',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='venue',
+            name='img_digest',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.1.5 on 2026-10-18 01:29
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, Value, When
+
+# state -> (pending, admin_check, admin_accept, attended), as PendingRequest.FLAGS
+FLAGS = {
+    'new': (False, False, False, False),
+    'pending': (True, False, False, False),
+    'accepted': (False, True, True, False),
+    'rejected': (True, True, False, False),
+    'attended': (False, True, True, True),
+}
+
+
+def states_from_flags(apps, schema_editor):
+    """Set each request's state from its flags (see PendingRequest.state_for_flags), then normalize the flags."""
+    PendingRequest = apps.get_model('Data', 'PendingRequest')
+    PendingRequest.objects.update(state=Case(
+        When(admin_accept=True, attended=True, then=Value('attended')),
+        When(admin_accept=True, then=Value('accepted')),
+        When(admin_check=True, then=Value('rejected')),
+        When(pending=True, then=Value('pending')),
+        default=Value('new'),
+    ))
+    for state, (pending, admin_check, admin_accept, attended) in FLAGS.items():
+        PendingRequest.objects.filter(state=state).update(
+            pending=pending, admin_check=admin_check, admin_accept=admin_accept, attended=attended,
+        )
+
+    # The leaderboard counts 'attended' requests; built here rather than in 0008, before state existed.
+    # Same rows as Data.leaderboard.rebuild_leaderboard(), from the historical models.
+    LeaderboardScore = apps.get_model('Data', 'LeaderboardScore')
+    scores = Counter()
+    approved = (
+        PendingRequest.objects.filter(user__isnull=False, venue__isnull=False, state='attended').order_by()
+        .values('user_id', 'venue__date').annotate(venues=Count('id'))
+    )
+    for row in approved.iterator():
+        day = row['venue__date']
+        for period in ('all', f'm:{day:%Y-%m}', f'd:{day.isoformat()}'):
+            scores[(row['user_id'], period)] += row['venues']
+
+    LeaderboardScore.objects.all().delete()
+    LeaderboardScore.objects.bulk_create(
+        [
+            LeaderboardScore(user_id=user_id, period=period, attended=attended)
+            for (user_id, period), attended in scores.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Data', '0009_image_digests'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingrequest',
+            name='state',
+            field=models.CharField(choices=[('new', 'New'), ('pending', 'Pending'), ('accepted', 'Accepted'), ('rejected', 'Rejected'), ('attended', 'Attended')], default='new', max_length=10),
+        ),
+        migrations.RunPython(states_from_flags, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pendingrequest',
+            index=models.Index(fields=['division', 'state', 'venue', 'user'], name='pendreq_division_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pendingrequest',
+            index=models.Index(fields=['user', 'state', 'venue'], name='pendreq_user_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pendingrequest',
+            index=models.Index(condition=models.Q(('state', 'pending'), ('user__isnull', False)), fields=['venue'], name='pendreq_review_queue_idx'),
+        ),
+    ]
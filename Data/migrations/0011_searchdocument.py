@@ -0,0 +1,79 @@
+# Generated by Django 5.1.5 on 2026-10-18 01:36
+
+from django.db import migrations, models
+
+TABLE = '"Data_searchdocument"'
+FTS = '"Data_searchdocument_fts"'
+
+POSTGRESQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f"""ALTER TABLE {TABLE} ADD COLUMN vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', title), 'A') || setweight(to_tsvector('simple', body), 'B')
+    ) STORED""",
+    f'CREATE INDEX searchdoc_vector_idx ON {TABLE} USING gin (vector)',
+    f"CREATE INDEX searchdoc_trgm_idx ON {TABLE} USING gin ((title || ' ' || body) gin_trgm_ops)",
+]
+
+# An external content FTS5 table over the documents, kept in sync by triggers
+SQLITE = [
+    f"CREATE VIRTUAL TABLE {FTS} USING fts5(title, body, content={TABLE}, content_rowid='id', tokenize='trigram')",
+    f"""CREATE TRIGGER "Data_searchdocument_ai" AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    f"""CREATE TRIGGER "Data_searchdocument_ad" AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    f"""CREATE TRIGGER "Data_searchdocument_au" AFTER UPDATE ON {TABLE} BEGIN
+        INSERT INTO {FTS}({FTS}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO {FTS}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+DROP = {
+    'postgresql': [
+        'DROP INDEX IF EXISTS searchdoc_trgm_idx',
+        'DROP INDEX IF EXISTS searchdoc_vector_idx',
+        f'ALTER TABLE {TABLE} DROP COLUMN IF EXISTS vector',
+    ],
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS "Data_searchdocument_au"',
+        'DROP TRIGGER IF EXISTS "Data_searchdocument_ad"',
+        'DROP TRIGGER IF EXISTS "Data_searchdocument_ai"',
+        f'DROP TABLE IF EXISTS {FTS}',
+    ],
+}
+
+
+def create_search_index(apps, schema_editor):
+    """The full-text index Data.search queries; other databases get none and are searched unindexed."""
+    for statement in {'postgresql': POSTGRESQL, 'sqlite': SQLITE}.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in DROP.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Data', '0010_pendingrequest_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=40)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.TextField(blank=True, default='')),
+                ('body', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
-from django.db.models import Avg, Count
+from datetime import timedelta
+from django.db import models, transaction
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 # Create your models here.
@@ -11,10 +12,15 @@ class Venue(models.Model):
     place = models.CharField(max_length=100, null=True, blank=True)
     role = models.CharField(max_length=100, null=True, blank=True)
     img = models.FileField(upload_to='venue_img', null=True, blank=True)
+    img_digest = models.CharField(max_length=64, blank=True, default='', editable=False, db_index=True) # Data.thumbnails
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-date', 'startTime']
-        indexes = [ models.Index(fields=['-date', 'place']), models.Index(fields=['role']), ]
+        indexes = [
+            models.Index(fields=['-date', 'place']), models.Index(fields=['role']),
+            models.Index(fields=['-date', 'startTime', '-id'], name='venue_keyset_idx'), # KeysetPagination
+        ]
     def __str__(self):
         return self.place or ""
 
@@ -35,6 +41,7 @@ class Division(models.Model):
     isRegistered= models.BooleanField(default=True)
     is_active = models.BooleanField(default=True)
     value = models.ImageField(upload_to='divisions', null=True, blank=True)
+    value_digest = models.CharField(max_length=64, blank=True, default='', editable=False, db_index=True) # Data.thumbnails
     showRatings = models.BooleanField(default=True)    
     shortWords = models.CharField(max_length=1024, null=True, blank=True)
     showVenue = models.BooleanField(default=True)
@@ -49,8 +56,18 @@ class Division(models.Model):
     songs = models.ManyToManyField(SongsLearnt, blank=True, related_name='divisions')
     attendances = models.ManyToManyField(Venue, through='Attendance', related_name='division_attendees')
     absents = models.ManyToManyField(Venue, through='Absent', related_name='division_absentee')
+
+    # Rating aggregates maintained by Data.signals (see Data/ratings.py)
+    rating_sum = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         indexes = [ models.Index(fields=['name']) ]
@@ -59,12 +76,21 @@ class Division(models.Model):
         
     def __str__(self):
         return self.name or ""
+
+    @property
+    def rating_average(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    @property
+    def rating_distribution(self):
+        return {str(bucket): getattr(self, f'rating_{bucket}') for bucket in range(1, 6)}
     
 class Attendance(models.Model):
     venue = models.ForeignKey(Venue, on_delete=models.CASCADE, related_name='attendances')
     division = models.ForeignKey(Division, on_delete=models.CASCADE, related_name='attendance')
     sessions = models.IntegerField(default=1)
     attendance = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f'{self.division.name} {self.venue.date}' or ""    
@@ -75,10 +101,69 @@ class Absent(models.Model):
     sessions = models.IntegerField(default=1)
     attendance = models.IntegerField(default=0) #so that the data can be combined with Attendance model data
     reason = models.CharField(default='study/work', max_length=128)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.reason
 
+class AttendanceRollup(models.Model):
+    """Per division, per day totals of Attendance and Absent rows. Maintained by Data.signals."""
+    division = models.ForeignKey(Division, on_delete=models.CASCADE, related_name='attendance_rollups')
+    date = models.DateField()
+    sessions = models.IntegerField(default=0) # sessions of attended venues
+    attended = models.IntegerField(default=0)
+    absent_sessions = models.IntegerField(default=0)
+    attended_duration = models.DurationField(default=timedelta(0))
+    absent_duration = models.DurationField(default=timedelta(0))
+    absent_reasons = models.JSONField(default=dict, blank=True) # reason -> number of Absent rows
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['division', 'date'], name='unique_division_rollup_date')
+        ]
+        indexes = [ models.Index(fields=['date', 'division']) ]
+
+    def __str__(self):
+        return f'{self.division_id} {self.date}'
+
+class LeaderboardScore(models.Model):
+    """
+    A user's approved attendance in one period: 'all', 'm:YYYY-MM' or
+    'd:YYYY-MM-DD'. Maintained by Data.signals, read by Data.leaderboard.
+    """
+    user = models.ForeignKey('Account.User', on_delete=models.CASCADE, related_name='leaderboard_scores')
+    period = models.CharField(max_length=12)
+    attended = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'user'], name='unique_leaderboard_period_user')
+        ]
+        indexes = [ models.Index(fields=['period', '-attended', 'user'], name='leaderboard_rank_idx') ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.period} {self.attended}'
+
+class SearchDocument(models.Model):
+    """
+    The searchable text of one Venue, Division, PendingRequest or Feedback
+    ('kind' is the model label). Maintained by Data.signals, queried by
+    Data.search through a tsvector / FTS5 index the migration adds.
+    """
+    kind = models.CharField(max_length=40)
+    object_id = models.BigIntegerField()
+    title = models.TextField(blank=True, default='') # names; ranked above the body
+    body = models.TextField(blank=True, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document')
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
 class Ratings(models.Model):
     user = models.ForeignKey('Account.User', on_delete=models.CASCADE, related_name='ratings')
     value = models.FloatField(validators=[MinValueValidator(1.0), MaxValueValidator(5.0)])
@@ -94,30 +179,107 @@ class Ratings(models.Model):
             )
         ]
 
+    def save(self, *args, **kwargs):
+        # The rating and its division's aggregates change together
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     @classmethod
     def get_average_rating(cls, division):
-        return cls.objects.filter(division=division).aggregate(
-            avg_rating=Avg('value'),
-            rating_count=Count('id')
-        )
+        return {'avg_rating': division.rating_average, 'rating_count': division.rating_count}
 
 class Performance(models.Model):
     venue = models.ManyToManyField(Venue)
     division = models.ForeignKey(Division, on_delete=models.CASCADE, related_name='performance', null=True, blank=True)    
     
 class PendingRequest(models.Model):
+    NEW = 'new' # the venue is ready to be processed by user
+    PENDING = 'pending' # the user answered, waiting for admin review
+    ACCEPTED = 'accepted' # admin/system accepted the user's absence
+    REJECTED = 'rejected' # admin/system did not believe the user
+    ATTENDED = 'attended' # admin/system approved that the user was present
+    STATES = [
+        (NEW, 'New'), (PENDING, 'Pending'), (ACCEPTED, 'Accepted'), (REJECTED, 'Rejected'), (ATTENDED, 'Attended'),
+    ]
+    # Where each state may move to; nothing goes back to new, and credited attendance is not re-submitted
+    TRANSITIONS = {
+        NEW: {PENDING, ACCEPTED, REJECTED, ATTENDED},
+        PENDING: {ACCEPTED, REJECTED, ATTENDED},
+        ACCEPTED: {PENDING, REJECTED, ATTENDED},
+        REJECTED: {PENDING, ACCEPTED, ATTENDED},
+        ATTENDED: {ACCEPTED, REJECTED},
+    }
+    # The (pending, admin_check, admin_accept, attended) flags each state used to be stored as
+    FLAGS = {
+        NEW: (False, False, False, False),
+        PENDING: (True, False, False, False),
+        ACCEPTED: (False, True, True, False),
+        REJECTED: (True, True, False, False),
+        ATTENDED: (False, True, True, True),
+    }
+
     user = models.ForeignKey('Account.User', related_name='pending_requests', on_delete=models.SET_NULL, null=True, blank=True )
     venue = models.ForeignKey(Venue, related_name='pending_requests', on_delete=models.SET_NULL, null=True, blank=True )
     division = models.ForeignKey(Division, related_name='pending_requests', on_delete=models.SET_NULL, null=True, blank=True )
     reason = models.CharField(max_length=128, null=True, blank=True)
+    state = models.CharField(max_length=10, choices=STATES, default=NEW)
     
-    pending = models.BooleanField(default=False) # the venue is ready to be processed by user
-    admin_check = models.BooleanField(default=False) # admin/system has reviewed the request
-    admin_accept = models.BooleanField(default=False) # admin/system thinks you're saying the truth
-    attended = models.BooleanField(default=False) # approved that you were present or not
-    
+    # Mirrors of `state` for existing API clients, kept in sync by save()
+    pending = models.BooleanField(default=False)
+    admin_check = models.BooleanField(default=False)
+    admin_accept = models.BooleanField(default=False)
+    attended = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Every column the venue/request listings read, so they are answered from the index
+            models.Index(fields=['division', 'state', 'venue', 'user'], name='pendreq_division_state_idx'),
+            models.Index(fields=['user', 'state', 'venue'], name='pendreq_user_state_idx'),
+            # The admin review queue: only the answered, unreviewed requests
+            models.Index(fields=['venue'], condition=models.Q(state='pending', user__isnull=False),
+                         name='pendreq_review_queue_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = instance.__dict__.get('state')
+        return instance
+
+    @classmethod
+    def state_for_flags(cls, pending, admin_check, admin_accept, attended):
+        if admin_accept:
+            return cls.ATTENDED if attended else cls.ACCEPTED
+        if admin_check:
+            return cls.REJECTED
+        return cls.PENDING if pending else cls.NEW
+
+    def check_transition(self):
+        """
+        The state this request is saved in: `state` when it was changed, else the
+        one its flags describe (writes from older clients). Raises ValidationError
+        for a move TRANSITIONS doesn't allow.
+        """
+        loaded = getattr(self, '_loaded_state', None)
+        state = self.state
+        if state == (loaded or self.NEW):
+            state = self.state_for_flags(self.pending, self.admin_check, self.admin_accept, self.attended)
+        if loaded and state != loaded and state not in self.TRANSITIONS[loaded]:
+            raise ValidationError({'state': f'A {loaded} request cannot become {state}.'})
+        return state
+
+    def save(self, *args, **kwargs):
+        self.state = self.check_transition()
+        self.pending, self.admin_check, self.admin_accept, self.attended = self.FLAGS[self.state]
+        state_fields = {'state', 'pending', 'admin_check', 'admin_accept', 'attended'}
+        if kwargs.get('update_fields') is not None and state_fields & set(kwargs['update_fields']):
+            kwargs['update_fields'] = set(kwargs['update_fields']) | state_fields
+        super().save(*args, **kwargs)
+        self._loaded_state = self.state
+
     def __str__(self):
-        return self.attended    
+        return self.state
     
 class PendingActivity(models.Model):
     title = models.CharField(max_length=256)
@@ -131,6 +293,7 @@ class PendingActivity(models.Model):
     )
     showPoster = models.BooleanField(default=True)
     poster = models.FileField(upload_to='pending_activity')
+    poster_digest = models.CharField(max_length=64, blank=True, default='', editable=False, db_index=True) # Data.thumbnails
     
     def __str__(self):
         return self.title or ""
@@ -145,6 +308,12 @@ class Feedback(models.Model):
     shown_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [ # KeysetPagination over FeedbackViewSet's -created_at ordering
+            models.Index(fields=['-created_at', '-id'], name='feedback_keyset_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='feedback_user_keyset_idx'),
+        ]
+
     def __str__(self):
         return f'{self.title} - {self.user.fname}'
     
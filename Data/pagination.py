@@ -0,0 +1,150 @@
+"""
+Keyset (cursor) pagination.
+
+Pagination is opt-in so existing clients keep receiving plain lists:
+
+    GET /venues/                      every row, as before
+    GET /venues/?page_size=100        first page: {"next": <url>, "results": [...]}
+    GET /venues/?cursor=<token>       the page after <token>
+
+Rows are ordered by the queryset's ordering (or the model's Meta.ordering)
+with the primary key appended as a tie breaker.  The cursor carries the
+values of every ordering key of the last row, and the next page is selected
+with a composite "greater than" filter, so page N costs the same as page 1
+and never scans an OFFSET.  Ordering keys must be non-null.
+"""
+import base64
+import json
+from datetime import date, datetime, time
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 500
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def is_keyset_ordering(self, model, terms):
+        """Keyset comparisons need plain, non-null columns (or annotations) on the model itself."""
+        for term in terms:
+            if not isinstance(term, str) or term == '?' or '__' in term:
+                return False
+            try:
+                if model._meta.get_field(term.lstrip('-')).null:
+                    return False
+            except FieldDoesNotExist:
+                pass
+        return True
+
+    def get_ordering(self, queryset):
+        """Ordering keys as (name, descending) pairs, ending with the primary key."""
+        model = queryset.model
+        candidates = (list(queryset.query.order_by), list(model._meta.ordering), [])
+        terms = next(terms for terms in candidates if terms == [] or self.is_keyset_ordering(model, terms))
+
+        keys = []
+        for term in terms:
+            name = term.lstrip('-')
+            keys.append((model._meta.pk.name if name == 'pk' else name, term.startswith('-')))
+
+        pk_name = model._meta.pk.name
+        if pk_name not in [name for name, _ in keys]:
+            keys.append((pk_name, keys[0][1] if keys else False))
+        return keys
+
+    def encode_cursor(self, values):
+        def default(value):
+            if isinstance(value, (date, datetime, time)):
+                return value.isoformat()
+            return str(value)
+        payload = json.dumps(values, default=default, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, token, model, keys):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(token.encode()))
+            if not isinstance(values, list) or len(values) != len(keys):
+                raise ValueError
+            decoded = []
+            for (name, _), value in zip(keys, values):
+                try:
+                    value = model._meta.get_field(name).to_python(value)
+                except FieldDoesNotExist:
+                    pass  # annotations keep their JSON value
+                decoded.append(value)
+            return decoded
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def keyset_filter(self, keys, values):
+        """(k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... with each comparison following its key's direction."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(keys, values):
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        # Redundant bound on the leading key lets the database range-scan its index
+        name, descending = keys[0]
+        return Q(**{f'{name}__{"lte" if descending else "gte"}': values[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.keys = self.get_ordering(queryset)
+        queryset = queryset.order_by(*[('-' if descending else '') + name for name, descending in self.keys])
+
+        token = params.get(self.cursor_query_param)
+        if token:
+            values = self.decode_cursor(token, queryset.model, self.keys)
+            queryset = queryset.filter(self.keyset_filter(self.keys, values))
+
+        rows = list(queryset[:self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        self.page = rows[:self.page_size_value]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        token = self.encode_cursor([getattr(last, name) for name, _ in self.keys])
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size_value)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,84 @@
+"""
+Denormalized rating aggregates.
+
+Division carries rating_sum, rating_count and a five bucket histogram
+(rating_1 .. rating_5, bucketed like ratings_stats: 1 <= v < 2 is bucket 1,
+..., 5.0 is bucket 5), so average and distribution reads cost no query.
+
+Data.signals keeps them current: a rating save or delete applies its delta
+with one UPDATE of F() expressions in the transaction that changes the
+rating (Ratings.save() and cascades run atomically), so concurrent raters
+never overwrite each other's counts.  bulk_create/queryset.update() bypass
+signals; rebuild_rating_aggregates() (`manage.py reconcile_ratings`)
+recomputes the columns from the Ratings table and repairs any drift.
+"""
+import math
+
+from django.apps import apps as django_apps
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+BUCKETS = (1, 2, 3, 4, 5)
+
+
+def rating_bucket(value):
+    """The histogram bucket (1-5) a rating value counts towards."""
+    return min(max(int(value), 1), 5)
+
+
+def bucket_field(bucket):
+    return f'rating_{bucket}'
+
+
+def apply_rating_delta(division_id, old_value=None, new_value=None, using=None):
+    """Move one rating's contribution from old_value to new_value (None: no rating) on its division."""
+    if division_id is None or old_value == new_value:
+        return
+    Division = django_apps.get_model('Data', 'Division')
+    changes = {}
+    if old_value is not None:
+        changes['rating_sum'] = F('rating_sum') - old_value
+        changes['rating_count'] = F('rating_count') - 1
+        changes[bucket_field(rating_bucket(old_value))] = F(bucket_field(rating_bucket(old_value))) - 1
+    if new_value is not None:
+        changes['rating_sum'] = changes.get('rating_sum', F('rating_sum')) + new_value
+        changes['rating_count'] = changes.get('rating_count', F('rating_count')) + 1
+        field = bucket_field(rating_bucket(new_value))
+        changes[field] = changes.get(field, F(field)) + 1
+    Division.objects.using(using).filter(pk=division_id).update(**changes)
+
+
+def _bucket_filter(bucket):
+    if bucket == 5:
+        return Q(ratings__value__gte=5)
+    if bucket == 1:
+        return Q(ratings__value__lt=2)
+    return Q(ratings__value__gte=bucket, ratings__value__lt=bucket + 1)
+
+
+def rebuild_rating_aggregates(apps=django_apps, dry_run=False):
+    """
+    Recompute every division's rating columns from Ratings and write the ones
+    that drifted.  Returns the ids of the divisions that needed repair.
+    """
+    Division = apps.get_model('Data', 'Division')
+    fields = ['rating_sum', 'rating_count', *(bucket_field(bucket) for bucket in BUCKETS)]
+    expected = Division.objects.order_by().annotate(
+        expected_rating_sum=Coalesce(Sum('ratings__value'), Value(0.0)),
+        expected_rating_count=Count('ratings'),
+        **{f'expected_{bucket_field(bucket)}': Count('ratings', filter=_bucket_filter(bucket)) for bucket in BUCKETS},
+    )
+
+    drifted = []
+    for division in expected.iterator():
+        values = {field: getattr(division, f'expected_{field}') for field in fields}
+        drift = not math.isclose(division.rating_sum, values['rating_sum'], abs_tol=1e-6) or any(
+            getattr(division, field) != values[field] for field in fields[1:]
+        )
+        if drift:
+            for field, value in values.items():
+                setattr(division, field, value)
+            drifted.append(division)
+    if drifted and not dry_run:
+        Division.objects.bulk_update(drifted, fields, batch_size=500)
+    return [division.pk for division in drifted]
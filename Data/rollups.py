@@ -0,0 +1,157 @@
+"""
+Per division, per day attendance rollup.
+
+AttendanceRollup keeps one row per (division, venue date) with the totals the
+stats endpoints need, so they aggregate O(divisions x days) rows instead of
+every Attendance/Absent row joined through Venue.  Data.signals marks buckets
+dirty on Attendance, Absent and Venue changes, which queues a 'rollups.refresh'
+job (Data.jobs) per bucket; a `manage.py run_jobs` worker then recomputes it
+with refresh_attendance_rollup().  rebuild_attendance_rollups() recomputes
+everything (see `manage.py rebuild_attendance_rollup`).
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Sum
+
+from Jobs.queue import enqueue_many
+
+VENUE_DURATION = ExpressionWrapper(F('venue__endTime') - F('venue__startTime'), output_field=DurationField())
+
+
+def _models():
+    return (
+        django_apps.get_model('Data', 'Division'),
+        django_apps.get_model('Data', 'Attendance'),
+        django_apps.get_model('Data', 'Absent'),
+        django_apps.get_model('Data', 'AttendanceRollup'),
+    )
+
+
+def refresh_attendance_rollup(division_id, day):
+    """Recompute the rollup row of one (division, day) bucket from the source tables."""
+    Division, Attendance, Absent, AttendanceRollup = _models()
+    bucket = {'division_id': division_id, 'venue__date': day}
+
+    attended = Attendance.objects.filter(**bucket).aggregate(
+        rows=Count('id'),
+        sessions=Sum('sessions'),
+        attended=Sum('attendance'),
+        duration=Sum(VENUE_DURATION),
+    )
+    absent = Absent.objects.filter(**bucket).aggregate(
+        rows=Count('id'),
+        sessions=Sum('sessions'),
+        duration=Sum(VENUE_DURATION),
+    )
+
+    if not (attended['rows'] or absent['rows']) or not Division.objects.filter(pk=division_id).exists():
+        AttendanceRollup.objects.filter(division_id=division_id, date=day).delete()
+        return
+
+    reasons = dict(
+        Absent.objects.filter(**bucket).order_by().values_list('reason').annotate(Count('id'))
+    ) if absent['rows'] else {}
+
+    AttendanceRollup.objects.update_or_create(
+        division_id=division_id,
+        date=day,
+        defaults={
+            'sessions': attended['sessions'] or 0,
+            'attended': attended['attended'] or 0,
+            'absent_sessions': absent['sessions'] or 0,
+            'attended_duration': attended['duration'] or timedelta(0),
+            'absent_duration': absent['duration'] or timedelta(0),
+            'absent_reasons': reasons,
+        },
+    )
+
+
+def mark_rollup_dirty(division_id, day, using=None):
+    """Queue a refresh of the (division, day) bucket; it runs once the current transaction commits."""
+    mark_rollups_dirty([(division_id, day)], using=using)
+
+
+def mark_rollups_dirty(buckets, using=None):
+    """mark_rollup_dirty() for many (division_id, day) buckets, in one insert."""
+    enqueue_many('rollups.refresh', [
+        ({'division_id': division_id, 'day': day.isoformat()}, f'rollup:{division_id}:{day.isoformat()}')
+        for division_id, day in set(buckets) if division_id is not None and day is not None
+    ], using=using)
+
+
+def rebuild_attendance_rollups():
+    """Drop and recompute every rollup row. Returns the number of rows written."""
+    Division, Attendance, Absent, AttendanceRollup = _models()
+    buckets = defaultdict(lambda: {
+        'sessions': 0, 'attended': 0, 'absent_sessions': 0,
+        'attended_duration': timedelta(0), 'absent_duration': timedelta(0),
+        'absent_reasons': Counter(),
+    })
+
+    attended = (
+        Attendance.objects.order_by().values('division_id', 'venue__date')
+        .annotate(sessions=Sum('sessions'), attended=Sum('attendance'), duration=Sum(VENUE_DURATION))
+    )
+    for row in attended.iterator():
+        bucket = buckets[(row['division_id'], row['venue__date'])]
+        bucket['sessions'] = row['sessions'] or 0
+        bucket['attended'] = row['attended'] or 0
+        bucket['attended_duration'] = row['duration'] or timedelta(0)
+
+    absent = (
+        Absent.objects.order_by().values('division_id', 'venue__date')
+        .annotate(sessions=Sum('sessions'), duration=Sum(VENUE_DURATION))
+    )
+    for row in absent.iterator():
+        bucket = buckets[(row['division_id'], row['venue__date'])]
+        bucket['absent_sessions'] = row['sessions'] or 0
+        bucket['absent_duration'] = row['duration'] or timedelta(0)
+
+    reasons = Absent.objects.order_by().values('division_id', 'venue__date', 'reason').annotate(rows=Count('id'))
+    for row in reasons.iterator():
+        buckets[(row['division_id'], row['venue__date'])]['absent_reasons'][row['reason']] = row['rows']
+
+    with transaction.atomic():
+        AttendanceRollup.objects.all().delete()
+        AttendanceRollup.objects.bulk_create(
+            [
+                AttendanceRollup(division_id=division_id, date=day, **{
+                    **values, 'absent_reasons': dict(values['absent_reasons'])
+                })
+                for (division_id, day), values in buckets.items()
+            ],
+            batch_size=500,
+        )
+    return len(buckets)
+
+
+def rollup_totals(rollups):
+    """Sum a rollup queryset in one query."""
+    totals = rollups.aggregate(
+        sessions=Sum('sessions'),
+        attended=Sum('attended'),
+        absent_sessions=Sum('absent_sessions'),
+        attended_duration=Sum('attended_duration'),
+        absent_duration=Sum('absent_duration'),
+    )
+    return {
+        'sessions': totals['sessions'] or 0,
+        'attended': totals['attended'] or 0,
+        'absent_sessions': totals['absent_sessions'] or 0,
+        'attended_duration': totals['attended_duration'] or timedelta(0),
+        'absent_duration': totals['absent_duration'] or timedelta(0),
+    }
+
+
+def top_absence_reason(rollups):
+    """The most frequent absence reason as {'reason', 'value'}, or None when nobody was absent."""
+    reasons = Counter()
+    for row in rollups.values_list('absent_reasons', flat=True):
+        reasons.update(row)
+    if not reasons:
+        return None
+    reason, value = reasons.most_common(1)[0]
+    return {'reason': reason, 'value': value}
@@ -0,0 +1,325 @@
+"""
+Ranked full-text search over venues, divisions, pending requests and feedback.
+
+DRF's SearchFilter ORs an icontains per search field and term, across
+joins (divisions__name, user__fname, ...) and behind a DISTINCT, so every
+search scans the table.  Instead each searchable row has a SearchDocument:
+its searchable text, denormalized into a `title` (names, ranked higher) and
+a `body`,
+
+    Data.Venue           place role | date times division names
+    Data.Division        name | role userRole shortWords title
+    Data.PendingRequest  user name, division name | reason, division role
+    Data.Feedback        title highlighted title | desc, user name
+
+kept up to date by Data.signals through 'search.index' jobs (Data.jobs),
+including when a division or user is renamed.  The database indexes the
+documents (migration 0011):
+
+  * PostgreSQL: a generated, weighted tsvector column with a GIN index, and
+    a pg_trgm GIN index on the text.  A row matches when every term is a
+    word prefix (tsquery) or a substring (ILIKE, answered by the trigram
+    index) of its document; rank is ts_rank plus the trigram similarity of
+    the title.
+  * SQLite: an FTS5 table with the trigram tokenizer, synced by triggers;
+    terms of three or more characters are MATCHed, shorter ones LIKEd, and
+    rank is bm25.
+  * Anything else: icontains over the documents, unranked.
+
+RankedSearchFilter replaces SearchFilter on the viewsets: same ?search=
+parameter and term splitting, rows best match first unless ?ordering= is
+given.  `manage.py rebuild_search_index` rewrites every document, e.g.
+after bulk inserts that sent no signals; build.sh runs it with --if-empty
+after migrating, which fills the table the first time.
+
+    SEARCH = {
+        'ENGINE': None, # dotted path of an Engine subclass; None picks one by database vendor
+        'MAX_TERMS': 10,
+    }
+"""
+import re
+from collections import defaultdict
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.template import loader
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from Jobs.queue import enqueue, enqueue_many
+
+DEFAULTS = {
+    'ENGINE': None,
+    'MAX_TERMS': 10, # further terms of a query are ignored
+}
+
+BATCH_SIZE = 500
+
+# Lexemes of the tsquery; everything else in a term is left to the substring match
+WORD = re.compile(r'\w+')
+
+
+def search_settings():
+    return {**DEFAULTS, **getattr(settings, 'SEARCH', {})}
+
+
+def _text(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def _time(value):
+    return value.strftime('%H:%M') if value else ''
+
+
+def venue_documents(ids, apps=django_apps, using=None):
+    Venue = apps.get_model('Data', 'Venue')
+    PendingRequest = apps.get_model('Data', 'PendingRequest')
+    names = defaultdict(set)
+    divisions = (
+        PendingRequest.objects.using(using).filter(venue_id__in=ids, division__isnull=False)
+        .values_list('venue_id', 'division__name').distinct()
+    )
+    for venue_id, name in divisions:
+        names[venue_id].add(name)
+    rows = Venue.objects.using(using).filter(pk__in=ids).values_list('pk', 'place', 'role', 'date', 'startTime', 'endTime')
+    for pk, place, role, day, start, end in rows:
+        yield pk, _text(place, role), _text(day.isoformat(), _time(start), _time(end), *sorted(names[pk]))
+
+
+def division_documents(ids, apps=django_apps, using=None):
+    Division = apps.get_model('Data', 'Division')
+    rows = Division.objects.using(using).filter(pk__in=ids).values_list('pk', 'name', 'role', 'userRole', 'shortWords', 'title')
+    for pk, name, role, user_role, short_words, title in rows:
+        yield pk, _text(name), _text(role, user_role, short_words, title)
+
+
+def pending_request_documents(ids, apps=django_apps, using=None):
+    PendingRequest = apps.get_model('Data', 'PendingRequest')
+    rows = PendingRequest.objects.using(using).filter(pk__in=ids).values_list(
+        'pk', 'user__fname', 'user__lname', 'division__name', 'reason', 'division__role',
+    )
+    for pk, fname, lname, division, reason, role in rows:
+        yield pk, _text(fname, lname, division), _text(reason, role)
+
+
+def feedback_documents(ids, apps=django_apps, using=None):
+    Feedback = apps.get_model('Data', 'Feedback')
+    rows = Feedback.objects.using(using).filter(pk__in=ids).values_list(
+        'pk', 'title', 'highlighted_title', 'desc', 'user__fname', 'user__lname',
+    )
+    for pk, title, highlighted_title, desc, fname, lname in rows:
+        yield pk, _text(title, highlighted_title), _text(desc, fname, lname)
+
+
+# model label -> function yielding (pk, title, body) of the rows with the given pks
+DOCUMENTS = {
+    'Data.Venue': venue_documents,
+    'Data.Division': division_documents,
+    'Data.PendingRequest': pending_request_documents,
+    'Data.Feedback': feedback_documents,
+}
+
+# Other rows whose documents include text of a model: label -> (its indexed fields, [(label, lookup)])
+DEPENDENTS = {
+    'Data.Division': (('name', 'role'), [('Data.Venue', 'pending_requests__division'),
+                                         ('Data.PendingRequest', 'division')]),
+    'Account.User': (('fname', 'lname'), [('Data.PendingRequest', 'user'), ('Data.Feedback', 'user')]),
+}
+
+
+def searchable_models():
+    return [django_apps.get_model(label) for label in DOCUMENTS]
+
+
+def index(label, ids, apps=django_apps, using=None):
+    """Rewrite the documents of these `label` rows, dropping those of rows that no longer exist. Returns how many were written."""
+    SearchDocument = apps.get_model('Data', 'SearchDocument')
+    documents = [
+        SearchDocument(kind=label, object_id=pk, title=title, body=body)
+        for pk, title, body in DOCUMENTS[label](ids, apps, using)
+    ]
+    SearchDocument.objects.using(using).bulk_create(
+        documents, update_conflicts=True, unique_fields=['kind', 'object_id'], update_fields=['title', 'body'],
+        batch_size=BATCH_SIZE,
+    )
+    gone = set(ids) - {document.object_id for document in documents}
+    if gone:
+        SearchDocument.objects.using(using).filter(kind=label, object_id__in=gone).delete()
+    return len(documents)
+
+
+def schedule_index(model, ids, using=None):
+    """Queue a refresh of the documents of these rows, run after the current transaction commits."""
+    label = model._meta.label
+    ids = sorted(set(ids) - {None})
+    if len(ids) == 1:
+        enqueue('search.index', {'label': label, 'ids': ids}, key=f'search:{label}:{ids[0]}', using=using)
+    elif ids:
+        enqueue_many('search.index', [
+            ({'label': label, 'ids': ids[start:start + BATCH_SIZE]}, None) for start in range(0, len(ids), BATCH_SIZE)
+        ], using=using)
+
+
+def schedule_dependents(model, pk, using=None):
+    """Queue a refresh of the documents that include text of this row."""
+    for label, lookup in DEPENDENTS[model._meta.label][1]:
+        dependent = django_apps.get_model(label)
+        ids = dependent.objects.using(using).filter(**{lookup: pk}).values_list('pk', flat=True).distinct()
+        schedule_index(dependent, ids, using=using)
+
+
+def remove_document(model, pk, using=None):
+    django_apps.get_model('Data', 'SearchDocument').objects.using(using).filter(
+        kind=model._meta.label, object_id=pk,
+    ).delete()
+
+
+def rebuild_search_index():
+    """Rewrite every SearchDocument. Returns the number of documents."""
+    SearchDocument = django_apps.get_model('Data', 'SearchDocument')
+    written = 0
+    with transaction.atomic():
+        for label in DOCUMENTS:
+            model = django_apps.get_model(label)
+            SearchDocument.objects.filter(kind=label).exclude(object_id__in=model.objects.values('pk')).delete()
+            ids = list(model.objects.order_by('pk').values_list('pk', flat=True))
+            for start in range(0, len(ids), BATCH_SIZE):
+                written += index(label, ids[start:start + BATCH_SIZE])
+        SearchDocument.objects.exclude(kind__in=list(DOCUMENTS)).delete()
+    return written
+
+
+def _like(term):
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class Engine:
+    """
+    Finds and ranks the SearchDocuments of one kind with the database's
+    full-text index. This one works anywhere, without an index or ranking.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.model = django_apps.get_model('Data', 'SearchDocument')
+        self.table = connection.ops.quote_name(self.model._meta.db_table)
+
+    def matches(self, kind, terms):
+        """Something a pk__in lookup accepts: the object_id of every document containing all terms."""
+        conditions = [Q(title__icontains=term) | Q(body__icontains=term) for term in terms]
+        return self.model.objects.using(self.connection.alias).filter(*conditions, kind=kind).values('object_id')
+
+    def rank(self, kind, terms, outer):
+        """An expression for the relevance of the document of the row whose quoted pk column is `outer`."""
+        return Value(0.0, output_field=FloatField())
+
+
+class PostgresEngine(Engine):
+    TEXT = "(title || ' ' || body)" # the expression of the trigram index
+
+    def tsquery(self, terms):
+        return ' & '.join(f"'{word}':*" for term in terms for word in WORD.findall(term))
+
+    def matches(self, kind, terms):
+        likes = ' AND '.join([f'{self.TEXT} ILIKE %s'] * len(terms))
+        params = [kind, *map(_like, terms)]
+        words = self.tsquery(terms)
+        if words:
+            likes = f"vector @@ to_tsquery('simple', %s) OR ({likes})"
+            params.insert(1, words)
+        return RawSQL(f'SELECT object_id FROM {self.table} WHERE kind = %s AND ({likes})', params)
+
+    def rank(self, kind, terms, outer):
+        words = self.tsquery(terms)
+        relevance = 'similarity(title, %s)'
+        params = [' '.join(terms)]
+        if words:
+            relevance = f"ts_rank(vector, to_tsquery('simple', %s)) + {relevance}"
+            params.insert(0, words)
+        return RawSQL(
+            f'SELECT {relevance} FROM {self.table} WHERE kind = %s AND object_id = {outer}',
+            [*params, kind], output_field=FloatField(),
+        )
+
+
+class SQLiteEngine(Engine):
+    MIN_MATCH = 3 # the trigram tokenizer cannot MATCH shorter terms
+    WEIGHTS = '10.0, 1.0' # bm25 weights of title and body
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self.fts = connection.ops.quote_name(f'{self.model._meta.db_table}_fts')
+
+    def fts_query(self, terms):
+        return ' '.join('"' + term.replace('"', '""') + '"' for term in terms if len(term) >= self.MIN_MATCH)
+
+    def matches(self, kind, terms):
+        conditions, params = ['kind = %s'], [kind]
+        query = self.fts_query(terms)
+        if query:
+            conditions.append(f'id IN (SELECT rowid FROM {self.fts} WHERE {self.fts} MATCH %s)')
+            params.append(query)
+        for term in terms:
+            if len(term) < self.MIN_MATCH:
+                conditions.append(f"(title || ' ' || body) LIKE %s ESCAPE '\\'")
+                params.append(_like(term))
+        return RawSQL(f'SELECT object_id FROM {self.table} WHERE ' + ' AND '.join(conditions), params)
+
+    def rank(self, kind, terms, outer):
+        query = self.fts_query(terms)
+        if not query:
+            return super().rank(kind, terms, outer)
+        # bm25() needs the MATCH. Materialized, the MATCH runs once per query rather than once per
+        # row, and CROSS JOIN keeps SQLite from running it once per document of the kind instead
+        return RawSQL(
+            f'WITH matched AS MATERIALIZED (SELECT document.object_id, -bm25({self.fts}, {self.WEIGHTS}) AS rank '
+            f'FROM {self.fts} CROSS JOIN {self.table} document ON document.id = {self.fts}.rowid '
+            f'WHERE {self.fts} MATCH %s AND document.kind = %s) '
+            f'SELECT rank FROM matched WHERE object_id = {outer}',
+            [query, kind], output_field=FloatField(),
+        )
+
+
+ENGINES = {
+    'postgresql': PostgresEngine,
+    'sqlite': SQLiteEngine,
+}
+
+
+def get_engine(using):
+    connection = connections[using]
+    path = search_settings()['ENGINE']
+    engine = import_string(path) if path else ENGINES.get(connection.vendor, Engine)
+    return engine(connection)
+
+
+def search(queryset, terms):
+    """The rows of `queryset` whose documents contain every term, annotated with search_rank, best first."""
+    model = queryset.model
+    engine = get_engine(queryset.db)
+    kind = model._meta.label
+    quote = engine.connection.ops.quote_name
+    outer = f'{quote(model._meta.db_table)}.{quote(model._meta.pk.column)}'
+    ordering = list(queryset.query.order_by) or list(model._meta.ordering)
+    return (
+        queryset.filter(pk__in=engine.matches(kind, terms))
+        .annotate(search_rank=engine.rank(kind, terms, outer))
+        .order_by('-search_rank', *ordering)
+    )
+
+
+class RankedSearchFilter(filters.SearchFilter):
+    """SearchFilter's ?search= over the rows' SearchDocuments; search_fields is not used."""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)[:search_settings()['MAX_TERMS']]
+        if not terms:
+            return queryset
+        return search(queryset, terms)
+
+    def to_html(self, request, queryset, view):
+        context = {'param': self.search_param, 'term': request.query_params.get(self.search_param, '')}
+        return loader.get_template(self.template).render(context)
@@ -1,24 +1,32 @@
+import copy
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from django.db.models import Avg, Count
+from django.db.models import Count
 from rest_framework.validators import UniqueTogetherValidator
 from django.utils import timezone
 from .models import (
     Venue, SongsLearnt, Division, Attendance, Absent,
     Ratings, Performance, PendingRequest, PendingActivity, Feedback
 )
+from .fieldsets import SparseFieldsetMixin
+from .planning import subquery_count
+from .thumbnails import ImageVariantsField
+from django.db.models import Exists, OuterRef
 from django.contrib.auth import get_user_model
 
         
-class VenueSerializer(serializers.ModelSerializer):
+class VenueSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # division_count = serializers.SerializerMethodField()
     # attendance_rate = serializers.SerializerMethodField()
     divisions = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
     is_user_associated = serializers.SerializerMethodField()
+    img_variants = ImageVariantsField('img')
     
     class Meta:
         model = Venue
         fields = '__all__'
-        extra_fields = ['divisions', 'is_user_associated']
+        extra_fields = ['divisions', 'is_user_associated', 'img_variants']
         extra_kwargs = {
             'endTime': {'required': False, 'allow_null': True},
             'place': {'required': False, 'allow_blank': True},
@@ -26,7 +34,22 @@ class VenueSerializer(serializers.ModelSerializer):
             'img': {'required': False}
         }
         
+    def get_planned_annotations(self):
+        target_user = self.context.get('target_user')
+        return {
+            'is_user_associated': {
+                'planned_is_user_associated': Exists(PendingRequest.objects.filter(
+                    venue=OuterRef('pk'), division__isnull=False, division__users=target_user
+                )),
+            },
+        }
+        
     def get_is_user_associated(self, obj):
+        if hasattr(obj, 'planned_is_user_associated'):
+            return obj.planned_is_user_associated
+        target_division_ids = self.context.get('target_division_ids')
+        if target_division_ids is not None:
+            return any(division.pk in target_division_ids for division in obj.divisions.all())
         #user = self.context['request'].user #for authenticated user
         target_user = self.context.get('target_user') #get user id from endpoint url
         return obj.divisions.filter(users=target_user).exists()
@@ -50,14 +73,16 @@ class VenueSerializer(serializers.ModelSerializer):
     #     return attendance_count / total_sessions if total_sessions else 0
         
         
-class PendingActivitySerializer(serializers.ModelSerializer):
+class PendingActivitySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     venue = VenueSerializer()
     venue_detail = serializers.SerializerMethodField()
+    poster_variants = ImageVariantsField('poster')
 
     class Meta:
         model = PendingActivity
         fields = '__all__'
-        extra_fields = ['venue_detail']
+        extra_fields = ['venue_detail', 'poster_variants']
+        related_fields = {'venue_detail': ['venue']}
 
     def create(self, validated_data):
         venue_data = validated_data.pop('venue')
@@ -101,7 +126,7 @@ class PendingActivitySerializer(serializers.ModelSerializer):
 
 
 
-class SongsLearntSerializer(serializers.ModelSerializer):
+class SongsLearntSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     division_count = serializers.SerializerMethodField()
     
     class Meta:
@@ -109,17 +134,25 @@ class SongsLearntSerializer(serializers.ModelSerializer):
         fields = '__all__'
         extra_fields = ['division_count']
     
+    def get_planned_annotations(self):
+        return {
+            'division_count': {'planned_division_count': subquery_count(Division.songs.through, 'songslearnt')},
+        }
+    
     def get_division_count(self, obj):
+        if hasattr(obj, 'planned_division_count'):
+            return obj.planned_division_count
         return obj.divisions.count()
 
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     venue_detail = serializers.SerializerMethodField()
     attendance_rate = serializers.SerializerMethodField()
     
     class Meta:
         model = Attendance
         fields = ['id', 'venue', 'division', 'sessions', 'attendance', 'venue_detail', 'attendance_rate']
+        related_fields = {'venue_detail': ['venue']}
     
     def get_venue_detail(self, obj):
         return {
@@ -134,7 +167,7 @@ class AttendanceSerializer(serializers.ModelSerializer):
         return (obj.attendance / obj.sessions) * 100 if obj.sessions else 0
 
 
-class AbsentSerializer(serializers.ModelSerializer):
+class AbsentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     venue_detail = serializers.SerializerMethodField()
     division_name = serializers.ReadOnlyField(source='division.name')
     
@@ -142,6 +175,7 @@ class AbsentSerializer(serializers.ModelSerializer):
         model = Absent
         extra_fields = ['venue_detail', 'division_name']
         fields = '__all__'
+        related_fields = {'venue_detail': ['venue']}
     
     def get_venue_detail(self, obj):
         return {
@@ -152,8 +186,56 @@ class AbsentSerializer(serializers.ModelSerializer):
         }
 
 
-
-class RatingsSerializer(serializers.ModelSerializer):
+def attendance_rows(queryset):
+    """Same output as AttendanceSerializer(many=True), rendered from a single values() query"""
+    rows = queryset.values(
+        'id', 'venue', 'division', 'sessions', 'attendance',
+        'venue__date', 'venue__place', 'venue__startTime', 'venue__endTime', 'venue__role',
+    )
+    return [{
+        'id': row['id'],
+        'venue': row['venue'],
+        'division': row['division'],
+        'sessions': row['sessions'],
+        'attendance': row['attendance'],
+        'venue_detail': {
+            'date': row['venue__date'],
+            'place': row['venue__place'],
+            'startTime': row['venue__startTime'],
+            'endTime': row['venue__endTime'],
+            'role': row['venue__role'],
+        },
+        'attendance_rate': (row['attendance'] / row['sessions']) * 100 if row['sessions'] else 0,
+    } for row in rows]
+
+
+def absent_rows(queryset):
+    """Same output as AbsentSerializer(many=True), rendered from a single values() query"""
+    rows = queryset.values(
+        'id', 'venue', 'division', 'sessions', 'attendance', 'reason', 'updated_at', 'division__name',
+        'venue__date', 'venue__place', 'venue__startTime', 'venue__endTime',
+    )
+    updated_at = serializers.DateTimeField()
+    return [{
+        'id': row['id'],
+        'venue_detail': {
+            'date': row['venue__date'],
+            'place': row['venue__place'],
+            'startTime': row['venue__startTime'],
+            'endTime': row['venue__endTime'],
+        },
+        'division_name': row['division__name'],
+        'sessions': row['sessions'],
+        'attendance': row['attendance'],
+        'reason': row['reason'],
+        'updated_at': updated_at.to_representation(row['updated_at']),
+        'venue': row['venue'],
+        'division': row['division'],
+    } for row in rows]
+
+
+
+class RatingsSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     from Account.serializers import UserSerializer
     
     user_detail = UserSerializer(source='user', read_only=True)
@@ -168,6 +250,7 @@ class RatingsSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             'value': {'min_value': 1.0, 'max_value': 5.0}
         }
+        related_fields = {'is_owner': ['user']}
 
     def get_is_owner(self, obj):
         request = self.context.get('request')
@@ -187,7 +270,7 @@ class RatingsSerializer(serializers.ModelSerializer):
 
 
 
-class PerformanceSerializer(serializers.ModelSerializer):
+class PerformanceSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     venues = VenueSerializer(source='venue', many=True, read_only=True)
     division_name = serializers.ReadOnlyField(source='division.name')
     venue_count = serializers.SerializerMethodField()
@@ -195,12 +278,13 @@ class PerformanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Performance
         fields = ['id', 'venue', 'division', 'venues', 'division_name', 'venue_count']
+        related_fields = {'venue_count': ['venue']}
     
     def get_venue_count(self, obj):
         return obj.venue.count()
 
     
-class PendingRequestSerializer(serializers.ModelSerializer):
+class PendingRequestSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user_detail = serializers.SerializerMethodField()
     division_detail = serializers.SerializerMethodField()
     venue_detail = serializers.SerializerMethodField()
@@ -209,7 +293,25 @@ class PendingRequestSerializer(serializers.ModelSerializer):
         model = PendingRequest
         extra_fields = ['user']
         fields = '__all__'
+        related_fields = {
+            'user_detail': ['user'],
+            'division_detail': ['division'],
+            'venue_detail': ['venue'],
+        }
         
+    def validate(self, attrs):
+        if self.instance is not None:
+            # The state (or legacy flags) the update would save, checked like PendingRequest.save() does
+            candidate = copy.copy(self.instance)
+            for name in ('state', 'pending', 'admin_check', 'admin_accept', 'attended'):
+                if name in attrs:
+                    setattr(candidate, name, attrs[name])
+            try:
+                candidate.check_transition()
+            except DjangoValidationError as e:
+                raise serializers.ValidationError(e.message_dict)
+        return attrs
+
     def get_user_detail(self, obj):
         if obj.user:
             return {
@@ -239,7 +341,7 @@ class PendingRequestSerializer(serializers.ModelSerializer):
 
 
 
-class FeedbackSerializer(serializers.ModelSerializer):
+class FeedbackSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     from Account.serializers import PublicUserSerializer
     
     user_detail = PublicUserSerializer(source='user', read_only=True)
@@ -276,17 +378,18 @@ class FeedbackSerializer(serializers.ModelSerializer):
         return data
 
 
-class DivisionListSerializer(serializers.ModelSerializer):
+class DivisionListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Lightweight serializer for listing divisions"""
     venue_count = serializers.SerializerMethodField()
     songs_count = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
+    value_variants = ImageVariantsField('value')
     
     class Meta:
         model = Division
         fields = [
             'id', 'name', 'role', 'userRole', 'isRegistered', 
-            'is_active', 'value', 'venue_count', 'songs_count', 'average_rating'
+            'is_active', 'value', 'value_variants', 'venue_count', 'songs_count', 'average_rating'
         ]
         
     def create(self, validated_data):
@@ -308,25 +411,35 @@ class DivisionListSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
     
+    def get_planned_annotations(self):
+        return {
+            'venue_count': {'planned_venue_count': subquery_count(PendingRequest, 'division', venue__isnull=False)},
+            'songs_count': {'planned_songs_count': subquery_count(Division.songs.through, 'division')},
+        }
+    
     def get_venue_count(self, obj):
+        if hasattr(obj, 'planned_venue_count'):
+            return obj.planned_venue_count
         return obj.venues.count()
     
     def get_songs_count(self, obj):
+        if hasattr(obj, 'planned_songs_count'):
+            return obj.planned_songs_count
         return obj.songs.count()
     
     def get_average_rating(self, obj):
-        avg = obj.ratings.aggregate(avg_value=Avg('value')).get('avg_value')
+        avg = obj.rating_average
         return round(avg, 2) if avg else 0
     
     
 
 
-class DivisionDetailSerializer(serializers.ModelSerializer):
+class DivisionDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Detailed serializer for single division view"""
     venue_data = VenueSerializer(source='venues', many=True, read_only=True)
     songs = SongsLearntSerializer(many=True, read_only=True)
-    attendance_data = AttendanceSerializer(source='attendances', many=True, read_only=True)
-    absent_data = AbsentSerializer(source='absents', many=True, read_only=True)
+    attendance_data = AttendanceSerializer(source='attendance', many=True, read_only=True)
+    absent_data = AbsentSerializer(source='absent', many=True, read_only=True)
     ratings_data = RatingsSerializer(source='ratings', many=True, read_only=True)
     performance_data = PerformanceSerializer(source='performance', many=True, read_only=True)
     pending_requests_data = PendingRequestSerializer(source='pending_requests', many=True, read_only=True)
@@ -344,18 +457,34 @@ class DivisionDetailSerializer(serializers.ModelSerializer):
             'venue_stats', 'member_count'
         ]
 
+    def get_planned_annotations(self):
+        User = get_user_model()
+        today = timezone.now().date()
+        return {
+            'member_count': {'planned_member_count': subquery_count(User.divisions.through, 'division')},
+            'venue_stats': {
+                'planned_venue_total': subquery_count(PendingRequest, 'division', venue__isnull=False),
+                'planned_venue_upcoming': subquery_count(PendingRequest, 'division', venue__date__gte=today),
+            },
+        }
+
     def get_member_count(self, obj):
-        # return 0
+        if hasattr(obj, 'planned_member_count'):
+            return obj.planned_member_count
         return obj.users.count()
     
     def get_average_rating(self, obj):
-        avg = obj.ratings.aggregate(avg_value=Avg('value')).get('avg_value')
+        avg = obj.rating_average
         return round(avg, 2) if avg else 0
     
     def get_venue_stats(self, obj):
-        today = timezone.now().date()  # Get the current date
-        total_venues = obj.venues.count()
-        upcoming_venues = obj.venues.filter(date__gte=today).count()
+        if hasattr(obj, 'planned_venue_total'):
+            total_venues = obj.planned_venue_total
+            upcoming_venues = obj.planned_venue_upcoming
+        else:
+            today = timezone.now().date()  # Get the current date
+            total_venues = obj.venues.count()
+            upcoming_venues = obj.venues.filter(date__gte=today).count()
         
         return {
             'total': total_venues,
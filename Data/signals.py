@@ -0,0 +1,286 @@
+# Data/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .caching import invalidate_models
+from .models import (
+    Venue, SongsLearnt, Division, Attendance, Absent,
+    Ratings, Performance, PendingRequest, PendingActivity
+)
+from .leaderboard import APPROVED, is_approved, schedule_refresh as schedule_leaderboard_refresh
+from .ratings import apply_rating_delta
+from .rollups import mark_rollup_dirty
+from .search import DEPENDENTS, remove_document, schedule_dependents, schedule_index, searchable_models
+from .thumbnails import digest_field, file_digest, image_field, image_models, thumbnail_settings
+from Jobs.queue import enqueue
+
+User = get_user_model()
+
+# Models whose rows are rendered by cached responses (see Data.caching)
+RESPONSE_CACHE_MODELS = (
+    Venue, SongsLearnt, Division, Attendance, Absent,
+    Ratings, Performance, PendingRequest, PendingActivity, User,
+)
+
+
+def _rollup_bucket(instance):
+    if type(instance).venue.is_cached(instance):
+        return instance.division_id, instance.venue.date
+    day = Venue.objects.filter(pk=instance.venue_id).values_list('date', flat=True).first()
+    return instance.division_id, day
+
+
+@receiver(pre_save, sender=Attendance)
+@receiver(pre_save, sender=Absent)
+def remember_rollup_bucket(sender, instance, **kwargs):
+    """
+    Remember which bucket an updated row used to count towards
+    """
+    instance._old_rollup_bucket = None
+    if instance.pk:
+        instance._old_rollup_bucket = (
+            sender.objects.filter(pk=instance.pk).values_list('division_id', 'venue__date').first()
+        )
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_save, sender=Absent)
+def refresh_rollup_on_save(sender, instance, using, **kwargs):
+    old_bucket = getattr(instance, '_old_rollup_bucket', None)
+    if old_bucket:
+        mark_rollup_dirty(*old_bucket, using=using)
+    mark_rollup_dirty(*_rollup_bucket(instance), using=using)
+
+
+@receiver(pre_delete, sender=Attendance)
+@receiver(pre_delete, sender=Absent)
+def remember_deleted_rollup_bucket(sender, instance, **kwargs):
+    # The venue may be going away in the same cascade, so read its date now
+    instance._old_rollup_bucket = _rollup_bucket(instance)
+
+
+@receiver(post_delete, sender=Attendance)
+@receiver(post_delete, sender=Absent)
+def refresh_rollup_on_delete(sender, instance, using, **kwargs):
+    mark_rollup_dirty(*instance._old_rollup_bucket, using=using)
+
+
+@receiver(pre_save, sender=Venue)
+def remember_venue_schedule(sender, instance, **kwargs):
+    instance._old_schedule = None
+    if instance.pk:
+        instance._old_schedule = (
+            sender.objects.filter(pk=instance.pk).values_list('date', 'startTime', 'endTime').first()
+        )
+
+
+@receiver(post_save, sender=Venue)
+def refresh_rollup_on_venue_change(sender, instance, created, using, **kwargs):
+    """
+    Moving a venue or changing its times moves its rows between buckets
+    and changes their durations
+    """
+    old_schedule = getattr(instance, '_old_schedule', None)
+    if created or not old_schedule:
+        return
+    if old_schedule == (instance.date, instance.startTime, instance.endTime):
+        return
+
+    division_ids = set(Attendance.objects.filter(venue=instance).values_list('division_id', flat=True))
+    division_ids |= set(Absent.objects.filter(venue=instance).values_list('division_id', flat=True))
+    for division_id in division_ids:
+        mark_rollup_dirty(division_id, old_schedule[0], using=using)
+        mark_rollup_dirty(division_id, instance.date, using=using)
+
+
+@receiver(pre_save, sender=Ratings)
+def remember_rating(sender, instance, using, **kwargs):
+    instance._old_rating = None
+    if instance.pk:
+        # Locked until Ratings.save() commits, so concurrent updates apply their deltas in turn
+        instance._old_rating = (
+            sender.objects.using(using).select_for_update()
+            .filter(pk=instance.pk).values_list('division_id', 'value').first()
+        )
+
+
+@receiver(post_save, sender=Ratings)
+def update_rating_aggregates_on_save(sender, instance, using, **kwargs):
+    old = getattr(instance, '_old_rating', None)
+    if old and old[0] != instance.division_id:
+        apply_rating_delta(old[0], old_value=old[1], using=using)
+        old = None
+    apply_rating_delta(instance.division_id, old_value=old[1] if old else None, new_value=instance.value, using=using)
+
+
+@receiver(post_delete, sender=Ratings)
+def update_rating_aggregates_on_delete(sender, instance, using, **kwargs):
+    apply_rating_delta(instance.division_id, old_value=instance.value, using=using)
+
+
+def _leaderboard_credit(request, using):
+    """(user_id, venue date) an approved request counts towards, else None."""
+    if not is_approved(request):
+        return None
+    if type(request).venue.is_cached(request) and request.venue is not None:
+        return request.user_id, request.venue.date
+    day = Venue.objects.using(using).filter(pk=request.venue_id).values_list('date', flat=True).first()
+    return request.user_id, day
+
+
+@receiver(pre_save, sender=PendingRequest)
+def remember_leaderboard_credit(sender, instance, using, **kwargs):
+    instance._old_leaderboard_credit = None
+    if instance.pk:
+        old = sender.objects.using(using).filter(APPROVED, pk=instance.pk).values_list('user_id', 'venue__date')
+        instance._old_leaderboard_credit = old.first()
+
+
+@receiver(post_save, sender=PendingRequest)
+def update_leaderboard_on_save(sender, instance, using, **kwargs):
+    old = getattr(instance, '_old_leaderboard_credit', None)
+    new = _leaderboard_credit(instance, using)
+    if old == new:
+        return
+    for credit in {old, new} - {None}:
+        schedule_leaderboard_refresh(*credit, using=using)
+
+
+@receiver(pre_delete, sender=PendingRequest)
+def remember_deleted_leaderboard_credit(sender, instance, using, **kwargs):
+    instance._old_leaderboard_credit = _leaderboard_credit(instance, using)
+
+
+@receiver(post_delete, sender=PendingRequest)
+def update_leaderboard_on_delete(sender, instance, using, **kwargs):
+    if instance._old_leaderboard_credit:
+        schedule_leaderboard_refresh(*instance._old_leaderboard_credit, using=using)
+
+
+@receiver(pre_delete, sender=Venue)
+def withdraw_leaderboard_credit(sender, instance, using, **kwargs):
+    """Deleting a venue nulls its requests' venue with an UPDATE that sends no PendingRequest signals"""
+    approved = PendingRequest.objects.using(using).filter(APPROVED, venue=instance)
+    for user_id in set(approved.values_list('user_id', flat=True)):
+        schedule_leaderboard_refresh(user_id, instance.date, using=using)
+
+
+@receiver(post_save, sender=Venue)
+def move_leaderboard_credit(sender, instance, created, using, **kwargs):
+    old_schedule = getattr(instance, '_old_schedule', None)
+    if created or not old_schedule or old_schedule[0] == instance.date:
+        return
+    approved = PendingRequest.objects.using(using).filter(APPROVED, venue=instance)
+    for user_id in set(approved.values_list('user_id', flat=True)):
+        schedule_leaderboard_refresh(user_id, old_schedule[0], using=using)
+        schedule_leaderboard_refresh(user_id, instance.date, using=using)
+
+
+def _digest_new_upload(sender, instance, **kwargs):
+    """Hash a newly assigned upload while it is still in memory or a temporary file"""
+    field = image_field(sender)
+    file = getattr(instance, field)
+    instance._new_image_digest = None
+    if not file:
+        setattr(instance, digest_field(field), '')
+    elif not file._committed:
+        instance._new_image_digest = file_digest(file)
+        setattr(instance, digest_field(field), instance._new_image_digest)
+
+
+def _queue_thumbnails(sender, instance, using, **kwargs):
+    digest = getattr(instance, '_new_image_digest', None)
+    if digest and thumbnail_settings()['GENERATE_ON_SAVE']:
+        enqueue('thumbnails.generate', {'digest': digest}, key=f'thumbnails:{digest}', using=using)
+
+
+for model, _ in image_models():
+    pre_save.connect(_digest_new_upload, sender=model, dispatch_uid=f'image-digest-{model._meta.label}')
+    post_save.connect(_queue_thumbnails, sender=model, dispatch_uid=f'image-thumbnails-{model._meta.label}')
+
+
+def _index_on_save(sender, instance, using, **kwargs):
+    schedule_index(sender, [instance.pk], using=using)
+
+
+def _drop_search_document(sender, instance, using, **kwargs):
+    remove_document(sender, instance.pk, using=using)
+
+
+for model in searchable_models():
+    post_save.connect(_index_on_save, sender=model, dispatch_uid=f'search-index-{model._meta.label}')
+    post_delete.connect(_drop_search_document, sender=model, dispatch_uid=f'search-drop-{model._meta.label}')
+
+
+@receiver(pre_save, sender=PendingRequest)
+def remember_search_venue(sender, instance, using, **kwargs):
+    instance._old_search_venue = None
+    if instance.pk:
+        instance._old_search_venue = (
+            sender.objects.using(using).filter(pk=instance.pk).values_list('venue_id', 'division_id').first()
+        )
+
+
+@receiver(post_save, sender=PendingRequest)
+def reindex_venue_divisions_on_save(sender, instance, created, using, **kwargs):
+    """A venue's document lists the divisions of its requests"""
+    old = getattr(instance, '_old_search_venue', None)
+    if old == (instance.venue_id, instance.division_id) or not (instance.division_id or old and old[1]):
+        return
+    schedule_index(Venue, {instance.venue_id, old[0] if old else None}, using=using)
+
+
+@receiver(post_delete, sender=PendingRequest)
+def reindex_venue_divisions_on_delete(sender, instance, using, **kwargs):
+    if instance.division_id:
+        schedule_index(Venue, [instance.venue_id], using=using)
+
+
+def _remember_indexed_text(sender, instance, using, update_fields=None, **kwargs):
+    fields = DEPENDENTS[sender._meta.label][0]
+    instance._old_indexed_text = None
+    # Logging in only saves last_login
+    if instance.pk and not (update_fields and not set(update_fields) & set(fields)):
+        instance._old_indexed_text = sender.objects.using(using).filter(pk=instance.pk).values_list(*fields).first()
+
+
+def _reindex_dependents_on_save(sender, instance, using, **kwargs):
+    old = getattr(instance, '_old_indexed_text', None)
+    if old and old != tuple(getattr(instance, field) for field in DEPENDENTS[sender._meta.label][0]):
+        schedule_dependents(sender, instance.pk, using=using)
+
+
+def _reindex_dependents_on_delete(sender, instance, using, **kwargs):
+    # Their requests are kept with the reference nulled by an UPDATE that sends no signals
+    schedule_dependents(sender, instance.pk, using=using)
+
+
+for model in (Division, User):
+    uid = f'search-dependents-{model._meta.label}'
+    pre_save.connect(_remember_indexed_text, sender=model, dispatch_uid=f'{uid}-remember')
+    post_save.connect(_reindex_dependents_on_save, sender=model, dispatch_uid=f'{uid}-save')
+    pre_delete.connect(_reindex_dependents_on_delete, sender=model, dispatch_uid=f'{uid}-delete')
+
+
+def _expire_cached_responses(sender, instance, using, update_fields=None, **kwargs):
+    # Logging in only touches last_login, which no cached response renders
+    if sender is User and update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_models(sender, using=using)
+
+
+for model in RESPONSE_CACHE_MODELS:
+    post_save.connect(_expire_cached_responses, sender=model, dispatch_uid=f'response-cache-save-{model._meta.label}')
+    post_delete.connect(_expire_cached_responses, sender=model, dispatch_uid=f'response-cache-delete-{model._meta.label}')
+
+
+@receiver(m2m_changed, sender=User.divisions.through)
+@receiver(m2m_changed, sender=Division.songs.through)
+@receiver(m2m_changed, sender=Performance.venue.through)
+def expire_cached_responses_on_m2m(sender, instance, action, model, using, **kwargs):
+    """
+    A membership change shows up on both sides of the relation
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_models(type(instance), model, using=using)
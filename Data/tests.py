@@ -1,3 +1,657 @@
-from django.test import TestCase
+import io
+import random
+import shutil
+import tempfile
+from datetime import date, time, timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import async_views
+from .benchmark import compare_to_baseline, load_baseline, run_benchmark
+from .management.commands.seed_benchmark import ADMIN_USERNAME, clear_seeded, seed
+from .leaderboard import rank, rebuild_leaderboard, top
+from .ratings import rebuild_rating_aggregates
+from .serializers import DivisionListSerializer
+from .thumbnails import variants
+from .timeseries import attendance_matrix
+from Jobs.queue import run_pending
+from .models import (
+    Venue, SongsLearnt, Division, Attendance, Absent,
+    Ratings, Performance, PendingRequest, LeaderboardScore, Feedback, SearchDocument, AttendanceRollup
+)
+
+User = get_user_model()
+
+
+def make_division(index, user):
+    """A division with one of every relation DivisionDetailSerializer renders."""
+    division = Division.objects.create(name=f'Division {index}', role=f'Role {index}')
+    user.divisions.add(division)
+
+    past = Venue.objects.create(date=date.today() - timedelta(days=7), startTime=time(9), endTime=time(11))
+    upcoming = Venue.objects.create(date=date.today() + timedelta(days=7), startTime=time(9), endTime=time(11))
+    PendingRequest.objects.create(venue=past, division=division, user=user, attended=True)
+    PendingRequest.objects.create(venue=upcoming, division=division)
+
+    song = SongsLearnt.objects.create(title=f'Song {index}', date=date.today())
+    division.songs.add(song)
+
+    Attendance.objects.create(venue=past, division=division, sessions=2, attendance=2)
+    Absent.objects.create(venue=upcoming, division=division, reason='travel')
+    Ratings.objects.create(user=user, division=division, value=4)
+    performance = Performance.objects.create(division=division)
+    performance.venue.add(past)
+    return division
+
+
+# The query counts below measure the uncached path
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class DivisionListQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret', fname='Ann', lname='Lee')
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/divisions/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_query_count_is_constant_as_divisions_grow(self):
+        for index in range(2):
+            make_division(index, self.user)
+        few_queries, few = self.count_list_queries()
+
+        for index in range(2, 8):
+            make_division(index, self.user)
+        many_queries, many = self.count_list_queries()
+
+        self.assertEqual(len(few), 2)
+        self.assertEqual(len(many), 8)
+        self.assertEqual(few_queries, many_queries)
+
+    def test_query_count_is_constant_for_authenticated_users(self):
+        self.client.force_authenticate(self.user)
+        make_division(0, self.user)
+        few_queries, _ = self.count_list_queries()
+
+        for index in range(1, 5):
+            make_division(index, self.user)
+        many_queries, _ = self.count_list_queries()
+
+        self.assertEqual(few_queries, many_queries)
+
+    def test_planned_values_match_per_row_values(self):
+        division = make_division(0, self.user)
+        _, payload = self.count_list_queries()
+        row = payload[0]
+
+        self.assertEqual(row['member_count'], 1)
+        self.assertEqual(row['average_rating'], 4)
+        self.assertEqual(row['venue_stats'], {'total': 2, 'upcoming': 1, 'past': 1})
+        self.assertEqual(row['songs'][0]['division_count'], 1)
+        self.assertEqual([item['division'] for item in row['attendance_data']], [division.id])
+        self.assertEqual(row['absent_data'][0]['reason'], 'travel')
+        self.assertEqual(row['pending_requests_data'][0]['division_detail']['name'], division.name)
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret', fname='Ann', lname='Lee')
+        make_division(0, self.user)
+
+    def test_fields_trims_payload_and_queries(self):
+        with CaptureQueriesContext(connection) as full:
+            self.client.get('/divisions/')
+        with CaptureQueriesContext(connection) as sparse:
+            response = self.client.get('/divisions/', {'fields': 'id,name,role'})
+
+        self.assertEqual(set(response.json()[0]), {'id', 'name', 'role'})
+        self.assertEqual(len(sparse), 1)
+        self.assertLess(len(sparse), len(full))
+
+    def test_expand_keeps_flat_fields_and_named_relations(self):
+        response = self.client.get('/divisions/', {'expand': 'songs'})
+        row = response.json()[0]
+
+        self.assertIn('name', row)
+        self.assertIn('member_count', row)
+        self.assertIn('songs', row)
+        self.assertNotIn('venue_data', row)
+        self.assertNotIn('venues', row)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret', fname='Ann', lname='Lee')
+        self.division = make_division(0, self.user)
+
+    def test_repeat_reads_are_served_from_cache(self):
+        first = self.client.get('/divisions/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/divisions/')
+        self.assertEqual(first['X-Response-Cache'], 'miss')
+        self.assertEqual(second['X-Response-Cache'], 'hit')
+        self.assertEqual(first.json(), second.json())
+
+    def test_model_changes_invalidate(self):
+        self.client.get('/songs/')
+        # Versions are bumped when the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.division.songs.add(SongsLearnt.objects.create(title='New song', date=date.today()))
+        response = self.client.get('/songs/')
+        self.assertEqual(response['X-Response-Cache'], 'miss')
+        self.assertEqual(len(response.json()), 2)
+
+        params = {'divId': self.division.id}
+        self.client.get('/ratings/division_average/', params)
+        self.assertEqual(self.client.get('/ratings/division_average/', params)['X-Response-Cache'], 'hit')
+        rating = Ratings.objects.get(division=self.division)
+        rating.value = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.save()
+        self.assertEqual(self.client.get('/ratings/division_average/', params)['X-Response-Cache'], 'miss')
+
+    def test_database_cache_is_not_used(self):
+        # Its lookups would cost as many queries as they save
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                               'LOCATION': 'django_cache'}}):
+            self.assertNotIn('X-Response-Cache', self.client.get('/divisions/'))
+
+    def test_user_dependent_fields_are_cached_per_user(self):
+        other = User.objects.create_user(username='other', password='secret', fname='Bo', lname='Ng')
+        self.client.force_authenticate(self.user)
+        self.assertTrue(self.client.get('/divisions/').json()[0]['ratings_data'][0]['is_owner'])
+        self.client.force_authenticate(other)
+        response = self.client.get('/divisions/')
+        self.assertEqual(response['X-Response-Cache'], 'miss')
+        self.assertFalse(response.json()[0]['ratings_data'][0]['is_owner'])
+
+
+class UserVenuesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret', fname='Ann', lname='Lee')
+        self.client.force_authenticate(self.user)
+
+    def test_buckets_come_from_a_fixed_number_of_queries(self):
+        division = make_division(0, self.user)
+        upcoming = Venue.objects.create(date=date.today() + timedelta(days=3), startTime=time(9))
+        PendingRequest.objects.create(venue=upcoming, division=division, user=self.user, pending=True)
+        PendingRequest.objects.create(venue=upcoming, division=division, user=self.user,
+                                      admin_check=True, admin_accept=True)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/divisions/user/{self.user.id}/venues/')
+        payload = response.json()
+
+        self.assertEqual([venue['id'] for venue in payload['pending']], [upcoming.id])
+        self.assertEqual([venue['id'] for venue in payload['accepted']], [upcoming.id])
+        self.assertEqual(len(payload['new']), 1)
+        self.assertEqual(payload['rejected'], [])
+        self.assertTrue(all(venue['is_user_associated'] for venue in payload['new']))
+
+
+class PendingRequestStateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', password='secret', is_admin=True)
+        self.member = User.objects.create_user(username='member', password='secret')
+        self.client.force_authenticate(self.admin)
+        self.division = Division.objects.create(name='Brass', role='Band')
+        self.venue = Venue.objects.create(date=date.today(), startTime=time(9))
+        self.request = PendingRequest.objects.create(venue=self.venue, division=self.division)
+
+    def respond(self, **data):
+        url = f'/divisions/{self.division.pk}/process_venue_response/'
+        return self.client.post(url, {'id': self.venue.pk, 'username': 'member', **data}, format='json')
+
+    def test_state_drives_the_legacy_flags_and_back(self):
+        self.request.state = PendingRequest.REJECTED
+        self.request.save()
+        self.assertEqual((self.request.pending, self.request.admin_check, self.request.admin_accept), (True, True, False))
+
+        # Older clients still write the flags
+        legacy = PendingRequest.objects.get(pk=self.request.pk)
+        legacy.pending, legacy.admin_check, legacy.admin_accept, legacy.attended = False, True, True, True
+        legacy.save()
+        self.assertEqual(PendingRequest.objects.get(pk=self.request.pk).state, PendingRequest.ATTENDED)
+
+        legacy.state = PendingRequest.NEW
+        with self.assertRaises(ValidationError):
+            legacy.save()
+
+    def test_workflow_and_review_queue(self):
+        self.assertEqual(self.respond().status_code, 200)
+        self.assertEqual(
+            [row['id'] for row in self.client.get('/pending-requests/venues/').json()], [self.request.pk]
+        )
+        self.assertEqual(self.respond(is_user_state=False, req_admin_accept=True).status_code, 200)
+        self.request.refresh_from_db()
+        self.assertEqual((self.request.state, self.request.attended), (PendingRequest.ATTENDED, True))
+        self.assertEqual(self.client.get('/pending-requests/venues/').json(), [])
+
+        # Attendance that was credited is not re-submitted, and nothing is written when refused
+        response = self.respond()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('state', response.json()['detail'])
+        self.assertEqual(PendingRequest.objects.get(pk=self.request.pk).state, PendingRequest.ATTENDED)
+
+        url = f'/pending-requests/{self.request.pk}/'
+        self.request.user = self.admin
+        self.request.save()
+        self.assertEqual(self.client.patch(url, {'state': 'new'}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch(url, {'state': 'accepted'}, format='json').json()['attended'], False)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret', fname='Ann', lname='Lee')
+        self.division = make_division(0, self.user)
+
+    def test_unchanged_data_answers_304(self):
+        first = self.client.get('/venues/upcoming-with-division/')
+        # The version timestamps say when a cache key was written, not when the data changed
+        self.assertNotIn('Last-Modified', first)
+        with self.assertNumQueries(0):
+            second = self.client.get('/venues/upcoming-with-division/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b'')
+
+    def test_changes_produce_a_new_etag(self):
+        first = self.client.get('/divisions/')
+        self.division.name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.division.save()
+        second = self.client.get('/divisions/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()[0]['name'], 'Renamed')
+
+
+class AsyncReadPathTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret', fname='Ann', lname='Lee')
+        for index in range(2):
+            make_division(index, self.user)
+        self.client.force_login(self.user)
+
+    def assertSamePayload(self, sync_path, async_path, params=None):
+        expected = self.client.get(sync_path, params)
+        actual = self.client.get(async_path, params)
+        self.assertEqual(actual.status_code, expected.status_code)
+        self.assertEqual(actual.json(), expected.json())
+
+    def test_async_views_match_sync_views(self):
+        user_id = self.user.id
+        self.assertSamePayload('/divisions/user/stat/', '/async/divisions/user/stat/',
+                               {'userId': user_id, 'divId': 'all', 'startDate': '2000-01-01'})
+        self.assertSamePayload('/divisions/user/stat/', '/async/divisions/user/stat/', {'divisions': 'false'})
+        self.assertSamePayload('/divisions/get_all_users_divisions_details/',
+                               '/async/divisions/get_all_users_divisions_details/')
+        self.assertSamePayload(f'/divisions/user/{user_id}/venues/', f'/async/divisions/user/{user_id}/venues/')
+        self.assertSamePayload('/attendances/monthly_attendance/', '/async/attendances/monthly_attendance/')
+        self.assertSamePayload('/accounts/users/top_attendance/', '/accounts/async/users/top_attendance/')
+
+    def test_async_views_keep_permissions(self):
+        self.client.logout()
+        self.assertSamePayload('/attendances/monthly_attendance/', '/async/attendances/monthly_attendance/')
+        self.assertSamePayload('/divisions/user/stat/', '/async/divisions/user/stat/', {'startDate': 'bad'})
+
+
+class ConcurrentQueryPoolTests(TransactionTestCase):
+    """Outside a transaction the queries run on the shared executor's threads."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret', fname='Ann', lname='Lee')
+        make_division(0, self.user)
+        self.client.force_login(self.user)
+
+    def test_requests_reuse_the_bounded_pool(self):
+        for _ in range(3):
+            response = self.client.get('/async/divisions/get_all_users_divisions_details/')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['serializers']['divisions']), 1)
+        executor = async_views.query_executor()
+        self.assertLessEqual(len(executor._threads), settings.ASYNC_QUERY_THREADS)
+
+
+class BenchmarkHarnessTests(TestCase):
+    def test_small_dataset_stays_within_baseline_query_counts(self):
+        baseline = load_baseline().get(connection.vendor)
+        if baseline is None:
+            self.skipTest(f'no {connection.vendor} benchmark baseline')
+        seed(random.Random(1), users=30, divisions=6, years=1, venues_per_week=2, divisions_per_venue=3)
+
+        results = run_benchmark(User.objects.get(username=ADMIN_USERNAME), iterations=1, warmup=0)
+        self.assertEqual(set(results), set(baseline['endpoints']))
+        self.assertEqual(compare_to_baseline(results, baseline, check_latency=False), [])
+
+    def test_clear_removes_seeded_rows(self):
+        seed(random.Random(1), users=5, divisions=2, years=1, venues_per_week=1, divisions_per_venue=1)
+        clear_seeded()
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Venue.objects.exists())
+        self.assertFalse(Division.objects.exists())
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret')
+        self.other = User.objects.create_user(username='other', password='secret')
+        self.division = Division.objects.create(name='Brass', role='Band')
+        self.client.force_login(self.user)
+
+    def stats(self):
+        with self.assertNumQueries(3): # session, user, division
+            return self.client.get(f'/divisions/{self.division.pk}/ratings_stats/').json()
+
+    def test_rate_update_and_delete_keep_aggregates(self):
+        self.client.post('/ratings/rate_div/', {'divId': self.division.pk, 'value': 4.5}, format='json')
+        Ratings.objects.create(user=self.other, division=self.division, value=2)
+        self.assertEqual(self.stats(), {
+            'average': 3.25, 'count': 2, 'distribution': {'1': 0, '2': 1, '3': 0, '4': 1, '5': 0},
+        })
+
+        self.client.post('/ratings/rate_div/', {'divId': self.division.pk, 'value': 5}, format='json')
+        self.assertEqual(self.stats()['distribution'], {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1})
+
+        Ratings.objects.get(user=self.other).delete()
+        self.assertEqual(self.stats(), {
+            'average': 5, 'count': 1, 'distribution': {'1': 0, '2': 0, '3': 0, '4': 0, '5': 1},
+        })
+        self.assertEqual(
+            self.client.get('/ratings/division_average/', {'divId': self.division.pk}).json(),
+            {'avg_rating': 5.0, 'rating_count': 1},
+        )
+
+    def test_rebuild_repairs_drift(self):
+        Ratings.objects.create(user=self.user, division=self.division, value=3)
+        Division.objects.filter(pk=self.division.pk).update(rating_count=7, rating_3=0)
+        self.assertEqual(rebuild_rating_aggregates(dry_run=True), [self.division.pk])
+        self.assertEqual(rebuild_rating_aggregates(), [self.division.pk])
+        self.assertEqual(rebuild_rating_aggregates(), [])
+        self.division.refresh_from_db()
+        self.assertEqual((self.division.rating_count, self.division.rating_3), (1, 1))
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.ann = User.objects.create_user(username='ann', password='secret', fname='Ann', lname='Lee')
+        self.ben = User.objects.create_user(username='ben', password='secret', fname='Ben', lname='Kim')
+        self.division = Division.objects.create(name='Brass', role='Band')
+        self.client.force_login(self.ann)
+
+    def approve(self, user, day):
+        venue = Venue.objects.create(date=day, startTime=time(9), endTime=time(11))
+        PendingRequest.objects.create(venue=venue, division=self.division)
+        url = f'/divisions/{self.division.pk}/process_venue_response/'
+        self.client.post(url, {'id': venue.pk, 'username': user.username}, format='json')
+        self.client.post(url, {'id': venue.pk, 'is_user_state': False, 'req_admin_accept': True}, format='json')
+        run_pending()
+        return venue
+
+    def test_approvals_credit_the_user_and_rank_them(self):
+        today = date.today()
+        for _ in range(2):
+            self.approve(self.ann, today)
+        self.approve(self.ben, today)
+        last_year = self.approve(self.ben, today - timedelta(days=400))
+        self.approve(self.ben, today - timedelta(days=401))
+
+        self.assertEqual([(entry['user_id'], entry['attended'], entry['rank'], entry['name']) for entry in top(5)],
+                         [(self.ben.pk, 3, 1, 'B. Kim'), (self.ann.pk, 2, 2, 'A. Lee')])
+        self.assertEqual(rank(self.ann.pk, 'month'), {'rank': 1, 'attended': 2})
+        self.assertEqual(rank(self.ben.pk, 'range', today - timedelta(days=400), today), {'rank': 1, 'attended': 2})
+        with self.assertNumQueries(1):
+            top(5, 'month')
+
+        last_year.date = today
+        last_year.save()
+        run_pending()
+        self.assertEqual(rank(self.ben.pk, 'month'), {'rank': 1, 'attended': 2})
+        PendingRequest.objects.filter(user=self.ann).first().delete()
+        run_pending()
+        self.assertEqual(rank(self.ann.pk), {'rank': 2, 'attended': 1})
+
+        expected = sorted(LeaderboardScore.objects.values_list('user_id', 'period', 'attended'))
+        rebuild_leaderboard()
+        self.assertEqual(sorted(LeaderboardScore.objects.filter(attended__gt=0)
+                                .values_list('user_id', 'period', 'attended')),
+                         [row for row in expected if row[2]])
+
+    def test_leaderboard_endpoint(self):
+        self.approve(self.ben, date.today())
+        response = self.client.get('/accounts/users/leaderboard/', {'window': 'month'}).json()
+        self.assertEqual(response['top'], [{'rank': 1, 'user_id': self.ben.pk, 'attended': 1, 'name': 'B. Kim'}])
+        self.assertEqual(response['me'], {'rank': None, 'attended': 0})
+        self.assertEqual(self.client.get('/accounts/users/leaderboard/', {'window': 'range'}).status_code, 400)
+        self.assertEqual(self.client.get('/accounts/users/top_attendance/').json()['top'],
+                         [{'name': 'B. Kim', 'total_attendance': 1}])
+
+
+class AttendanceMatrixTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_login(User.objects.create_user(username='member', password='secret'))
+        self.senior = Division.objects.create(name='Brass', role='Senior')
+        self.junior = Division.objects.create(name='Brass', role='Junior')
+        for day, division, attended in [
+            (date(2025, 1, 6), self.senior, 2), (date(2025, 1, 20), self.senior, 1),
+            (date(2025, 3, 3), self.junior, 3),
+        ]:
+            venue = Venue.objects.create(date=day, startTime=time(9), endTime=time(11))
+            Attendance.objects.create(venue=venue, division=division, sessions=3, attendance=attended)
+        run_pending() # the rollup refreshes
+
+    def test_dense_columns_per_division(self):
+        matrix = attendance_matrix(date(2025, 1, 1), date(2025, 3, 31))
+        self.assertEqual(matrix['buckets'], ['2025-01-01', '2025-02-01', '2025-03-01'])
+        self.assertEqual([division['id'] for division in matrix['divisions']], [self.senior.pk, self.junior.pk])
+        self.assertEqual(matrix['series'], [[3, 0, 0], [0, 0, 3]])
+
+        weekly = attendance_matrix(date(2025, 1, 1), date(2025, 1, 31), granularity='week',
+                                   division_ids=[self.senior.pk], metric='sessions')
+        self.assertEqual(weekly['buckets'][0], '2024-12-30')
+        self.assertEqual(weekly['series'], [[0, 3, 0, 3, 0]])
+
+    def test_endpoints(self):
+        response = self.client.get('/attendances/matrix/', {'startDate': '2025-01-01', 'endDate': '2025-03-31'})
+        self.assertEqual(response.json()['series'], [[3, 0, 0], [0, 0, 3]])
+        self.assertEqual(self.client.get('/attendances/matrix/', {'granularity': 'year'}).status_code, 400)
+
+        rows = self.client.get('/attendances/monthly_attendance/').json()
+        self.assertEqual(set(rows[0]), {'month', 'Brass (Senior)', 'Brass (Junior)'})
+
+
+class AttendanceExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='secret', is_admin=True))
+        self.division = Division.objects.create(name='Brass', role='Senior')
+        venue = Venue.objects.create(date=date(2025, 1, 6), startTime=time(9), endTime=time(11))
+        Attendance.objects.create(venue=venue, division=self.division, sessions=3, attendance=2)
+
+    def test_bad_parameters_are_rejected_before_streaming(self):
+        self.assertEqual(self.client.get('/export/attendance/', {'divId': 'brass'}).status_code, 400)
+        self.assertEqual(self.client.get('/export/attendance/', {'startDate': '06/01/2025'}).status_code, 400)
+
+        response = self.client.get('/export/attendance/', {'divId': self.division.pk, 'output': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 2)
+
+
+class BulkIngestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='member', password='secret'))
+        self.division = Division.objects.create(name='Brass', role='Senior')
+        self.venue = Venue.objects.create(date=date(2025, 1, 6), startTime=time(9), endTime=time(11))
+        Attendance.objects.create(venue=self.venue, division=self.division, sessions=3, attendance=1)
+
+    def ingest(self, upsert):
+        row = {'venue': self.venue.pk, 'division': self.division.pk, 'sessions': 3, 'attendance': 2}
+        response = self.client.post('/attendances/bulk_ingest/', {'rows': [row], 'upsert': upsert}, format='json')
+        return response.json()['rows'][0]['status']
+
+    def test_upsert_flag_in_the_body(self):
+        self.assertEqual(self.ingest('false'), 'created')
+        self.assertEqual(self.ingest('true'), 'updated')
+        self.assertEqual(self.ingest(True), 'updated')
+
+
+class AttendanceRollupTests(TestCase):
+    def test_rolled_back_change_does_not_block_later_refreshes(self):
+        division = Division.objects.create(name='Brass', role='Senior')
+        venue = Venue.objects.create(date=date(2025, 1, 6), startTime=time(9), endTime=time(11))
+        # The refresh job is inserted in the transaction (Jobs/queue.py), so it rolls
+        # back with the change and leaves nothing behind that would skip later refreshes
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Attendance.objects.create(venue=venue, division=division, sessions=3, attendance=1)
+            raise RuntimeError('rolled back')
+
+        Attendance.objects.create(venue=venue, division=division, sessions=3, attendance=2)
+        run_pending()
+        rollup = AttendanceRollup.objects.get(division=division, date=venue.date)
+        self.assertEqual((rollup.sessions, rollup.attended), (3, 2))
+
+
+def png_upload(name, size=(1200, 600)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(THUMBNAILS={'WIDTHS': (160, 480), 'FORMATS': ('webp',)})
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.settings_override = self.settings(MEDIA_ROOT=self.media)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_variants_are_generated_by_the_queued_job(self):
+        division = Division.objects.create(name='Brass', role='Band', value=png_upload('brass.png'))
+        self.assertEqual(len(division.value_digest), 64)
+        names = [variant['name'] for variant in variants(division.value_digest)]
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+        run_pending()
+        for name, width in zip(names, (160, 480)):
+            with default_storage.open(name) as file, Image.open(file) as image:
+                self.assertEqual((image.format, image.size), ('WEBP', (width, width // 2)))
+
+        # Same bytes, same variants
+        again = Division.objects.create(name='Brass', role='Junior', value=png_upload('copy.png'))
+        self.assertEqual(again.value_digest, division.value_digest)
+        self.assertEqual(
+            [(variant['width'], variant['format']) for variant in DivisionListSerializer(again).data['value_variants']],
+            [(160, 'webp'), (480, 'webp')],
+        )
+
+        # Uploads from before digests existed are picked up by the backfill command
+        Division.objects.filter(pk=division.pk).update(value_digest='')
+        call_command('generate_thumbnails', stdout=io.StringIO())
+        division.refresh_from_db()
+        self.assertEqual(division.value_digest, again.value_digest)
+
+    def test_variants_are_generated_lazily_and_checked(self):
+        with self.settings(THUMBNAILS={'WIDTHS': (160, 480), 'FORMATS': ('webp',), 'GENERATE_ON_SAVE': False}):
+            division = Division.objects.create(name='Brass', role='Band', value=png_upload('brass.png', (300, 300)))
+        url = DivisionListSerializer(division).data['value_variants'][1]['url']
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (300, 300)) # not upscaled
+        self.assertEqual(self.client.get(url.replace('-480.', '-481.')).status_code, 404)
+        self.assertEqual(self.client.get(url.replace(division.value_digest[2:10], '0' * 8)).status_code, 404)
+
+    def test_non_images_get_no_variants(self):
+        venue = Venue.objects.create(date=date.today(), startTime=time(9),
+                                     img=SimpleUploadedFile('notes.txt', b'not an image'))
+        self.assertEqual(venue.img_digest, '')
+        venue.img = None
+        venue.save()
+        self.assertEqual(Venue.objects.get(pk=venue.pk).img_digest, '')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='member', password='secret', fname='Ann', lname='Lee')
+        self.client.force_authenticate(self.user)
+        self.brass = Division.objects.create(name='Brass Band', role='Senior')
+        self.hall = Venue.objects.create(date=date(2025, 3, 1), startTime=time(18, 30), place='Town Hall', role='Concert')
+        self.quarter = Venue.objects.create(date=date(2025, 3, 8), startTime=time(10), place='Brass Quarter')
+        self.request = PendingRequest.objects.create(venue=self.hall, division=self.brass, user=self.user,
+                                                     reason='Away at work')
+        run_pending()
+
+    def search(self, path, query):
+        return [row['id'] for row in self.client.get(path, {'search': query}).json()]
+
+    def test_results_are_ranked_and_match_joined_text(self):
+        # A title match outranks the division name in the hall's body
+        self.assertEqual(self.search('/venues/', 'brass'), [self.quarter.id, self.hall.id])
+        self.assertEqual(self.search('/venues/', 'hall 18:30'), [self.hall.id])
+        self.assertEqual(self.search('/venues/', 'to ha'), [self.hall.id]) # shorter than a trigram
+        self.assertEqual(self.search('/venues/', 'brass 2025-03-08'), [self.quarter.id])
+        self.assertEqual(self.search('/venues/', 'organ'), [])
+        self.assertEqual(self.search('/divisions/', 'senior'), [self.brass.id])
+        self.assertEqual(self.search('/pending-requests/', 'lee brass work'), [self.request.id])
+
+        response = self.client.get('/venues/', {'search': 'brass', 'ordering': 'date'})
+        self.assertEqual([row['id'] for row in response.json()], [self.hall.id, self.quarter.id])
+
+    def test_documents_follow_changes(self):
+        feedback = Feedback.objects.create(user=self.user, title='Scales', highlighted_title='Well done')
+        self.brass.name = 'Wind Band'
+        self.brass.save()
+        self.user.fname = 'Anna'
+        self.user.save()
+        run_pending()
+
+        self.assertEqual(self.search('/venues/', 'wind'), [self.hall.id])
+        self.assertEqual(self.search('/pending-requests/', 'anna wind'), [self.request.id])
+        self.assertEqual(self.search('/feedbacks/', 'well anna'), [feedback.id])
+
+        # Moving the request takes the division name along
+        self.request.venue = self.quarter
+        self.request.save()
+        run_pending()
+        self.assertEqual(self.search('/venues/', 'wind'), [self.quarter.id])
+
+        self.quarter.delete()
+        self.assertFalse(SearchDocument.objects.filter(kind='Data.Venue', object_id=self.quarter.id).exists())
+
+    def test_rebuild_command_restores_the_documents(self):
+        SearchDocument.objects.all().delete()
+        Venue.objects.filter(pk=self.hall.pk).update(place='Old Mill') # sends no signals
+        call_command('rebuild_search_index', if_empty=True, stdout=io.StringIO())
+        self.assertEqual(self.search('/venues/', 'mill'), [self.hall.id])
+        self.assertEqual(SearchDocument.objects.count(), 4)
+
+        Venue.objects.filter(pk=self.hall.pk).update(place='New Mill')
+        call_command('rebuild_search_index', if_empty=True, stdout=io.StringIO())
+        self.assertEqual(self.search('/venues/', 'new'), [])
@@ -0,0 +1,219 @@
+"""
+Resized WebP/AVIF variants of uploaded images.
+
+Division.value, Venue.img, PendingActivity.poster and User.profile_picture
+each have a `<field>_digest` column: the SHA-256 of the uploaded file, set
+by Data.signals when a new file is saved ('' when there is no file or it
+is not an image Pillow can open).  Variants are content addressed by it,
+
+    media/thumbs/3f/3f9c...e1-480.webp
+
+so re-uploading the same picture reuses its variants, and they never
+change once written.  Serializers expose them with ImageVariantsField:
+
+    "poster_variants": [{"width": 160, "format": "webp", "url": "https://.../3f9c...-160.webp"}, ...]
+
+A saved upload queues a 'thumbnails.generate' job (Data.jobs) that writes
+every variant; until it has run, thumbnail_view generates a requested
+variant on first access and serves the file from disk afterwards.  Only
+the configured widths and formats are ever generated.  Images narrower than
+a width are re-encoded at their own size rather than upscaled.  AVIF is
+skipped on Pillow builds that cannot write it.  `manage.py
+generate_thumbnails` fills the digests of files uploaded before this
+existed.
+
+    THUMBNAILS = {
+        'WIDTHS': (160, 480, 960),
+        'FORMATS': ('avif', 'webp'),
+        'QUALITY': 75,
+        'DIRECTORY': 'thumbs',
+        'GENERATE_ON_SAVE': True,
+    }
+"""
+import hashlib
+import io
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import Http404
+from django.views.static import serve
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+DEFAULTS = {
+    'WIDTHS': (160, 480, 960),
+    'FORMATS': ('avif', 'webp'), # in order of preference
+    'QUALITY': 75,
+    'DIRECTORY': 'thumbs',
+    'GENERATE_ON_SAVE': True,
+}
+
+# (app label, model name) -> image field; its digest lives in '<field>_digest'
+IMAGE_FIELDS = {
+    ('Data', 'Venue'): 'img',
+    ('Data', 'Division'): 'value',
+    ('Data', 'PendingActivity'): 'poster',
+    ('Account', 'User'): 'profile_picture',
+}
+
+CHUNK_SIZE = 1 << 20
+
+
+def thumbnail_settings():
+    return {**DEFAULTS, **getattr(settings, 'THUMBNAILS', {})}
+
+
+def digest_field(field):
+    return f'{field}_digest'
+
+
+def image_field(model):
+    return IMAGE_FIELDS[(model._meta.app_label, model._meta.object_name)]
+
+
+def image_models():
+    """(model, image field) pairs whose uploads get variants."""
+    return [(django_apps.get_model(app_label, model_name), field)
+            for (app_label, model_name), field in IMAGE_FIELDS.items()]
+
+
+def formats():
+    """The configured formats this Pillow build can write."""
+    Image.init()
+    return [fmt for fmt in thumbnail_settings()['FORMATS'] if fmt.upper() in Image.SAVE]
+
+
+def variant_name(digest, width, fmt):
+    return f"{thumbnail_settings()['DIRECTORY']}/{digest[:2]}/{digest}-{width}.{fmt}"
+
+
+def variants(digest):
+    """[{'width', 'format', 'name'}] of every variant of an image, best format first."""
+    if not digest:
+        return []
+    return [
+        {'width': width, 'format': fmt, 'name': variant_name(digest, width, fmt)}
+        for fmt in formats() for width in thumbnail_settings()['WIDTHS']
+    ]
+
+
+def file_digest(file):
+    """SHA-256 of an image file, or '' when Pillow cannot read it. Leaves the file at position 0."""
+    sha = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+        sha.update(chunk)
+    file.seek(0)
+    try:
+        with Image.open(file): # reads the header only
+            pass
+    except (UnidentifiedImageError, OSError):
+        return ''
+    finally:
+        file.seek(0)
+    return sha.hexdigest()
+
+
+def find_source(digest):
+    """Storage name of an original with this digest, or None."""
+    for model, field in image_models():
+        name = model.objects.filter(**{digest_field(field): digest}).values_list(field, flat=True).first()
+        if name:
+            return name
+    return None
+
+
+def backfill_digests(recompute=False):
+    """
+    Set the digest of every stored original that has none (every one with
+    recompute=True). Returns the set of digests of all originals.
+    """
+    digests = set()
+    for model, field in image_models():
+        rows = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        if not recompute:
+            digests.update(rows.exclude(**{digest_field(field): ''}).values_list(digest_field(field), flat=True))
+            rows = rows.filter(**{digest_field(field): ''})
+        for pk, name in rows.values_list('pk', field).iterator():
+            if not default_storage.exists(name):
+                continue
+            with default_storage.open(name, 'rb') as file:
+                digest = file_digest(file)
+            # update(), not save(): nothing else about the row changed
+            model.objects.filter(pk=pk).update(**{digest_field(field): digest})
+            if digest:
+                digests.add(digest)
+    return digests
+
+
+def _encode(image, width, fmt):
+    if image.width > width:
+        image = image.resize((width, max(round(image.height * width / image.width), 1)), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, fmt.upper(), quality=thumbnail_settings()['QUALITY'])
+    return buffer.getvalue()
+
+
+def generate(digest, only=None):
+    """
+    Write the missing variants of the image with `digest` (or just the `only`
+    one, a variant name). Returns the names written.
+    """
+    wanted = [variant for variant in variants(digest)
+              if (only is None or variant['name'] == only) and not default_storage.exists(variant['name'])]
+    if not wanted:
+        return []
+    source = find_source(digest)
+    if source is None:
+        return []
+
+    written = []
+    with default_storage.open(source, 'rb') as file, Image.open(file) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        # Largest first, so each resize starts from the smallest image that is still big enough
+        for variant in sorted(wanted, key=lambda variant: -variant['width']):
+            data = _encode(image, variant['width'], variant['format'])
+            saved = default_storage.save(variant['name'], ContentFile(data))
+            if saved != variant['name']: # written by a concurrent request meanwhile; same content
+                default_storage.delete(saved)
+            written.append(variant['name'])
+    return written
+
+
+def thumbnail_view(request, path):
+    """Serve a variant from MEDIA_ROOT, generating it on first request."""
+    name = f"{thumbnail_settings()['DIRECTORY']}/{path}"
+    digest = path.rsplit('/', 1)[-1].split('-', 1)[0]
+    if name not in {variant['name'] for variant in variants(digest)}:
+        raise Http404('Unknown image variant.')
+    if not default_storage.exists(name) and not generate(digest, only=name):
+        raise Http404('Unknown image.')
+    response = serve(request, name, document_root=settings.MEDIA_ROOT)
+    # Content addressed: a URL always names the same bytes
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+class ImageVariantsField(serializers.Field):
+    """Read-only list of {'width', 'format', 'url'} for the variants of the image in `field_name`."""
+
+    def __init__(self, field_name, **kwargs):
+        self.field_name_of_image = field_name
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        request = self.context.get('request')
+        result = []
+        for variant in variants(getattr(instance, digest_field(self.field_name_of_image), '')):
+            url = default_storage.url(variant['name'])
+            result.append({
+                'width': variant['width'],
+                'format': variant['format'],
+                'url': request.build_absolute_uri(url) if request is not None else url,
+            })
+        return result
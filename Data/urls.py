@@ -3,8 +3,10 @@ from rest_framework.routers import DefaultRouter
 from .views import csrf_token_view
 from .views import (
     VenueViewSet, SongsLearntViewSet, DivisionViewSet, AttendanceViewSet, AbsentViewSet, RatingsViewSet,
-    PerformanceViewSet, PendingRequestViewSet, PendingActivityViewSet, FeedbackViewSet, TestConnection
+    PerformanceViewSet, PendingRequestViewSet, PendingActivityViewSet, FeedbackViewSet, TestConnection,
+    AttendanceExportView
 )
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'activities', PendingActivityViewSet, basename='activity')
@@ -22,6 +24,13 @@ router.register(r'feedbacks', FeedbackViewSet, basename='feedback')
 urlpatterns = [
     path("test-connection/", TestConnection.as_view(), name="test_connection"),
     path("csrftoken/", csrf_token_view, name="csrftoken"),
+    path("export/attendance/", AttendanceExportView.as_view(), name="attendance_export"),
+    # Async (ASGI) read path, same payloads as the viewset actions
+    path("async/divisions/user/stat/", async_views.user_divisions_details, name="async_user_stat"),
+    path("async/divisions/get_all_users_divisions_details/", async_views.all_users_divisions_details,
+         name="async_all_users_divisions_details"),
+    path("async/divisions/user/<int:user_id>/venues/", async_views.user_venues, name="async_user_venues"),
+    path("async/attendances/monthly_attendance/", async_views.monthly_attendance, name="async_monthly_attendance"),
     path('', include(router.urls)),
     # [GET /activities/ - List all activities, POST /activities/ - Create new actiity, GET /activities/1/ - Retrieve single actiity
     # PUT /activities/1/ - Update actiity, DELETE /activities/1/ - Delete actiity, GET /activities/?search=term - Search activities]
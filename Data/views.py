@@ -3,34 +3,232 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Avg, Q, Sum, Max, Min, F, ExpressionWrapper, DurationField
-from django.db.models import Exists, OuterRef
+from django.db.models import Count, Avg, Q, F
+from django.db.models import Exists, OuterRef, Case, When, Value, CharField
 from django.utils import timezone
-from datetime import timedelta, date
+from datetime import timedelta, date, datetime
 from dateutil.relativedelta import relativedelta
-from django.db.models.functions import TruncMonth
 
 from rest_framework import viewsets, filters, status
 from drf_nested_forms.parsers import NestedMultiPartParser
 from .models import (
-    Venue, SongsLearnt, Division, Attendance, Absent,
+    Venue, SongsLearnt, Division, Attendance, Absent, AttendanceRollup,
     Ratings, Performance, PendingRequest, PendingActivity, Feedback
 )
 from .serializers import (
     VenueSerializer, SongsLearntSerializer, DivisionListSerializer,
     DivisionDetailSerializer, AttendanceSerializer, AbsentSerializer, 
     RatingsSerializer, PerformanceSerializer, PendingRequestSerializer,
-    PendingActivitySerializer, FeedbackSerializer
+    PendingActivitySerializer, FeedbackSerializer, attendance_rows, absent_rows
 )
+from .planning import PlannedQuerysetMixin, plan_queryset
+from .rollups import rollup_totals, top_absence_reason
+from .exports import EXPORT_FORMATS, export_lines, export_rows
+from .ingest import BulkIngestMixin
+from .caching import cache_response
+from .search import RankedSearchFilter
+from .timeseries import attendance_matrix, monthly_rows
+from Database.replicas import read_replica
 
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError, transaction
 from django.views.decorators.http import require_GET
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.middleware.csrf import get_token
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 
+User = get_user_model()
+
+
+def user_venue_groups(target_user, division_ids):
+    """
+    Venues requested for `division_ids` in the 'new', 'pending', 'accepted'
+    and 'rejected' buckets of `target_user`, from one query.  Each (venue,
+    request) pair is labelled with the bucket its state puts it in ('accepted'
+    covers attended too); the buckets are mutually exclusive, so a venue only
+    appears in several of them through different requests.  The requests are
+    read from the (division, state, venue, user) index.
+    """
+    now = timezone.now()
+    current_date = now.date()
+    current_time = now.time()
+    own = Q(pending_requests__user=target_user)
+    state = Case(
+        When(
+            Q(pending_requests__state=PendingRequest.NEW)
+            & (Q(date__lt=current_date) | Q(date=current_date, startTime__lt=current_time)),
+            then=Value('new'),
+        ),
+        When(own & Q(pending_requests__state=PendingRequest.PENDING), then=Value('pending')),
+        When(own & Q(pending_requests__state__in=[PendingRequest.ACCEPTED, PendingRequest.ATTENDED]),
+             then=Value('accepted')),
+        When(own & Q(pending_requests__state=PendingRequest.REJECTED), then=Value('rejected')),
+        default=None,
+        output_field=CharField(),
+    )
+    venues = (
+        Venue.objects.filter(pending_requests__division_id__in=division_ids)
+        .annotate(state=state)
+        .exclude(state=None)
+        .distinct()
+        .prefetch_related('divisions')
+    )
+
+    venue_groups = {'new': [], 'pending': [], 'accepted': [], 'rejected': []}
+    for venue in venues:
+        venue_groups[venue.state].append(venue)
+    return venue_groups
+
+
+# The read paths below are shared with the async views (Data.async_views).
+# Endpoints with several independent queries return them as {name: callable}
+# so the async views can run them concurrently; run_queries() runs them in turn.
+
+def run_queries(queries):
+    return {name: query() for name, query in queries.items()}
+
+
+def date_range(params):
+    """startDate/endDate, defaulting to the current month so far. Raises ValueError."""
+    start = params.get('startDate')
+    end = params.get('endDate')
+    return (
+        datetime.strptime(start, '%Y-%m-%d').date() if start else date.today().replace(day=1),
+        datetime.strptime(end, '%Y-%m-%d').date() if end else date.today(),
+    )
+
+
+def division_list_data(divisions):
+    return DivisionListSerializer(plan_queryset(divisions, DivisionListSerializer(many=True)), many=True).data
+
+
+def user_stat_divisions(target_user, div_id):
+    """The divisions user/stat reports on: `target_user`'s (everyone's for None), narrowed to ?divId."""
+    if target_user is None:
+        divisions = Division.objects.all()
+        return divisions.filter(id=div_id) if div_id and div_id != 'all' else divisions
+    return target_user.divisions.all() if div_id == 'all' else target_user.divisions.filter(id=div_id)
+
+
+def user_stat_queries(target_user, user_divisions, start, end, with_divisions=True):
+    """The queries of DivisionViewSet.get_user_divisions_details; see user_stat_payload()."""
+    # Common filter for all venue-related queries
+    date_filter = {'venue__date__range': [start, end]}
+    queries = {
+        # Statistics, summed from the per day rollup in one query
+        'totals': lambda: rollup_totals(AttendanceRollup.objects.filter(
+            division__in=user_divisions,
+            date__range=[start, end]
+        )),
+        'attendances': lambda: attendance_rows(Attendance.objects.filter(
+            division__in=user_divisions,
+            **date_filter
+        ).order_by('venue__date', 'id')),
+        'absents': lambda: absent_rows(Absent.objects.filter(
+            division__in=user_divisions,
+            **date_filter
+        ).order_by('id')),
+    }
+    if with_divisions:
+        divisions = target_user.divisions.all() if target_user else Division.objects.all()
+        queries['divisions'] = lambda: division_list_data(divisions) # This was supposed to be on it's own action
+    return queries
+
+
+def user_stat_payload(results, start, end):
+    totals = results['totals']
+    total_sessions = totals['sessions'] + totals['absent_sessions']
+    total_attended = totals['attended']
+
+    serializers = {'attendances': results['attendances'], 'absents': results['absents']}
+    if 'divisions' in results:
+        serializers['divisions'] = results['divisions']
+
+    return {
+        'stats': {
+            'totalSessions': total_sessions,
+            'attendedSessions': total_attended,
+            'totalHours': (totals['attended_duration'] + totals['absent_duration']).total_seconds(),
+            'attendedHours': totals['attended_duration'].total_seconds(),
+            'attendancePercentage': (total_attended/total_sessions)*100 if total_sessions > 0 else 0,
+        },
+        'serializers': serializers,
+        'date_range': {
+            'start': start.isoformat(),
+            'end': end.isoformat()
+        }
+    }
+
+
+def all_users_stat_queries(divisions):
+    """The queries of DivisionViewSet.get_all_users_divisions_details; see all_users_stat_payload()."""
+    # Statistics, summed from the per day rollup
+    rollups = AttendanceRollup.objects.filter(division__in=divisions)
+
+    def stats():
+        totals = rollup_totals(rollups)
+        total_sessions = totals['sessions'] + totals['absent_sessions']
+        total_attended = totals['attended']
+        return {
+            'totalSessions': total_sessions,
+            'attendedSessions': total_attended,
+            'attendancePercentage': (total_attended/total_sessions)*100 if total_sessions > 0 else 0,
+            'top_absence_reason': top_absence_reason(rollups) if(total_sessions-total_attended>0) else ""
+        }
+
+    return {
+        'stats': stats,
+        'attendances': lambda: attendance_rows(
+            Attendance.objects.filter(division__in=divisions).distinct().order_by('venue__date', 'id')
+        ),
+        'absents': lambda: absent_rows(Absent.objects.filter(division__in=divisions).distinct().order_by('id')),
+        'divisions': lambda: division_list_data(divisions),
+    }
+
+
+def all_users_stat_payload(results, start, end):
+    return {
+        'stats': results['stats'],
+        'serializers': {
+            'attendances': results['attendances'],
+            'absents': results['absents'],
+            'divisions': results['divisions'],
+        },
+        'date_range': {
+            'start': start.isoformat(),
+            'end': end.isoformat()
+        }
+    }
+
+
+def user_venues_data(request, target_user):
+    """The payload of DivisionViewSet.user_venues."""
+    user_division_ids = set(target_user.divisions.values_list('id', flat=True))
+    # Venues of the user's divisions, bucketed by their own requests
+    venue_groups = user_venue_groups(target_user, user_division_ids)
+
+    # Serialize with target user in context; is_user_associated becomes
+    # a lookup in the user's division ids
+    context = {
+        'request': request,
+        'target_user': target_user,  # Pass user to serializer
+        'target_division_ids': user_division_ids,
+    }
+    return {
+        key: VenueSerializer(value, many=True, context=context).data
+        for key, value in venue_groups.items()
+    }
+
+
+def monthly_attendance_data(total_months):
+    """The payload of AttendanceViewSet.monthly_attendance."""
+    today = timezone.now().date()
+    start_date = today - relativedelta(months=total_months)
+    # Through the end of this month, like the open-ended filter this replaced
+    matrix = attendance_matrix(start_date, today + relativedelta(day=31))
+    return monthly_rows(matrix)
+
 
 @require_GET
 def csrf_token_view(request):
@@ -45,19 +243,22 @@ class PendingActivityViewSet(viewsets.ModelViewSet):
     parser_classes = [NestedMultiPartParser]
     permission_classes = [AllowAny]
 
+    @cache_response(PendingActivity, Venue)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def perform_destroy(self, instance):
         # Delete associated Venue when Activity is deleted
         if instance.venue:
             instance.venue.delete()
         super().perform_destroy(instance)
         
-class VenueViewSet(viewsets.ModelViewSet):
+class VenueViewSet(PlannedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Venue.objects.all()
     serializer_class = VenueSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['date', 'place', 'role']
-    search_fields = ['place', 'role', 'startTime', 'endTime', 'date', 'divisions__name']
     ordering_fields = ['date', 'startTime', 'place']
     
     def get_queryset(self):
@@ -76,12 +277,14 @@ class VenueViewSet(viewsets.ModelViewSet):
         return queryset
     
     @action(detail=False, methods=['get'])
+    @cache_response(Venue, PendingRequest, Division, per_day=True)
     def upcoming(self, request):
         """Get venues scheduled in the next 30 days"""
         upcoming_venues = Venue.objects.filter(
             date__gte=timezone.now().date(),
             date__lte=timezone.now().date() + timedelta(days=30)
         ).order_by('date', 'startTime')
+        upcoming_venues = plan_queryset(upcoming_venues, self.get_serializer())
         
         serializer = self.get_serializer(upcoming_venues, many=True)
         return Response(serializer.data)
@@ -98,10 +301,12 @@ class VenueViewSet(viewsets.ModelViewSet):
     def with_division(self, request):
         venues = Venue.objects.filter(divisions__isnull=False).distinct()
         venues = self.filter_queryset(venues)
+        venues = plan_queryset(venues, self.get_serializer())
         serializer = self.get_serializer(venues, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'], url_path='upcoming-with-division')
+    @cache_response(Venue, PendingRequest, Division, User, per_day=True)
     def upcoming_with_division(self, request):
         """Get upcoming venues (next 30 days) associated with divisions, filtered by users"""
         """GET venues/upcoming-with-division/?users=1,3&search=Training&ordering=-date"""
@@ -132,6 +337,7 @@ class VenueViewSet(viewsets.ModelViewSet):
         queryset = queryset.distinct()
         queryset = self.filter_queryset(queryset)  # Applies search/ordering
         queryset = queryset.order_by('date', 'startTime')  # Default ordering
+        queryset = plan_queryset(queryset, self.get_serializer())
         
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
@@ -187,6 +393,10 @@ class SongsLearntViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(date__lte=end_date)
             
         return queryset
+
+    @cache_response(SongsLearnt, Division)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
     
     @action(detail=True, methods=['get'])
     def divisions(self, request, pk=None):
@@ -197,12 +407,11 @@ class SongsLearntViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class DivisionViewSet(viewsets.ModelViewSet):
+class DivisionViewSet(PlannedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Division.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['name', 'role', 'isRegistered', 'is_active', 'showRatings', 'showVenue', 'showUser']
-    search_fields = ['name', 'role', 'userRole', 'shortWords', 'title']
     ordering_fields = ['name', 'created_at']
     
     def get_serializer_class(self):
@@ -247,6 +456,19 @@ class DivisionViewSet(viewsets.ModelViewSet):
             queryset = queryset.order_by(*new_order)
         
         return queryset
+
+    # Divisions render nearly every Data model; is_joined and is_owner depend on the user
+    DIVISION_DEPENDENCIES = (
+        Division, Venue, SongsLearnt, Attendance, Absent, Ratings, Performance, PendingRequest, User,
+    )
+
+    @cache_response(*DIVISION_DEPENDENCIES, per_user=True)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(*DIVISION_DEPENDENCIES, per_user=True)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     @action(detail=True, methods=['post'])
     def create_venue(self, request, pk=None):
@@ -280,252 +502,55 @@ class DivisionViewSet(viewsets.ModelViewSet):
     
 
     @action(detail=False, methods=['get'], url_path='user/stat')
+    @read_replica
     def get_user_divisions_details(self, request):
-        """Get divisions by user ID with date filtering"""
-        from datetime import datetime
-
+        """
+        Get divisions by user ID with date filtering
+        Pass ?divisions=false to leave out the embedded division list.
+        """
         user_id = request.query_params.get('userId')
         divId = request.query_params.get('divId')
 
-        user_divisions = None
         target_user = None
-        if user_id is None or user_id == 'all':
-            user_divisions = Division.objects.all() 
-            if divId and divId != 'all':
-                user_divisions = user_divisions.filter(id=divId)
-        else:
+        if user_id is not None and user_id != 'all':
             User = get_user_model()
             target_user = get_object_or_404(User, id=user_id)
-            user_divisions =  target_user.divisions.all() if divId=='all' else target_user.divisions.filter(id=divId)
-        
+        user_divisions = user_stat_divisions(target_user, divId)
+
         # Parse dates with validation
-        start_date_str = request.query_params.get('startDate')
-        end_date_str = request.query_params.get('endDate')
-        
         try:
-            startDate = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str \
-                else date.today().replace(day=1)
-            endDate = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str \
-                else date.today()
+            startDate, endDate = date_range(request.query_params)
         except ValueError:
             return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, 
                         status=status.HTTP_400_BAD_REQUEST)
 
-        # Common filter for all venue-related queries
-        date_filter = {
-            'venue__date__range': [startDate, endDate]
-        }
-
-        # Attendance calculations
-        attendance_queryset = Attendance.objects.filter(
-            division__in=user_divisions,
-            **date_filter
-        ).distinct()
-
-        attendance_totals = attendance_queryset.aggregate(
-            total_sessions=Sum('sessions'),
-            total_attended=Sum('attendance')
-        )
-
-        # Absence calculations
-        absent_queryset = Absent.objects.filter(
-            division__in=user_divisions,
-            **date_filter
-        ).distinct()
-
-        absent_totals = absent_queryset.aggregate(
-            total_sessions=Sum('sessions'),
-        )
-
-        # Duration calculations
-        absents = absent_queryset.annotate(
-            duration=ExpressionWrapper(
-                F('venue__endTime') - F('venue__startTime'),
-                output_field=DurationField()
-            )
-        )
-
-        attendances = attendance_queryset.annotate(
-            duration=ExpressionWrapper(
-                F('venue__endTime') - F('venue__startTime'),
-                output_field=DurationField()
-            )
-        )
-
-        attendances = attendances.annotate(
-            earliest_venue_date=Min('venue__date')
-        ).order_by('earliest_venue_date')
-        
-        # Statistics
-        attendance_duration_data = attendances.aggregate(total_duration=Sum('duration'))
-        absent_duration_data = absents.aggregate(total_duration=Sum('duration'))
-
-        total_sessions = (attendance_totals['total_sessions'] or 0) + (absent_totals['total_sessions'] or 0)
-        total_attended = attendance_totals['total_attended'] or 0
-
-        stats = {
-            'totalSessions': total_sessions,
-            'attendedSessions': attendance_totals['total_attended'] or 0,
-            'totalHours': ((attendance_duration_data['total_duration'] or timedelta(0)) + 
-                           ((absent_duration_data['total_duration'] or timedelta(0)))).total_seconds(),
-            'attendedHours': (attendance_duration_data['total_duration'] or timedelta(0)).total_seconds(),
-            'attendancePercentage': (total_attended/total_sessions)*100 if total_sessions > 0 else 0,
-        }
-
-        serializers = {
-            'attendances': AttendanceSerializer(attendances, many=True).data,
-            'absents': AbsentSerializer(absents, many=True).data,
-            'divisions': DivisionListSerializer(
-                target_user.divisions.all() if target_user else Division.objects.all(),
-                many=True
-            ).data # This was supposed to be on it's own action
-        }
-
-        return Response({
-            'stats': stats,
-            'serializers': serializers,
-            'date_range': {
-                'start': startDate.isoformat(),
-                'end': endDate.isoformat()
-            }
-        })
+        with_divisions = request.query_params.get('divisions', 'true').lower() != 'false'
+        results = run_queries(user_stat_queries(target_user, user_divisions, startDate, endDate, with_divisions))
+        return Response(user_stat_payload(results, startDate, endDate))
         
     @action(detail=False, methods=['get'])
+    @read_replica
     def get_all_users_divisions_details(self, request):
         """Get divisions by user ID with date filtering"""
-        from datetime import datetime
-        
-        
         divId = request.query_params.get('divId')
         divisions = Division.objects.all() if divId=='all' or divId is None else Division.objects.filter(id=divId)
         
         # Parse dates with validation
         try:
-            start_date_str = request.query_params.get('startDate')
-            end_date_str = request.query_params.get('endDate')
-            
-            startDate = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str \
-                else date.today().replace(day=1)
-            endDate = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str \
-                else date.today()
+            startDate, endDate = date_range(request.query_params)
         except ValueError:
             return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, 
                         status=status.HTTP_400_BAD_REQUEST)
 
-        # Common filter for all venue-related queries
-        date_filter = {
-            'venue__date__range': [startDate, endDate]
-        }
-        
-        
-        # Attendance calculations
-        attendance_queryset = Attendance.objects.filter(
-            division__in=divisions
-        ).distinct()
-
-        attendance_totals = attendance_queryset.aggregate(
-            total_sessions=Sum('sessions'),
-            total_attended=Sum('attendance')
-        )
-
-        # Absence calculations
-        absent_queryset = Absent.objects.filter(
-            division__in=divisions
-        ).distinct()
-
-        absent_totals = absent_queryset.aggregate(
-            total_sessions=Sum('sessions'),
-        )
-
-
-        total_sessions = (attendance_totals['total_sessions'] or 0) + (absent_totals['total_sessions'] or 0)
-        total_attended = attendance_totals['total_attended'] or 0
-
-        stats = {
-            'totalSessions': total_sessions,
-            'attendedSessions': attendance_totals['total_attended'] or 0,
-            'attendancePercentage': (total_attended/total_sessions)*100 if total_sessions > 0 else 0,
-            'top_absence_reason': absent_queryset.values('reason').annotate(value=Count('reason')).order_by('-value')
-                .first() if(total_sessions-total_attended>0) else ""
-        }
-
-
-        serializers = {
-            'attendances': AttendanceSerializer(attendance_queryset, many=True).data,
-            'absents': AbsentSerializer(absent_queryset, many=True).data,
-            'divisions': DivisionListSerializer(divisions, many=True).data,
-        }
-
-        return Response({
-            'stats': stats,
-            'serializers': serializers,
-            'date_range': {
-                'start': startDate.isoformat(),
-                'end': endDate.isoformat()
-            }
-        })
+        results = run_queries(all_users_stat_queries(divisions))
+        return Response(all_users_stat_payload(results, startDate, endDate))
         
     @action(detail=False, methods=['get'], url_path='user/(?P<user_id>[^/.]+)/venues')
     def user_venues(self, request, user_id=None):
         """Get venues by user ID with association check"""
-        # 1. Get target user from URL parameter
         User = get_user_model()
         target_user = get_object_or_404(User, id=user_id)
-        
-        # 2. Get user's divisions
-        user_divisions = target_user.divisions.all()
-        
-        # 3. Filter venues based on user's divisions and their own pending requests
-        now = timezone.now()
-        current_date = now.date()
-        current_time = now.time()
-        venue_groups = {
-            'new': Venue.objects.filter(
-                pending_requests__division__in=user_divisions,
-                pending_requests__pending=False,
-                pending_requests__admin_check=False,
-                pending_requests__admin_accept=False
-            ).filter(
-                Q(date__lt=current_date) | 
-                Q(date=current_date, startTime__lt=current_time)
-            ).distinct(),
-            'pending': Venue.objects.filter(
-                pending_requests__division__in=user_divisions,
-                pending_requests__user=target_user,
-                pending_requests__pending=True,
-                pending_requests__admin_check=False,
-                pending_requests__admin_accept=False
-            ).distinct(),
-            'accepted': Venue.objects.filter(
-                pending_requests__division__in=user_divisions,
-                pending_requests__user=target_user,
-                pending_requests__pending=False,
-                pending_requests__admin_check=True,
-                pending_requests__admin_accept=True
-            ).distinct(),
-            'rejected': Venue.objects.filter(
-                pending_requests__division__in=user_divisions,
-                pending_requests__user=target_user,
-                pending_requests__pending=True,
-                pending_requests__admin_check=True,
-                pending_requests__admin_accept=False
-            ).distinct(),
-        }
-
-        # 4. Serialize with target user in context
-        serialized = {
-            key: VenueSerializer(
-                value, 
-                many=True, 
-                context={
-                    'request': request,
-                    'target_user': target_user  # Pass user to serializer
-                }
-            ).data
-            for key, value in venue_groups.items()
-        }
-        
-        return Response(serialized)
+        return Response(user_venues_data(request, target_user))
     
     @action(detail=True, methods=['post'])
     def process_venue_response(self, request, pk=None):
@@ -539,44 +564,47 @@ class DivisionViewSet(viewsets.ModelViewSet):
         venue_id = request.data.get('id')
         venue = Venue.objects.get(id=venue_id)
         try:
-            request_obj = PendingRequest.objects.get(
-                division=division,
-                venue=venue
-            )
-            if(is_user_state):
-                try:
-                    request_obj.user = get_user_model().objects.get(username=username)
-                except: 
-                    pass
-                if(not req_admin_review):
-                    request_obj.reason = reason
-                    request_obj.attended = False
-                    Absent.objects.create(
-                        venue=venue,
-                        division=division, 
-                        reason=reason
-                    )
-                request_obj.admin_check = not req_admin_review
-                request_obj.admin_accept = not req_admin_review
-                request_obj.pending = req_admin_review
-            else:
-                if(req_admin_accept):
-                    request_obj.attended = True
-                    Attendance.objects.create(
-                        venue=venue,
-                        division=division,
-                        sessions=2,
-                        attendance=2,
-                    )
-                request_obj.pending = not req_admin_accept
-                request_obj.admin_check = True
-                request_obj.admin_accept = req_admin_accept
+            # The rollup and leaderboard refreshes it triggers are queued (Data.jobs) and commit with it
+            with transaction.atomic():
+                request_obj = PendingRequest.objects.get(
+                    division=division,
+                    venue=venue
+                )
+                if(is_user_state):
+                    try:
+                        request_obj.user = get_user_model().objects.get(username=username)
+                    except: 
+                        pass
+                    if(not req_admin_review):
+                        request_obj.reason = reason
+                        Absent.objects.create(
+                            venue=venue,
+                            division=division, 
+                            reason=reason
+                        )
+                        request_obj.state = PendingRequest.ACCEPTED
+                    else:
+                        request_obj.state = PendingRequest.PENDING
+                else:
+                    if(req_admin_accept):
+                        Attendance.objects.create(
+                            venue=venue,
+                            division=division,
+                            sessions=2,
+                            attendance=2,
+                        )
+                        request_obj.state = PendingRequest.ATTENDED
+                    else:
+                        request_obj.state = PendingRequest.REJECTED
                               
-            request_obj.save()
+                # Raises ValidationError for a move PendingRequest.TRANSITIONS doesn't allow
+                request_obj.save()
             
             return Response({'detail': 'Venue request approved.'}, status=status.HTTP_200_OK)
         except PendingRequest.DoesNotExist:
             return Response({'detail': 'Pending request not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({'detail': e.message_dict}, status=status.HTTP_400_BAD_REQUEST)
     
     
     @action(detail=True, methods=['get'])
@@ -601,10 +629,10 @@ class DivisionViewSet(viewsets.ModelViewSet):
     def attendance_stats(self, request, pk=None):
         """Get attendance statistics for this division"""
         division = self.get_object()
-        attendance_data = division.attendance.all()
+        totals = rollup_totals(division.attendance_rollups.all())
         
-        total_sessions = sum(data.sessions for data in attendance_data)
-        total_attendance = sum(data.attendance for data in attendance_data)
+        total_sessions = totals['sessions']
+        total_attendance = totals['attended']
         
         attendance_rate = (total_attendance / total_sessions * 100) if total_sessions else 0
         
@@ -615,37 +643,20 @@ class DivisionViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=True, methods=['get'])
+    @read_replica
     def ratings_stats(self, request, pk=None):
         """Get rating statistics for this division"""
         division = self.get_object()
-        ratings = division.ratings.all()
-        
-        if not ratings:
-            return Response({
-                'average': 0,
-                'count': 0,
-                'distribution': {
-                    '1': 0, '2': 0, '3': 0, '4': 0, '5': 0
-                }
-            })
-        
-        avg_rating = ratings.aggregate(avg=Avg('value'))['avg']
-        distribution = {
-            '1': ratings.filter(value__lt=2).count(),
-            '2': ratings.filter(value__gte=2, value__lt=3).count(),
-            '3': ratings.filter(value__gte=3, value__lt=4).count(),
-            '4': ratings.filter(value__gte=4, value__lt=5).count(),
-            '5': ratings.filter(value__gte=5).count(),
-        }
+        avg_rating = division.rating_average
         
         return Response({
             'average': round(avg_rating, 2) if avg_rating else 0,
-            'count': ratings.count(),
-            'distribution': distribution
+            'count': division.rating_count,
+            'distribution': division.rating_distribution
         })
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(BulkIngestMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated]
@@ -663,48 +674,88 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     
     
     @action(detail=False, methods=['get'])
+    @read_replica
     def monthly_attendance(self, request):
         total_months = int(request.data.get('totalMonths', 3))
+        return Response(monthly_attendance_data(total_months))
+
+    @action(detail=False, methods=['get'])
+    @cache_response(AttendanceRollup, Division, per_day=True)
+    def matrix(self, request):
+        """
+        GET /attendances/matrix/?startDate=2021-01-01&endDate=2025-12-31&granularity=month&divisions=1,2&metric=attended
+        Columnar bucket x division totals, see Data.timeseries. Defaults to the last 12 months by month.
+        """
+        params = request.query_params
         today = timezone.now().date()
-        start_date = today - relativedelta(months=total_months)
+        try:
+            end = datetime.strptime(params['endDate'], '%Y-%m-%d').date() if params.get('endDate') else today
+            start = (
+                datetime.strptime(params['startDate'], '%Y-%m-%d').date() if params.get('startDate')
+                else (end - relativedelta(months=11)).replace(day=1)
+            )
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            division_ids = [int(pk) for pk in params['divisions'].split(',')] if params.get('divisions') else None
+        except ValueError:
+            return Response({'error': 'divisions must be a comma separated list of ids.'},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        # Generate list of month starts
-        months = []
-        current = start_date.replace(day=1)
-        while current <= today:
-            months.append(current)
-            current += relativedelta(months=1)
+        try:
+            matrix = attendance_matrix(
+                start, end,
+                granularity=params.get('granularity', 'month'),
+                division_ids=division_ids,
+                metric=params.get('metric', 'attended'),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(matrix)
 
-        # Query and process data
-        divisions = Division.objects.all()
-        aggregated = (
-            self.get_queryset()
-            .filter(venue__date__gte=start_date)
-            .annotate(month=TruncMonth('venue__date'))
-            .values('month', 'division__name')
-            .annotate(total_attended=Sum('attendance'))
-        )
 
-        # Create lookup dictionary
-        attendance_map = {
-            (entry['month'].strftime('%Y-%m'), entry['division__name']): 
-            entry['total_attended'] for entry in aggregated
-        }
+class AttendanceExportView(APIView):
+    """
+    GET /export/attendance/?startDate=2025-01-01&endDate=2025-12-31&divId=3&output=csv
+    Streams attendance and absence history as NDJSON (default) or CSV
+    """
+    permission_classes = [IsAuthenticated]
 
-        # Build result structure
-        result = []
-        for month in months:
-            item = {}
-            item['month'] = month.strftime("%B")
-            for div in divisions:
-                item[div.name] = attendance_map.get((month.strftime('%Y-%m'), div.name), 0)
-            result.append(item)
-            
-        
-        return Response(result)
+    def get(self, request):
+        from datetime import datetime
 
+        if not request.user.is_admin:
+            return Response({'detail': 'Only admins can export attendance.'}, status=status.HTTP_403_FORBIDDEN)
 
-class AbsentViewSet(viewsets.ModelViewSet):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            return Response({'error': f"output must be one of {', '.join(EXPORT_FORMATS)}."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            start_date_str = request.query_params.get('startDate')
+            end_date_str = request.query_params.get('endDate')
+            startDate = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else None
+            endDate = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else None
+        except ValueError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD.'}, 
+                        status=status.HTTP_400_BAD_REQUEST)
+
+        divId = request.query_params.get('divId')
+        try:
+            # Checked here: once streaming has started, an error can only truncate the file
+            division_ids = [int(divId)] if divId and divId != 'all' else None
+        except ValueError:
+            return Response({'error': 'divId must be a division id or "all".'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+        rows = export_rows(start=startDate, end=endDate, division_ids=division_ids)
+        response = StreamingHttpResponse(export_lines(output, rows), content_type=EXPORT_FORMATS[output])
+        response['Content-Disposition'] = f'attachment; filename="attendance.{output}"'
+        return response
+
+
+class AbsentViewSet(BulkIngestMixin, viewsets.ModelViewSet):
     queryset = Absent.objects.all()
     serializer_class = AbsentSerializer
     permission_classes = [IsAuthenticated]
@@ -809,6 +860,7 @@ class RatingsViewSet(viewsets.ModelViewSet):
     #     return Response(divisions)
 
     @action(detail=False, methods=['get'])
+    @cache_response(Ratings, Division)
     def division_average(self, request):
         division_id = request.query_params.get('divId')
         if not division_id:
@@ -830,9 +882,8 @@ class PendingRequestViewSet(viewsets.ModelViewSet):
     queryset = PendingRequest.objects.all()
     serializer_class = PendingRequestSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['user', 'venue', 'attended', 'pending']
-    search_fields = ['reason', 'user__fname', 'user__lname', 'division__name', 'division__role']
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter]
+    filterset_fields = ['user', 'venue', 'state', 'attended', 'pending']
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -858,12 +909,8 @@ class PendingRequestViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def venues(self, request):
         """Get all pending venue requests available for all users in all divisions"""
-        pending_req = PendingRequest.objects.filter(user__isnull=False).filter(
-            Q(
-                pending=True,
-                admin_check=False
-            )
-        ).distinct()
+        # The answered, unreviewed requests: a scan of the pendreq_review_queue_idx partial index
+        pending_req = PendingRequest.objects.filter(user__isnull=False, state=PendingRequest.PENDING)
         pending_req = self.filter_queryset(pending_req)
         return Response(self.get_serializer(pending_req, many=True).data)
     
@@ -879,9 +926,11 @@ class PendingRequestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        pending_request.accepted = True
-        pending_request.pending = False
-        pending_request.save()
+        pending_request.state = PendingRequest.ACCEPTED
+        try:
+            pending_request.save()
+        except ValidationError as e:
+            return Response({"detail": e.message_dict}, status=status.HTTP_400_BAD_REQUEST)
         
         # If this was an attendance request, create an attendance record
         if pending_request.attended and pending_request.divId and pending_request.venue:
@@ -903,9 +952,11 @@ class PendingRequestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
             
-        pending_request.accepted = False
-        pending_request.pending = False
-        pending_request.save()
+        pending_request.state = PendingRequest.REJECTED
+        try:
+            pending_request.save()
+        except ValidationError as e:
+            return Response({"detail": e.message_dict}, status=status.HTTP_400_BAD_REQUEST)
             
         serializer = self.get_serializer(pending_request)
         return Response(serializer.data)
@@ -918,9 +969,8 @@ class FeedbackViewSet(viewsets.ModelViewSet):
     queryset = Feedback.objects.all().order_by('-created_at')
     serializer_class = FeedbackSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter]
     filterset_fields = ['user', 'sender', 'completed']
-    search_fields = ['title', 'highlitedTitle', 'desc', 'user__fname', 'user__lname']
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -936,7 +986,7 @@ class FeedbackViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def render(self, request):
-        """Render a pending request with atomic shown_count update"""
+        """Render the user's least shown feedback and count the impression"""
         user_id = request.query_params.get('userId')
 
         if not user_id:
@@ -945,36 +995,22 @@ class FeedbackViewSet(viewsets.ModelViewSet):
         User = get_user_model()
         target_user = get_object_or_404(User, id=user_id)
 
-        try:
-            with transaction.atomic():
-                # Get and lock the target feedback using atomic selection
-                selected_feedback = (
-                    Feedback.objects
-                    .filter(user=target_user)
-                    .select_for_update()
-                    .order_by('shown_count', '-created_at')
-                    .first()
-                )
-                
-                if not selected_feedback:
-                    return Response(
-                        {"detail": "No feedback found for this user."},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-
-                # Update shown_count atomically
-                selected_feedback.shown_count = F('shown_count') + 1
-                selected_feedback.save()
-                
-                # Refresh instance to get updated shown_count value
-                selected_feedback.refresh_from_db()
-
-        except Exception as e:
+        selected_feedback = (
+            Feedback.objects
+            .filter(user=target_user)
+            .order_by('shown_count', '-created_at')
+            .first()
+        )
+        if not selected_feedback:
             return Response(
-                {"detail": f"Error processing request: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {"detail": "No feedback found for this user."},
+                status=status.HTTP_404_NOT_FOUND
             )
 
+        # One UPDATE, without holding a row lock for the render; the next render sees the new count
+        Feedback.objects.filter(pk=selected_feedback.pk).update(shown_count=F('shown_count') + 1)
+        selected_feedback.shown_count += 1
+
         serializer = self.get_serializer(selected_feedback, many=False)
         return Response(serializer.data)
     
@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Serve with uvicorn workers so the async read views (Data/async_views.py)
+don't tie up a worker while they wait on the database:
+
+    gunicorn Database.asgi:application -k uvicorn.workers.UvicornWorker -w 4
 """
 
 import os
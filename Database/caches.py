@@ -0,0 +1,79 @@
+"""
+Cache configuration: CACHES['default'] from CACHE_URL.
+
+Several features write cache keys in one process that every other process
+must see: the model versions behind cached responses and ETags
+(Data.caching, bumped by web workers and by `run_jobs`), cached session
+payloads (Account.session), JWT user snapshots (Tokens.usercache) and
+read-your-writes pins (Database.replicas).  Set CACHE_URL to a shared
+in-memory cache:
+
+    CACHE_URL=redis://cache:6379/0       RedisCache (pip install redis)
+    CACHE_URL=memcached://cache:11211    PyMemcacheCache (pip install pymemcache)
+
+Without it the fallback is the DatabaseCache in the django_cache table
+(`manage.py createcachetable`, run by build.sh).  It is shared, so the
+replica pins and `run_jobs` work, but each read or write is a query (and a
+cull COUNT(*) per write), so the caches that exist to save queries
+(saves_queries()) switch themselves off on it.  CACHE_URL=locmem:// is a
+per-process memory cache; features needing a shared cache switch
+themselves off on it (is_shared()), `manage.py check` warns about both
+(Database.checks) and `run_jobs` refuses to start on a process-local one.
+
+CACHE_SINGLE_PROCESS declares that everything runs in one process, so a
+process-local cache counts as shared; settings set it for `manage.py test`.
+"""
+import os
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+DATABASE_CACHE_TABLE = 'django_cache'
+MAX_ENTRIES = 100000
+
+PROCESS_LOCAL_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+DATABASE_BACKENDS = ('django.core.cache.backends.db.DatabaseCache',)
+
+
+def cache_config(env='CACHE_URL'):
+    """A CACHES entry for the URL in $`env`."""
+    url = os.getenv(env, '') or 'db://'
+    scheme = urlsplit(url).scheme
+    if scheme in ('redis', 'rediss'):
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': url,
+        }
+    if scheme == 'memcached':
+        return {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': urlsplit(url).netloc,
+        }
+    if scheme == 'db':
+        return {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': DATABASE_CACHE_TABLE,
+            'OPTIONS': {'MAX_ENTRIES': MAX_ENTRIES},
+        }
+    if scheme == 'locmem':
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    raise ImproperlyConfigured(f'{env} must be a redis://, memcached://, db:// or locmem:// URL, not {url!r}.')
+
+
+def _backend(alias):
+    backend = type(caches[alias])
+    return f'{backend.__module__}.{backend.__qualname__}'
+
+
+def is_shared(alias):
+    """Whether every process using cache `alias` sees the same entries."""
+    if not alias:
+        return False
+    return getattr(settings, 'CACHE_SINGLE_PROCESS', False) or _backend(alias) not in PROCESS_LOCAL_BACKENDS
+
+
+def saves_queries(alias):
+    """Whether `alias` is shared and answers without a database query, unlike the DatabaseCache."""
+    return is_shared(alias) and _backend(alias) not in DATABASE_BACKENDS
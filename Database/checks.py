@@ -0,0 +1,54 @@
+"""
+System checks for settings that only work across processes with a shared
+cache (see Database/caches.py).  Registered by Data.apps.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .caches import is_shared, saves_queries
+
+# (setting, default CACHE_ALIAS, what is switched off, whether the DatabaseCache is switched off too)
+SHARED_CACHE_SETTINGS = [
+    ('RESPONSE_CACHE', 'default', 'Response caching and conditional GETs', True),
+    ('JWT_USER_CACHE', 'default', 'The JWT user snapshot cache', True),
+    ('SESSION_CACHE', 'default', 'The session payload cache', True),
+    ('BLACKLIST_CACHE', 'default', 'The shared refresh-token blacklist cache', True),
+    ('READ_REPLICA', 'default', 'Read replica routing', False),
+]
+
+HINT = 'Set CACHE_URL to redis://... or memcached://... (Database/caches.py), or point CACHE_ALIAS at such a cache.'
+
+
+def _enabled_features():
+    for name, default_alias, feature, saves in SHARED_CACHE_SETTINGS:
+        config = getattr(settings, name, {})
+        if config.get('ENABLED', True):
+            yield name, config.get('CACHE_ALIAS', default_alias), feature, saves
+
+
+def process_local_features():
+    """[(setting, alias, feature)] of the enabled features whose cache is process-local."""
+    return [(name, alias, feature) for name, alias, feature, _ in _enabled_features() if not is_shared(alias)]
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    warnings = [
+        Warning(
+            f"{feature} is off: {name}['CACHE_ALIAS'] ({alias!r}) is not shared between processes.",
+            hint=HINT,
+            id='Database.W001',
+        )
+        for name, alias, feature in process_local_features()
+    ]
+    warnings += [
+        Warning(
+            f"{feature} is off: {name}['CACHE_ALIAS'] ({alias!r}) is the database cache, "
+            "whose reads cost the queries it would save.",
+            hint=HINT,
+            id='Database.W002',
+        )
+        for name, alias, feature, saves in _enabled_features()
+        if saves and is_shared(alias) and not saves_queries(alias)
+    ]
+    return warnings
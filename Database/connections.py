@@ -0,0 +1,115 @@
+"""
+Database connection management: DATABASES['default'] from DATABASE_URL.
+
+Django's default of CONN_MAX_AGE = 0 opens a connection at the first query
+of every request and closes it at the end, so each request pays the TCP
+(and TLS) handshake, authentication and backend startup of PostgreSQL.
+database_config() instead configures one of:
+
+  * Persistent connections (the default).  Each worker thread keeps its
+    connection for MAX_AGE seconds (CONN_MAX_AGE; None keeps it forever).
+    With HEALTH_CHECKS, a connection reused by a new request is pinged
+    first and replaced if the server dropped it (restart, failover, idle
+    timeout) instead of failing the request (CONN_HEALTH_CHECKS).
+  * A connection pool per worker process (POOL, PostgreSQL with psycopg 3:
+    `pip install "psycopg[binary,pool]"`, which Django then uses instead of
+    psycopg2).  Requests borrow a connection from Django's psycopg_pool
+    (OPTIONS['pool']) and return it at the end.  Worth it with many threads
+    per worker; connections are health checked on checkout.
+
+Gunicorn forks its workers, and each worker has its own connections or
+pool.  A worker holds one connection per request thread (GUNICORN_THREADS,
+also read by gunicorn.conf.py; an ASGI worker runs its sync code on one
+thread) plus one per async query thread (ASYNC_QUERY_THREADS,
+Data/async_views.py), so POOL_MAX_SIZE defaults to their sum.
+WEB_CONCURRENCY workers then hold at most
+WEB_CONCURRENCY x (GUNICORN_THREADS + ASYNC_QUERY_THREADS) connections, plus
+one per `run_jobs` worker, which must stay below the server's
+max_connections.  gunicorn.conf.py closes any connection or pool a worker
+inherits from the master.
+
+    DATABASE_CONNECTIONS = {
+        'MAX_AGE': 600,
+        'HEALTH_CHECKS': True,
+        'POOL': False,
+        'POOL_MIN_SIZE': 1,
+        'POOL_MAX_SIZE': None,  # None: GUNICORN_THREADS + ASYNC_QUERY_THREADS
+        'POOL_TIMEOUT': 10,
+    }
+
+`manage.py benchmark_connections` measures what connection setup costs a
+request on the configured database.
+"""
+import importlib.util
+import os
+
+import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULTS = {
+    'MAX_AGE': 600,
+    'HEALTH_CHECKS': True,
+    'POOL': False,
+    'POOL_MIN_SIZE': 1,
+    'POOL_MAX_SIZE': None,
+    'POOL_TIMEOUT': 10, # seconds a request waits for a free connection before failing
+}
+
+POSTGRESQL = 'django.db.backends.postgresql'
+
+
+def worker_threads():
+    """Threads per gunicorn worker, as configured in gunicorn.conf.py."""
+    return max(1, int(os.getenv('GUNICORN_THREADS', '1')))
+
+
+def async_query_threads():
+    """Threads per process running the queries of async views (settings.ASYNC_QUERY_THREADS)."""
+    return max(1, int(os.getenv('ASYNC_QUERY_THREADS', '4')))
+
+
+def has_psycopg_pool():
+    return bool(importlib.util.find_spec('psycopg') and importlib.util.find_spec('psycopg_pool'))
+
+
+def database_config(options=None, env='DATABASE_URL'):
+    """A DATABASES entry for the URL in $`env` ({} when it is unset) with the connection `options`."""
+    if not os.getenv(env):
+        return {} # dj_database_url would log a warning, e.g. for an optional REPLICA_DATABASE_URL
+    config = {**DEFAULTS, **(options or {})}
+    database = dj_database_url.config(
+        env=env,
+        # A pool keeps the connections itself; Django refuses persistent ones on top
+        conn_max_age=0 if config['POOL'] else config['MAX_AGE'],
+        conn_health_checks=config['HEALTH_CHECKS'],
+    )
+    if not database or not config['POOL']:
+        return database
+
+    if database['ENGINE'] != POSTGRESQL:
+        raise ImproperlyConfigured('DATABASE_CONNECTIONS["POOL"] needs a PostgreSQL database.')
+    if not has_psycopg_pool():
+        raise ImproperlyConfigured(
+            'DATABASE_CONNECTIONS["POOL"] needs psycopg 3 and psycopg_pool: pip install "psycopg[binary,pool]"'
+        )
+    max_size = config['POOL_MAX_SIZE'] or worker_threads() + async_query_threads()
+    database.setdefault('OPTIONS', {})['pool'] = {
+        'min_size': min(config['POOL_MIN_SIZE'], max_size),
+        'max_size': max_size,
+        'timeout': config['POOL_TIMEOUT'],
+    }
+    return database
+
+
+def close_inherited_connections():
+    """Drop the connections and pools a forked process inherited; it opens its own."""
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        # Closing the socket would end the parent's session too; just forget it
+        connection.connection = None
+        connection.close()
+    for alias in connections:
+        close_pool = getattr(connections[alias], 'close_pool', None)
+        if close_pool is not None and connections[alias].settings_dict.get('OPTIONS', {}).get('pool'):
+            close_pool()
@@ -0,0 +1,161 @@
+"""
+Read replica for the heavy, read-only stats endpoints.
+
+    class DivisionViewSet(viewsets.ModelViewSet):
+        @action(detail=True, methods=['get'])
+        @read_replica
+        def ratings_stats(self, request, pk=None):
+            ...
+
+Queries a @read_replica handler reads run on READ_REPLICA['ALIAS'] through
+ReplicaRouter (DATABASE_ROUTERS); writes, and reads anywhere else, stay on
+the primary ('default').  The 'replica' alias connects to
+REPLICA_DATABASE_URL; without it, or whenever the alias names the primary's
+own database (as its TEST MIRROR of 'default' does), everything runs on
+the primary.
+
+A replica lags behind the primary, so a user who just changed something
+(rate_div, process_venue_response, ...) would not see it in the stats.
+ReadYourWritesMiddleware therefore pins a user to the primary for
+STICKY_SECONDS after each of their successful POST/PUT/PATCH/DELETE
+requests, with a key in READ_REPLICA['CACHE_ALIAS'].  The pin has to hold
+whichever worker serves the next request, so the replica is only used when
+that cache is shared between processes (Database/caches.py).  Keep
+STICKY_SECONDS above the replica's usual lag.  The database cache's own
+table is always read on the primary, where it is written.  Responses cache_response()
+stores while reading the replica are as fresh as the replica was.
+
+    READ_REPLICA = {
+        'ALIAS': 'replica',
+        'STICKY_SECONDS': 15,
+        'CACHE_ALIAS': 'default',
+    }
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .caches import is_shared
+
+DEFAULTS = {
+    'ALIAS': 'replica',
+    'STICKY_SECONDS': 15,
+    'CACHE_ALIAS': 'default',
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# DatabaseCache's model; it routes its queries like any other model's
+CACHE_APP_LABEL = 'django_cache'
+
+# The alias reads of the current @read_replica handler go to, if any
+_reading = ContextVar('read_replica', default=None)
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, 'READ_REPLICA', {})}
+
+
+def _cache():
+    return caches[_config()['CACHE_ALIAS']]
+
+
+def _pin_key(user_id):
+    return f'read-replica:pin:{user_id}'
+
+
+def replica_alias():
+    """
+    The configured replica alias, or None when there is no separate replica
+    database or no shared cache for the read-your-writes pins.
+    """
+    config = _config()
+    alias = config['ALIAS']
+    if not alias or alias == DEFAULT_DB_ALIAS or alias not in connections.settings:
+        return None
+    if not is_shared(config['CACHE_ALIAS']):
+        return None
+    replica, primary = connections.settings[alias], connections.settings[DEFAULT_DB_ALIAS]
+    if all(replica.get(key) == primary.get(key) for key in ('ENGINE', 'NAME', 'HOST', 'PORT')):
+        return None
+    return alias
+
+
+def pin_to_primary(user_id):
+    """Read the primary for `user_id`'s requests for the next STICKY_SECONDS."""
+    if replica_alias() is not None:
+        _cache().set(_pin_key(user_id), True, timeout=_config()['STICKY_SECONDS'])
+
+
+def is_pinned(user_id):
+    return bool(_cache().get(_pin_key(user_id)))
+
+
+def replica_for(user):
+    """The alias `user`'s read-only requests read, or None for the primary."""
+    alias = replica_alias()
+    if alias is None or (user.is_authenticated and is_pinned(user.pk)):
+        return None
+    return alias
+
+
+@contextmanager
+def reading(alias):
+    """Route the reads in the block (and in contexts copied from it) to `alias`, or the primary for None."""
+    token = _reading.set(alias)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+def read_replica(handler):
+    """Run a read-only viewset handler's queries on the replica, unless request.user is pinned to the primary."""
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        with reading(replica_for(request.user)):
+            return handler(self, request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Reads inside @read_replica go to the replica; everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == CACHE_APP_LABEL:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return _reading.get()
+
+    def db_for_write(self, model, **hints):
+        # Also for instances read from the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both hold the same data
+        databases = {DEFAULT_DB_ALIAS, _config()['ALIAS']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """Pin users to the primary after each of their successful writes (see pin_to_primary)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # DRF copies the user it authenticated onto the Django request
+        user = getattr(request, 'user', None)
+        if (request.method not in SAFE_METHODS and response.status_code < 400
+                and user is not None and user.is_authenticated):
+            pin_to_primary(user.pk)
+        return response
@@ -13,7 +13,9 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
-import dj_database_url
+import sys
+from .caches import cache_config
+from .connections import async_query_threads, database_config
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,12 +50,14 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt.token_blacklist',
     'Data',
     'Account',
-    'Tokens'
+    'Tokens',
+    'Jobs',
 ]
 
 
 
 MIDDLEWARE = [
+    'Account.middleware.QueryInstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -63,6 +67,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'Database.replicas.ReadYourWritesMiddleware',
     
     # 'Account.middleware.TokenRenewalMiddleware'
 ]
@@ -104,6 +109,97 @@ SIMPLE_JWT = {
     "VERIFY_SIGNATURE": True,
 }
 
+# Shared by every web worker and `run_jobs`. Set CACHE_URL=redis://... (or
+# memcached://...); the fallback, the django_cache table, leaves the response,
+# session and JWT user caches off (Database/caches.py).
+CACHES = {
+    'default': cache_config(),
+}
+
+# `manage.py test` runs in one process, with a per-process cache
+TESTING = sys.argv[1:2] == ['test']
+CACHE_SINGLE_PROCESS = TESTING
+if TESTING:
+    CACHES['default'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+TEST_RUNNER = 'Database.test_runner.TestRunner' # clears the caches before each test
+
+# Snapshot cache of the users behind access tokens (Tokens/usercache.py).
+JWT_USER_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 2048,
+    'TIMEOUT': int(SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()),
+    'CACHE_ALIAS': 'default', # must be shared (Database/caches.py), or the cache is off
+}
+
+# Compact login / token refresh / users/me payload, cached per user and
+# expired by Account.signals (Account/session.py)
+SESSION_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 3600,
+}
+
+# Refresh-token blacklist lookups (Tokens/blacklist.py). CACHE_ALIAS must be
+# shared and not the database cache for valid refreshes to skip the query.
+BLACKLIST_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'CACHE_ALIAS': 'default',
+    'CLEAN_TIMEOUT': 60,
+}
+
+# Cached responses of read-mostly Data endpoints (Data/caching.py),
+# invalidated by model signals
+RESPONSE_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Run the independent queries of an async (ASGI) read endpoint concurrently
+# on a pool of ASYNC_QUERY_THREADS threads per process, each holding one
+# database connection (Data/async_views.py)
+ASYNC_CONCURRENT_QUERIES = True
+ASYNC_QUERY_THREADS = async_query_threads()
+
+# Database-backed background jobs (Jobs/queue.py), run by `manage.py run_jobs`
+JOB_QUEUE = {
+    'POLL_INTERVAL': 1.0,
+    'BATCH_SIZE': 20,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 10,
+    'MAX_RETRY_DELAY': 3600,
+    'LOCK_TIMEOUT': 600,
+    'KEEP_FINISHED': 7 * 24 * 3600,
+}
+
+# WebP/AVIF variants of uploaded images at these widths (Data/thumbnails.py),
+# written by a background job after upload or on first request
+THUMBNAILS = {
+    'WIDTHS': (160, 480, 960),
+    'FORMATS': ('avif', 'webp'),
+    'QUALITY': 75,
+    'DIRECTORY': 'thumbs',
+    'GENERATE_ON_SAVE': True,
+}
+
+# Ranked ?search= over the search documents of venues, divisions, pending
+# requests and feedback (Data/search.py); ENGINE None picks the PostgreSQL
+# (tsvector + trigram) or SQLite (FTS5) engine by database vendor
+SEARCH = {
+    'ENGINE': None,
+    'MAX_TERMS': 10,
+}
+
+# Query count / SQL time / serializer time of a sample of requests, as
+# Server-Timing headers, Account.instrumentation log lines and
+# GET /accounts/query-profile/ (Account/instrumentation.py)
+QUERY_INSTRUMENTATION = {
+    'ENABLED': True,
+    'SAMPLE_RATE': float(os.getenv('QUERY_SAMPLE_RATE', '0.05')),
+    'DUPLICATE_THRESHOLD': 5,
+    'SERVER_TIMING': True,
+}
+
 AUTH_USER_MODEL = 'Account.User'
 
 REST_FRAMEWORK = {
@@ -117,6 +213,8 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
+    # Opt-in: only paginates when ?page_size= or ?cursor= is passed
+    'DEFAULT_PAGINATION_CLASS': 'Data.pagination.KeysetPagination',
 }
 
 ROOT_URLCONF = 'Database.urls'
@@ -161,10 +259,40 @@ WSGI_APPLICATION = 'Database.wsgi.application'
 #     }
 # }
 
+# Connections to DATABASE_URL: persistent and health checked, or a psycopg 3
+# pool per worker with DB_POOL=1 (Database/connections.py). Keep
+# WEB_CONCURRENCY x (GUNICORN_THREADS + ASYNC_QUERY_THREADS) below the
+# server's max_connections.
+DATABASE_CONNECTIONS = {
+    'MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+    'HEALTH_CHECKS': True,
+    'POOL': os.getenv('DB_POOL', '').lower() in ('1', 'true', 'yes'),
+    'POOL_MIN_SIZE': 1,
+    'POOL_MAX_SIZE': None, # None: GUNICORN_THREADS + ASYNC_QUERY_THREADS
+    'POOL_TIMEOUT': 10,
+}
+
 DATABASES = {
-    'default': dj_database_url.config(
-        default=os.getenv("DATABASE_URL")  # Ensure you set this environment variable
-    )
+    'default': database_config(DATABASE_CONNECTIONS)  # Ensure you set DATABASE_URL
+}
+
+# Read replica for the stats endpoints (@read_replica, Database/replicas.py).
+# Without REPLICA_DATABASE_URL it is the primary itself and nothing is routed
+# to it; in tests it mirrors 'default'.
+DATABASES['replica'] = {
+    **(database_config(DATABASE_CONNECTIONS, env='REPLICA_DATABASE_URL') or DATABASES['default']),
+    'TEST': {'MIRROR': 'default'},
+}
+
+DATABASE_ROUTERS = ['Database.replicas.ReplicaRouter']
+
+# Users are pinned to the primary for STICKY_SECONDS after each of their
+# writes, so they read their own changes. The pins need a CACHE_ALIAS shared
+# by every worker; on a process-local one nothing is routed to the replica.
+READ_REPLICA = {
+    'ALIAS': 'replica',
+    'STICKY_SECONDS': 15,
+    'CACHE_ALIAS': 'default',
 }
 
 
@@ -232,5 +360,15 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        'Account.instrumentation': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'Jobs.queue': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
\ No newline at end of file
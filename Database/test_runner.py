@@ -0,0 +1,26 @@
+"""
+`manage.py test` runner (TEST_RUNNER).
+
+Tests run against a per-process cache (settings.TESTING) that, unlike the
+database, is not rolled back after each test, and the cache versions that
+would expire its entries are only bumped when a transaction commits.  The
+runner therefore clears every cache before each test, so no test is
+answered from entries another one left behind.
+"""
+import unittest
+
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+
+
+class ClearCachesMixin:
+    def startTest(self, test):
+        for cache in caches.all(initialized_only=True):
+            cache.clear()
+        super().startTest(test)
+
+
+class TestRunner(DiscoverRunner):
+    def get_resultclass(self):
+        base = super().get_resultclass() or unittest.TextTestResult
+        return type(f'ClearCaches{base.__name__}', (ClearCachesMixin, base), {})
@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.db import Options
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connections, router
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from Data.models import Division
+from . import connections as connection_config
+from .caches import cache_config
+from .connections import database_config
+from .replicas import ReplicaRouter, reading, replica_alias
+
+User = get_user_model()
+
+POSTGRES_URL = 'postgres://band:secret@db:5432/band'
+DIVISION_ID = 9001
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def config(self, url, options=None, **env):
+        with mock.patch.dict(os.environ, {'CONFIG_TEST_URL': url, **env}):
+            return database_config(options, env='CONFIG_TEST_URL')
+
+    def test_persistent_health_checked_connections_by_default(self):
+        database = self.config(POSTGRES_URL)
+        self.assertEqual(database['CONN_MAX_AGE'], 600)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('pool', database.get('OPTIONS', {}))
+
+    def test_pool_is_sized_to_the_worker_and_async_query_threads(self):
+        with mock.patch.object(connection_config, 'has_psycopg_pool', return_value=True):
+            database = self.config(POSTGRES_URL, {'POOL': True}, GUNICORN_THREADS='4', ASYNC_QUERY_THREADS='2')
+            sized = self.config(POSTGRES_URL, {'POOL': True, 'POOL_MAX_SIZE': 8})
+
+        # Django refuses persistent connections on top of a pool
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool'], {'min_size': 1, 'max_size': 6, 'timeout': 10})
+        self.assertEqual(sized['OPTIONS']['pool']['max_size'], 8)
+
+    def test_pool_needs_postgresql_and_psycopg(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.config('sqlite:////tmp/band.sqlite3', {'POOL': True})
+        with mock.patch.object(connection_config, 'has_psycopg_pool', return_value=False):
+            with self.assertRaises(ImproperlyConfigured):
+                self.config(POSTGRES_URL, {'POOL': True})
+
+
+class CacheConfigTests(SimpleTestCase):
+    def config(self, url):
+        with mock.patch.dict(os.environ, {'CONFIG_TEST_CACHE_URL': url}):
+            return cache_config(env='CONFIG_TEST_CACHE_URL')
+
+    def test_shared_backends(self):
+        self.assertEqual(self.config('')['BACKEND'], 'django.core.cache.backends.db.DatabaseCache')
+        self.assertEqual(self.config('redis://cache:6379/0')['LOCATION'], 'redis://cache:6379/0')
+        self.assertEqual(self.config('memcached://cache:11211')['LOCATION'], 'cache:11211')
+
+    def test_unknown_scheme_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.config('ftp://cache')
+
+
+class ReadReplicaTests(TestCase):
+    """A second SQLite database stands in for the replica, holding older ratings than the primary."""
+
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        # The alias mirrors 'default' in tests; point it at a database of its own
+        cls.replica_dir = tempfile.mkdtemp()
+        replica = connections['replica']
+        cls.mirrored_name = replica.settings_dict['NAME']
+        replica.settings_dict['NAME'] = os.path.join(cls.replica_dir, 'replica.sqlite3')
+        replica.close() # SQLite keeps in-memory connections open, so only once it names the file
+        call_command('migrate', database='replica', verbosity=0)
+        # bulk_create(): no signals, which would queue jobs on the primary
+        Division.objects.using('replica').bulk_create([
+            Division(pk=DIVISION_ID, name='Brass', role='Senior', rating_sum=12, rating_count=3, rating_4=3),
+        ])
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        replica = connections['replica']
+        replica.close()
+        replica.settings_dict['NAME'] = cls.mirrored_name
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.division = Division.objects.create(pk=DIVISION_ID, name='Brass', role='Senior')
+        cls.user = User.objects.create_user(username='rater', password='pass12345')
+        cls.other = User.objects.create_user(username='other', password='pass12345')
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ratings_count(self, client=None):
+        response = (client or self.client).get(f'/divisions/{DIVISION_ID}/ratings_stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['count']
+
+    def test_stats_read_the_replica_and_writes_go_to_the_primary(self):
+        self.assertEqual(self.ratings_count(), 3)
+        self.assertEqual(router.db_for_write(Division, instance=Division.objects.using('replica').get()), 'default')
+
+    def test_writer_reads_the_primary_until_the_pin_expires(self):
+        response = self.client.post('/ratings/rate_div/', {'divId': DIVISION_ID, 'value': 5}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Division.objects.using('replica').get().rating_count, 3)
+
+        self.assertEqual(self.ratings_count(), 1)
+        other = APIClient()
+        other.force_authenticate(self.other)
+        self.assertEqual(self.ratings_count(other), 3)
+
+        caches['default'].delete(f'read-replica:pin:{self.user.pk}')
+        self.assertEqual(self.ratings_count(), 3)
+
+    def test_process_local_pins_keep_reads_on_the_primary(self):
+        with self.settings(CACHE_SINGLE_PROCESS=False):
+            self.assertIsNone(replica_alias())
+            self.assertEqual(self.ratings_count(), 0)
+
+    def test_cache_table_is_read_on_the_primary(self):
+        cache_model = type('CacheEntry', (), {'_meta': Options('django_cache')})
+        with reading('replica'):
+            self.assertEqual(ReplicaRouter().db_for_read(cache_model), 'default')
+            self.assertEqual(ReplicaRouter().db_for_read(Division), 'replica')
@@ -20,6 +20,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.static import serve
 
+from Data.thumbnails import thumbnail_settings, thumbnail_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('Data.urls')),
@@ -28,6 +30,11 @@ urlpatterns = [
     path('token/', include('Tokens.urls')),
 ]
 
+# Image variants are generated on first request, so they route ahead of the plain media files
+urlpatterns += [
+    re_path(rf"^{settings.MEDIA_URL.strip('/')}/{thumbnail_settings()['DIRECTORY']}/(?P<path>.*)$", thumbnail_view),
+]
+
 if settings.DEBUG:
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
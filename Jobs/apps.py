@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'Jobs'
+
+    def ready(self):
+        # Handlers live in each app's jobs.py, registered with @Jobs.queue.task
+        autodiscover_modules('jobs')
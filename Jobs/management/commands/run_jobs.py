@@ -0,0 +1,73 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from Database.checks import process_local_features
+from Jobs.queue import claim, purge_finished, queue_settings, release_stale, run_job, run_pending, worker_name
+
+HOUSEKEEPING_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs (Jobs/queue.py). Keep one or more of these running next to the web '
+        'workers, or run it with --once from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due, then exit')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--poll-interval', type=float, default=None, help='Seconds to sleep when idle')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs (0: never)')
+
+    def handle(self, *args, **options):
+        # Jobs invalidate cached responses; on a per-process cache the web workers would never see it
+        local = process_local_features()
+        if local:
+            raise CommandError(
+                'run_jobs needs the cache the web workers use, but it is process-local for '
+                + ', '.join(f"{name}['CACHE_ALIAS'] ({alias!r})" for name, alias, _ in local)
+                + '. Set CACHE_URL (Database/caches.py).'
+            )
+
+        config = queue_settings()
+        batch_size = options['batch_size'] or config['BATCH_SIZE']
+        worker = worker_name()
+
+        if options['once']:
+            release_stale()
+            succeeded, failed = run_pending(worker, batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Ran {succeeded + failed} jobs ({failed} failed).'))
+            return
+
+        poll_interval = options['poll_interval'] or config['POLL_INTERVAL']
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.stdout.write(f'Worker {worker} waiting for jobs.')
+
+        processed = 0
+        housekept = 0
+        while not self.stopping:
+            if time.monotonic() - housekept > HOUSEKEEPING_INTERVAL:
+                release_stale()
+                purge_finished()
+                housekept = time.monotonic()
+
+            close_old_connections()
+            jobs = claim(worker, batch_size)
+            if not jobs:
+                time.sleep(poll_interval)
+                continue
+            # A stop signal lets the claimed batch finish; unclaimed jobs stay queued for the next worker
+            for job in jobs:
+                run_job(job)
+                processed += 1
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+        self.stdout.write(f'Worker {worker} stopped after {processed} jobs.')
+
+    def stop(self, signum, frame):
+        self.stopping = True
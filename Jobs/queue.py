@@ -0,0 +1,234 @@
+"""
+Database-backed job queue.
+
+Side effects that need not hold up a request (rollup and leaderboard
+refreshes, search indexing, thumbnails, ...) are enqueued as Job rows and
+run by `manage.py run_jobs` workers (the Procfile's `worker` process,
+deployed next to `web`), so no broker is needed:
+
+    # Data/jobs.py (every app's jobs.py is imported at startup)
+    @task('rollups.refresh')
+    def refresh_rollup(division_id, day):
+        ...
+
+    enqueue('rollups.refresh', {'division_id': 3, 'day': '2025-01-06'}, key='rollup:3:2025-01-06')
+    enqueue_many('rollups.refresh', [(payload, key), ...])  # one INSERT
+
+enqueue() inserts the row in the caller's transaction: the job exists only
+if the change that asked for it commits, and no worker sees it earlier.
+Every enqueue inserts a row, even while a job with the same idempotency
+`key` is queued: that job may be claimed and run before the caller commits,
+and would then miss the caller's change.  Instead claim() deduplicates: it
+takes one due job per key and marks the other due jobs of that key done,
+since each of them was committed before the claimed one runs.  A burst of
+changes to one bucket still costs one refresh.
+
+Workers claim due jobs in batches (SELECT ... FOR UPDATE SKIP LOCKED where
+the backend has it, a conditional UPDATE otherwise) and run each handler in
+a transaction together with marking the job done: a handler that only
+writes to the database takes effect exactly once.  A handler that raises is
+rolled back and retried after RETRY_DELAY * 2 ** (attempts - 1) seconds
+(at most MAX_RETRY_DELAY) until max_attempts, then left 'failed' with its
+traceback.  Jobs of a worker that died mid-run are requeued after
+LOCK_TIMEOUT.
+
+Handlers expire cached responses (Data.caching), so run_jobs refuses to
+start unless the features that need it have a cache shared with the web
+workers (Database/caches.py).
+
+    JOB_QUEUE = {
+        'POLL_INTERVAL': 1.0,
+        'BATCH_SIZE': 20,
+        'MAX_ATTEMPTS': 5,
+        'RETRY_DELAY': 10,
+        'MAX_RETRY_DELAY': 3600,
+        'LOCK_TIMEOUT': 600,
+        'KEEP_FINISHED': 7 * 24 * 3600,
+    }
+"""
+import logging
+import os
+import socket
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'POLL_INTERVAL': 1.0, # seconds an idle worker sleeps between polls
+    'BATCH_SIZE': 20,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 10,
+    'MAX_RETRY_DELAY': 3600,
+    'LOCK_TIMEOUT': 600, # seconds before a running job is presumed orphaned
+    'KEEP_FINISHED': 7 * 24 * 3600, # seconds done jobs are kept; failed ones stay until deleted
+}
+
+_handlers = {}
+
+
+def queue_settings():
+    return {**DEFAULTS, **getattr(settings, 'JOB_QUEUE', {})}
+
+
+def task(name):
+    """Register the decorated function as the handler of jobs called `name`."""
+    def register(func):
+        if name in _handlers and _handlers[name] is not func:
+            raise ValueError(f'A handler for job {name!r} is already registered.')
+        _handlers[name] = func
+        return func
+    return register
+
+
+def handler(name):
+    try:
+        return _handlers[name]
+    except KeyError:
+        raise LookupError(f'No handler registered for job {name!r}.') from None
+
+
+def enqueue(name, payload=None, key=None, delay=0, max_attempts=None, using=None):
+    """Queue a job in the current transaction. Returns the Job."""
+    handler(name)
+    job = Job(
+        name=name,
+        payload=payload or {},
+        key=key,
+        max_attempts=max_attempts or queue_settings()['MAX_ATTEMPTS'],
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    job.save(using=using)
+    return job
+
+
+def enqueue_many(name, jobs, max_attempts=None, using=None):
+    """Queue one `name` job per (payload, key) pair with a single insert."""
+    handler(name)
+    run_after = timezone.now()
+    max_attempts = max_attempts or queue_settings()['MAX_ATTEMPTS']
+    rows = [
+        Job(name=name, payload=payload or {}, key=key, max_attempts=max_attempts, run_after=run_after)
+        for payload, key in jobs
+    ]
+    if rows:
+        Job.objects.using(using).bulk_create(rows)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker=None, limit=None):
+    """
+    Mark up to `limit` due jobs running on behalf of `worker` and return them,
+    oldest first.  Other due jobs with the key of a claimed one are marked
+    done: they were committed before it, so its run covers them.
+    """
+    limit = limit or queue_settings()['BATCH_SIZE']
+    token = f'{worker or worker_name()}/{uuid.uuid4().hex[:8]}'
+    using = router.db_for_write(Job)
+    now = timezone.now()
+    with transaction.atomic(using=using):
+        due = Job.objects.using(using).filter(status=Job.QUEUED, run_after__lte=now).order_by('run_after', 'pk')
+        if connections[using].features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids, keys = [], set()
+        for pk, key in due.values_list('pk', 'key')[:limit]:
+            if key is None or key not in keys:
+                ids.append(pk)
+                keys.add(key)
+        if not ids:
+            return []
+        # status=QUEUED again: without SKIP LOCKED another worker may have won some of them
+        Job.objects.using(using).filter(pk__in=ids, status=Job.QUEUED).update(
+            status=Job.RUNNING, locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+        )
+        jobs = list(Job.objects.using(using).filter(locked_by=token, status=Job.RUNNING).order_by('run_after', 'pk'))
+        claimed_keys = {job.key for job in jobs if job.key is not None}
+        if claimed_keys:
+            Job.objects.using(using).filter(key__in=claimed_keys, status=Job.QUEUED, run_after__lte=now).update(
+                status=Job.DONE, finished_at=now, last_error='Superseded by a job with the same key.',
+            )
+    return jobs
+
+
+def retry_delay(attempts):
+    config = queue_settings()
+    return min(config['RETRY_DELAY'] * 2 ** max(attempts - 1, 0), config['MAX_RETRY_DELAY'])
+
+
+def _requeue(job, run_after, error):
+    """Put a running job back in the queue."""
+    return Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+        status=Job.QUEUED, run_after=run_after, locked_by=None, locked_at=None, last_error=error,
+    )
+
+
+def run_job(job):
+    """Run one claimed job. Returns True when it succeeded."""
+    try:
+        func = handler(job.name)
+        with transaction.atomic():
+            func(**job.payload)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.DONE, finished_at=timezone.now(), locked_by=None, last_error='',
+            )
+        return True
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.exception('Job %s failed for good after %d attempts', job, job.attempts)
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, finished_at=timezone.now(), locked_by=None, last_error=error,
+            )
+        else:
+            delay = retry_delay(job.attempts)
+            logger.warning('Job %s failed (attempt %d), retrying in %ds', job, job.attempts, delay, exc_info=True)
+            _requeue(job, timezone.now() + timedelta(seconds=delay), error)
+        return False
+
+
+def release_stale(timeout=None):
+    """Requeue (or fail, when out of attempts) jobs running for longer than LOCK_TIMEOUT. Returns how many."""
+    timeout = queue_settings()['LOCK_TIMEOUT'] if timeout is None else timeout
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    released = 0
+    for job in Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff):
+        error = f'Worker {job.locked_by} did not finish within {timeout}s.'
+        if job.attempts >= job.max_attempts:
+            released += Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+                status=Job.FAILED, finished_at=timezone.now(), locked_by=None, last_error=error,
+            )
+        else:
+            released += _requeue(job, timezone.now(), error)
+    return released
+
+
+def purge_finished(older_than=None):
+    """Delete done jobs finished more than KEEP_FINISHED seconds ago. Returns how many."""
+    older_than = queue_settings()['KEEP_FINISHED'] if older_than is None else older_than
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return Job.objects.filter(status=Job.DONE, finished_at__lt=cutoff).delete()[0]
+
+
+def run_pending(worker=None, limit=None):
+    """Run due jobs until none are left, e.g. in tests or from cron. Returns (succeeded, failed)."""
+    succeeded = failed = 0
+    while True:
+        jobs = claim(worker, limit)
+        if not jobs:
+            return succeeded, failed
+        for job in jobs:
+            if run_job(job):
+                succeeded += 1
+            else:
+                failed += 1
@@ -0,0 +1,135 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from Data.models import Feedback
+from .models import Job
+from .queue import claim, enqueue, enqueue_many, release_stale, run_job, run_pending, task
+
+User = get_user_model()
+
+calls = []
+
+
+@task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('tests.flaky')
+def flaky(feedback_id):
+    # Writes before failing, so the rollback of the failed attempt is observable
+    Feedback.objects.filter(pk=feedback_id).update(title='changed')
+    raise RuntimeError('boom')
+
+
+@override_settings(JOB_QUEUE={'RETRY_DELAY': 10, 'MAX_RETRY_DELAY': 60})
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_key_deduplicates_queued_jobs(self):
+        first = enqueue('tests.record', {'value': 1}, key='same')
+        second = enqueue('tests.record', {'value': 2}, key='same')
+        enqueue_many('tests.record', [({'value': 3}, 'same'), ({'value': 4}, 'other')])
+        self.assertEqual(run_pending(), (2, 0))
+        self.assertEqual(sorted(calls), [1, 4])
+        second.refresh_from_db()
+        self.assertEqual(second.status, Job.DONE)
+        self.assertIn('Superseded', second.last_error)
+
+        self.assertIsNotNone(enqueue('tests.record', {'value': 5}, key='same'))
+        with self.assertRaises(LookupError):
+            enqueue('tests.missing')
+
+    def test_enqueue_while_the_job_runs_runs_it_again(self):
+        enqueue('tests.record', {'value': 1}, key='same')
+        [claimed] = claim()
+        # A change committed while the claimed job runs, which it may have read before
+        enqueue('tests.record', {'value': 2}, key='same')
+        run_job(claimed)
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertEqual(calls, [1, 2])
+
+    def test_delayed_jobs_are_not_superseded(self):
+        enqueue('tests.record', {'value': 1}, key='same')
+        later = enqueue('tests.record', {'value': 2}, key='same', delay=60)
+        self.assertEqual(run_pending(), (1, 0))
+        later.refresh_from_db()
+        self.assertEqual(later.status, Job.QUEUED)
+
+    def test_failures_roll_back_and_retry_with_backoff(self):
+        user = User.objects.create_user(username='ann', password='secret')
+        feedback = Feedback.objects.create(user=user, title='original', highlighted_title='Well done')
+        run_pending() # its search document
+        job = enqueue('tests.flaky', {'feedback_id': feedback.pk}, max_attempts=2)
+
+        with self.assertLogs('Jobs.queue', 'WARNING'):
+            self.assertEqual(run_pending(), (0, 1))
+        job.refresh_from_db()
+        feedback.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, feedback.title), (Job.QUEUED, 1, 'original'))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertAlmostEqual((job.run_after - timezone.now()).total_seconds(), 10, delta=2)
+        self.assertEqual(claim(), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('Jobs.queue', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_orphaned_jobs_are_requeued(self):
+        job = enqueue('tests.record', {'value': 1}, key='orphan')
+        [claimed] = claim('dead-worker')
+        self.assertEqual((claimed.pk, claimed.attempts), (job.pk, 1))
+        enqueue('tests.record', {'value': 2}, key='other')
+
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(release_stale(), 1)
+        self.assertEqual(run_pending(), (2, 0))
+        self.assertEqual(sorted(calls), [1, 2])
+
+    def test_retried_job_is_merged_with_a_queued_job_with_the_same_key(self):
+        job = enqueue('tests.record', {'value': 1}, key='same')
+        [claimed] = claim()
+        enqueue('tests.record', {'value': 2}, key='same')
+        Job.objects.filter(pk=job.pk).update(name='tests.missing')
+        claimed.name = 'tests.missing'
+        with self.assertLogs('Jobs.queue', 'WARNING'):
+            run_job(claimed)
+        Job.objects.filter(pk=job.pk).update(name='tests.record', run_after=timezone.now())
+
+        self.assertEqual(run_pending(), (1, 0))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(Job.objects.filter(key='same', status=Job.DONE).count(), 2)
+
+    def test_worker_command_runs_due_jobs(self):
+        enqueue('tests.record', {'value': 1})
+        call_command('run_jobs', '--once', stdout=StringIO())
+        self.assertEqual(calls, [1])
+
+    @override_settings(CACHE_SINGLE_PROCESS=False)
+    def test_worker_command_refuses_a_process_local_cache(self):
+        enqueue('tests.record', {'value': 1})
+        with self.assertRaisesMessage(CommandError, "RESPONSE_CACHE['CACHE_ALIAS']"):
+            call_command('run_jobs', '--once', stdout=StringIO())
+        self.assertEqual(calls, [])
+
+    def test_feedback_render_counts_the_impression_without_a_job(self):
+        user = User.objects.create_user(username='ann', password='secret')
+        first = Feedback.objects.create(user=user, title='Scales', highlighted_title='Well done')
+        second = Feedback.objects.create(user=user, title='Rhythm', highlighted_title='Keep going')
+        run_pending() # their search documents
+        client = APIClient()
+        client.force_login(user)
+
+        shown = [client.get('/feedbacks/render/', {'userId': user.pk}).json()['id'] for _ in range(2)]
+        # The rotation moves on right away
+        self.assertEqual(sorted(shown), sorted([first.pk, second.pk]))
+        self.assertFalse(Job.objects.filter(status=Job.QUEUED).exists())
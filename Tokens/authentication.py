@@ -1,10 +1,13 @@
 # tokens/authentication.py
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError, AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.authentication import CSRFCheck
 from rest_framework import exceptions
 import logging
 
+from .usercache import get_user_cache
+
 logger = logging.getLogger(__name__)
 
 class JWTAuthFromCookie(JWTAuthentication):
@@ -12,6 +15,8 @@ class JWTAuthFromCookie(JWTAuthentication):
     Custom JWT authentication that reads tokens from cookies
     and handles CSRF protection for state-changing operations
     """
+    # Stateless, so one instance serves every request
+    csrf_check = CSRFCheck(lambda request: None)
     
     def authenticate(self, request):
         # Get token from cookie
@@ -36,14 +41,32 @@ class JWTAuthFromCookie(JWTAuthentication):
             logger.error(f"Unexpected error in JWT authentication: {str(e)}")
             return None
     
+    def get_user(self, validated_token):
+        """
+        Resolve the token's user from the snapshot cache, falling back to
+        the database on a miss
+        """
+        cache = get_user_cache()
+        if cache is None:
+            return super().get_user(validated_token)
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        version = cache.version(user_id) if user_id is not None else None
+        user = cache.get(user_id, jti, version)
+        if user is None:
+            user = super().get_user(validated_token)
+            # The version from before the read, so a concurrent invalidation wins
+            cache.set(user, jti, validated_token['exp'], version)
+        elif api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
     def enforce_csrf(self, request):
         """
         Enforce CSRF protection for authenticated requests
         """
-        def dummy_get_response(request):
-            return None
-        
-        check = CSRFCheck(dummy_get_response)
+        check = self.csrf_check
         check.process_request(request)
         reason = check.process_view(request, None, (), {})
         if reason:
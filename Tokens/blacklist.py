@@ -0,0 +1,227 @@
+"""
+Cached refresh-token blacklist.
+
+simplejwt checks BlacklistedToken joined to OutstandingToken by jti each
+time a refresh token is loaded.  RefreshToken here answers that check from,
+in order:
+
+  1. a per-process bounded set of jtis known to be blacklisted.  Blacklisting
+     is permanent until the token expires, so these answers never go stale;
+  2. the shared cache named by BLACKLIST_CACHE['CACHE_ALIAS']: a
+     `blacklisted` key per jti, and a short-lived `clean` key remembering
+     that the database had no entry, so valid refreshes skip the query too;
+  3. the database, whose answer is written back to the caches.
+
+Every BlacklistedToken saved (by RefreshToken.blacklist(), simplejwt's own
+token classes or the admin) writes its jti to both caches and drops the
+`clean` key from a post_save receiver, so a token revoked in one worker is
+rejected by every worker sharing the cache.  The shared cache is skipped
+when the alias is process-local or the database cache
+(Database.caches.saves_queries); only the per-process set is used then.
+Counters for each path are kept per process; see blacklist_metrics() and
+GET /token/blacklist-metrics/.  Expired rows are removed by
+`manage.py purge_blacklist` (run it from cron).
+
+    BLACKLIST_CACHE = {
+        'MAX_ENTRIES': 10000,
+        'CACHE_ALIAS': 'default',
+        'CLEAN_TIMEOUT': 60,
+    }
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from Database.caches import saves_queries
+
+DEFAULTS = {
+    'MAX_ENTRIES': 10000,
+    'CACHE_ALIAS': 'default',
+    'CLEAN_TIMEOUT': 60, # how long a shared "not blacklisted" answer is trusted
+}
+
+METRICS = (
+    'lookups', 'local_hits', 'shared_hits', 'shared_clean_hits',
+    'db_lookups', 'db_blacklisted', 'blacklisted',
+)
+
+
+class BlacklistCache:
+    key_prefix = 'jwt-blacklist'
+
+    def __init__(self, max_entries=DEFAULTS['MAX_ENTRIES'], cache_alias=None,
+                 clean_timeout=DEFAULTS['CLEAN_TIMEOUT']):
+        self.max_entries = max_entries
+        self.clean_timeout = clean_timeout
+        self.shared = caches[cache_alias] if cache_alias else None
+        self._known = OrderedDict() # jti -> exp
+        self._lock = threading.Lock()
+        self.metrics = Counter()
+
+    def _key(self, kind, jti):
+        return f'{self.key_prefix}:{kind}:{jti}'
+
+    def _count(self, name):
+        with self._lock:
+            self.metrics[name] += 1
+
+    def _remember(self, jti, exp):
+        with self._lock:
+            self._known[jti] = exp
+            self._known.move_to_end(jti)
+            while len(self._known) > self.max_entries:
+                self._known.popitem(last=False)
+
+    def _known_locally(self, jti, now):
+        with self._lock:
+            exp = self._known.get(jti)
+            if exp is None:
+                return False
+            if exp <= now:
+                del self._known[jti]
+                return False
+            self._known.move_to_end(jti)
+            return True
+
+    def is_blacklisted(self, jti, exp):
+        now = time.time()
+        self._count('lookups')
+        if self._known_locally(jti, now):
+            self._count('local_hits')
+            return True
+
+        if self.shared is not None:
+            flags = self.shared.get_many([self._key('blacklisted', jti), self._key('clean', jti)])
+            if self._key('blacklisted', jti) in flags:
+                self._count('shared_hits')
+                self._remember(jti, exp)
+                return True
+            if self._key('clean', jti) in flags:
+                self._count('shared_clean_hits')
+                return False
+
+        self._count('db_lookups')
+        blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        if blacklisted:
+            self._count('db_blacklisted')
+            self.add(jti, exp, count=False)
+        elif self.shared is not None:
+            self.shared.set(self._key('clean', jti), True, timeout=self.clean_timeout)
+        return blacklisted
+
+    def add(self, jti, exp, count=True):
+        if count:
+            self._count('blacklisted')
+        self._remember(jti, exp)
+        if self.shared is not None:
+            timeout = max(1, int(exp - time.time()))
+            self.shared.set(self._key('blacklisted', jti), True, timeout=timeout)
+            self.shared.delete(self._key('clean', jti))
+
+    def snapshot(self):
+        with self._lock:
+            metrics = {name: self.metrics[name] for name in METRICS}
+            metrics['known_entries'] = len(self._known)
+        lookups = metrics['lookups']
+        metrics['cache_hit_rate'] = (
+            (metrics['local_hits'] + metrics['shared_hits'] + metrics['shared_clean_hits']) / lookups
+            if lookups else None
+        )
+        return metrics
+
+    def clear(self):
+        with self._lock:
+            self._known.clear()
+            self.metrics.clear()
+
+
+_blacklist_cache = None
+
+
+def get_blacklist_cache():
+    global _blacklist_cache
+    if _blacklist_cache is None:
+        config = {**DEFAULTS, **getattr(settings, 'BLACKLIST_CACHE', {})}
+        _blacklist_cache = BlacklistCache(
+            max_entries=config['MAX_ENTRIES'],
+            cache_alias=config['CACHE_ALIAS'] if saves_queries(config['CACHE_ALIAS']) else None,
+            clean_timeout=config['CLEAN_TIMEOUT'],
+        )
+    return _blacklist_cache
+
+
+def blacklist_metrics():
+    """Per-process lookup counters and the fraction answered without the database."""
+    return get_blacklist_cache().snapshot()
+
+
+@receiver(setting_changed)
+def reset_blacklist_cache(setting, **kwargs):
+    global _blacklist_cache
+    if setting in ('BLACKLIST_CACHE', 'CACHES'):
+        _blacklist_cache = None
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def cache_blacklisted_token(sender, instance, created, **kwargs):
+    """Publish every revocation, whichever code path saved the row."""
+    if created:
+        get_blacklist_cache().add(instance.token.jti, instance.token.expires_at.timestamp())
+
+
+class RefreshToken(BaseRefreshToken):
+    """simplejwt's RefreshToken with the blacklist check served from BlacklistCache."""
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if get_blacklist_cache().is_blacklisted(jti, self.payload['exp']):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        exp = self.payload['exp']
+        # Same as simplejwt, without loading the user to fill in the FK
+        token, created = OutstandingToken.objects.get_or_create(
+            jti=jti,
+            defaults={
+                'user_id': self.payload.get(api_settings.USER_ID_CLAIM),
+                'created_at': self.current_time,
+                'token': str(self),
+                'expires_at': datetime_from_epoch(exp),
+            },
+        )
+        return BlacklistedToken.objects.get_or_create(token=token)
+
+
+def purge_expired_tokens(grace=0, batch_size=5000, dry_run=False):
+    """
+    Delete OutstandingToken rows (and their BlacklistedToken rows) that expired
+    more than `grace` seconds ago, `batch_size` rows per transaction.
+    Returns (outstanding, blacklisted) row counts.
+    """
+    cutoff = datetime_from_epoch(time.time() - grace)
+    expired = OutstandingToken.objects.filter(expires_at__lte=cutoff)
+    if dry_run:
+        return expired.count(), BlacklistedToken.objects.filter(token__expires_at__lte=cutoff).count()
+
+    outstanding = blacklisted = 0
+    while True:
+        ids = list(expired.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return outstanding, blacklisted
+        with transaction.atomic():
+            blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+            outstanding += OutstandingToken.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from Tokens.blacklist import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired OutstandingToken and BlacklistedToken rows (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=0,
+                            help='Keep tokens that expired less than this many seconds ago')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be deleted')
+
+    def handle(self, *args, **options):
+        outstanding, blacklisted = purge_expired_tokens(
+            grace=options['grace'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {outstanding} outstanding tokens ({blacklisted} blacklisted).'
+        ))
@@ -0,0 +1,18 @@
+# Tokens/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .usercache import invalidate_user
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop cached JWT user snapshots whenever the user row changes
+    (profile edits, is_active/is_admin changes, password changes, last_login)
+    """
+    invalidate_user(instance.pk)
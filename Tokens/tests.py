@@ -1,3 +1,121 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken as SimpleJWTRefreshToken
+
+from Account.session import session_payload
+from .blacklist import RefreshToken, blacklist_metrics, get_blacklist_cache, purge_expired_tokens
+from .authentication import JWTAuthFromCookie
+from .usercache import get_user_cache
+
+User = get_user_model()
+
+
+class CachedJWTUserTests(TestCase):
+    def setUp(self):
+        get_user_cache().clear()
+        self.user = User.objects.create_user(username='cached', password='secret', fname='A', lname='B')
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.user).access_token)
+        session_payload(self.user.pk) # so only authentication reads the user
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/accounts/users/me/')
+        self.assertEqual(response.status_code, 200)
+        table = User._meta.db_table
+        return [q for q in queries if f'FROM "{table}"' in q['sql'] and f'"{table}"."id" = ' in q['sql']]
+
+    def test_repeat_requests_skip_user_lookup(self):
+        self.assertEqual(len(self.user_queries()), 1)
+        self.assertEqual(self.user_queries(), [])
+
+    def test_cached_user_costs_no_query(self):
+        auth = JWTAuthFromCookie()
+        token = auth.get_validated_token(self.client.cookies['access_token'].value)
+        auth.get_user(token)
+        with self.assertNumQueries(0):
+            self.assertEqual(auth.get_user(token).pk, self.user.pk)
+
+    def test_database_cache_is_not_used(self):
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                                               'LOCATION': 'django_cache'}}):
+            self.assertIsNone(get_user_cache())
+
+    def test_save_invalidates_snapshot(self):
+        self.user_queries()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/accounts/users/me/')
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_snapshot_loaded_before_an_invalidation_is_not_stored(self):
+        cache = get_user_cache()
+        version = cache.version(self.user.pk)
+        stale = User.objects.get(pk=self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        cache.invalidate(self.user.pk) # as Tokens.signals would, in another worker
+
+        cache.set(stale, 'jti', timezone.now().timestamp() + 60, version)
+        self.assertIsNone(cache.get(self.user.pk, 'jti'))
+
+    def test_process_local_cache_is_not_used(self):
+        with self.settings(
+            CACHE_SINGLE_PROCESS=False,
+            JWT_USER_CACHE={'CACHE_ALIAS': 'default'},
+        ):
+            self.assertIsNone(get_user_cache())
+
+
+class BlacklistCacheTests(TestCase):
+    def setUp(self):
+        get_blacklist_cache().clear()
+        self.user = User.objects.create_user(username='rotating', password='secret', fname='A', lname='B')
+
+    def test_blacklisted_token_is_rejected_without_query(self):
+        token = RefreshToken.for_user(self.user)
+        token.blacklist()
+        with self.assertNumQueries(0):
+            with self.assertRaises(TokenError):
+                RefreshToken(str(token))
+
+    def test_valid_token_is_checked_once(self):
+        token = str(RefreshToken.for_user(self.user))
+        RefreshToken(token)
+        with self.assertNumQueries(0):
+            RefreshToken(token)
+        self.assertEqual(blacklist_metrics()['shared_clean_hits'], 1)
+
+    def test_token_blacklisted_elsewhere_replaces_the_clean_answer(self):
+        token = str(RefreshToken.for_user(self.user))
+        RefreshToken(token) # caches "not blacklisted"
+        SimpleJWTRefreshToken(token).blacklist()
+        get_blacklist_cache().clear() # as seen from another worker
+        with self.assertNumQueries(0):
+            with self.assertRaises(TokenError):
+                RefreshToken(token)
+        self.assertEqual(blacklist_metrics()['shared_hits'], 1)
+
+    def test_refresh_rotates_and_blacklists_old_token(self):
+        token = str(RefreshToken.for_user(self.user))
+        client = APIClient()
+        client.cookies['refresh_token'] = token
+        self.assertEqual(client.post('/accounts/refresh-token/').status_code, 200)
+        client.cookies['refresh_token'] = token
+        self.assertEqual(client.post('/accounts/refresh-token/').status_code, 401)
+        self.assertEqual(blacklist_metrics()['local_hits'], 1)
 
-# Create your tests here.
+    def test_purge_removes_expired_rows(self):
+        token = RefreshToken.for_user(self.user)
+        token.blacklist()
+        OutstandingToken.objects.update(expires_at=timezone.now() - timedelta(days=1))
+        RefreshToken.for_user(self.user)
+        self.assertEqual(purge_expired_tokens(batch_size=1), (1, 1))
+        self.assertEqual(OutstandingToken.objects.count(), 1)
@@ -1,8 +1,9 @@
 from django.urls import path
 from .views import csrf_token_view
-from .views import TestConnection
+from .views import TestConnection, BlacklistMetricsView
 
 urlpatterns = [
     path("test-connection/", TestConnection.as_view(), name="test_connection"),
     path("csrftoken/", csrf_token_view, name="csrftoken"),
+    path("blacklist-metrics/", BlacklistMetricsView.as_view(), name="blacklist_metrics"),
 ]
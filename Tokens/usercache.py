@@ -0,0 +1,205 @@
+"""
+Cache of authenticated users for JWTAuthFromCookie.
+
+Resolving the user behind an access token is a SELECT on Account.User for
+every API request.  UserSnapshotCache keeps the user's column values keyed
+by (user_id, token jti) so repeat requests with the same access token build
+the user without touching the database:
+
+  * a shared Django cache (CACHE_ALIAS) holding the entries and a version
+    per user, so every worker sees the same invalidations;
+  * a per-process LRU in front of it, bounded by MAX_ENTRIES, whose entries
+    only count while their version is still the shared one.
+
+Snapshots carry is_active and the staff flags, so the cache switches itself
+off (get_user_cache() returns None) when CACHE_ALIAS is not shared between
+processes: an invalidation would only reach the worker that made it.  It
+is off on the DatabaseCache too, where reading the version key costs the
+query on Account.User it is meant to save (Database.caches.saves_queries).
+
+An entry never outlives its token's `exp` claim nor TIMEOUT seconds, so the
+15 minute ACCESS_TOKEN_LIFETIME bounds how long a snapshot can live.
+invalidate(user_id) drops every snapshot of a user; Tokens.signals calls it
+when a User is saved or deleted and LogoutView calls it on logout.  Callers
+read version() before loading the user and hand it to set(), so a snapshot
+loaded before an invalidation is never stored under the new version.
+
+    JWT_USER_CACHE = {
+        'ENABLED': True,
+        'MAX_ENTRIES': 2048,
+        'TIMEOUT': 900,
+        'CACHE_ALIAS': 'default',
+    }
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db.models.fields.files import FieldFile
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from Database.caches import saves_queries
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 2048,
+    'TIMEOUT': int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()),
+    'CACHE_ALIAS': 'default',
+}
+
+
+def user_snapshot(user):
+    """Column values of `user`, as accepted by Model.from_db()."""
+    values = {}
+    for field in user._meta.concrete_fields:
+        value = getattr(user, field.attname)
+        values[field.attname] = value.name if isinstance(value, FieldFile) else value
+    return values
+
+
+class UserSnapshotCache:
+    """Per-process LRU of user snapshots in front of a shared cache."""
+
+    key_prefix = 'jwt-user'
+
+    def __init__(self, cache_alias, max_entries=DEFAULTS['MAX_ENTRIES'], timeout=DEFAULTS['TIMEOUT']):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.shared = caches[cache_alias]
+        self._entries = OrderedDict() # (user_id, jti) -> (version, expires_at, snapshot)
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    # Shared cache keys; the version changes on every invalidation so stale
+    # entries in other workers stop matching without having to find them.
+    def _version_key(self, user_id):
+        return f'{self.key_prefix}:v:{user_id}'
+
+    def _entry_key(self, user_id, version, jti):
+        return f'{self.key_prefix}:{user_id}:{version}:{jti}'
+
+    def version(self, user_id):
+        """The current version of `user_id`'s snapshots."""
+        key = self._version_key(user_id)
+        version = self.shared.get(key)
+        if version is None:
+            # A fresh version when the key was evicted too, so old entries can't match again
+            self.shared.add(key, uuid.uuid4().hex, timeout=self.timeout)
+            version = self.shared.get(key)
+        return version
+
+    def _build(self, snapshot):
+        User = get_user_model()
+        return User.from_db(None, list(snapshot), list(snapshot.values()))
+
+    def get(self, user_id, jti, version=None):
+        """A fresh User instance for (user_id, jti), or None on a miss."""
+        if user_id is None or jti is None:
+            return None
+        now = time.time()
+        if version is None:
+            version = self.version(user_id)
+
+        with self._lock:
+            entry = self._entries.get((user_id, jti))
+            if entry is not None:
+                if entry[0] == version and entry[1] > now:
+                    self._entries.move_to_end((user_id, jti))
+                    return self._build(entry[2])
+                self._discard((user_id, jti))
+
+        cached = self.shared.get(self._entry_key(user_id, version, jti))
+        if cached is None:
+            return None
+        expires_at, snapshot = cached
+        if expires_at <= now:
+            return None
+        self._remember(user_id, jti, version, expires_at, snapshot)
+        return self._build(snapshot)
+
+    def set(self, user, jti, expires_at, version):
+        """
+        Remember `user` for token `jti` until min(expires_at, now + timeout).
+        `version` is the one read before `user` was loaded; nothing is stored
+        if the user has been invalidated since.
+        """
+        if jti is None:
+            return
+        now = time.time()
+        expires_at = min(expires_at, now + self.timeout)
+        if expires_at <= now or self.version(user.pk) != version:
+            return
+        snapshot = user_snapshot(user)
+        self._remember(user.pk, jti, version, expires_at, snapshot)
+        self.shared.set(
+            self._entry_key(user.pk, version, jti), (expires_at, snapshot),
+            timeout=max(1, int(expires_at - now)),
+        )
+
+    def invalidate(self, user_id):
+        """Drop every cached snapshot of `user_id`, in this process and in the shared cache."""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._discard(key)
+        self.shared.set(self._version_key(user_id), uuid.uuid4().hex, timeout=self.timeout)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remember(self, user_id, jti, version, expires_at, snapshot):
+        with self._lock:
+            self._entries[(user_id, jti)] = (version, expires_at, snapshot)
+            self._entries.move_to_end((user_id, jti))
+            self._keys_by_user.setdefault(user_id, set()).add((user_id, jti))
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+
+_user_cache = None
+
+
+def get_user_cache():
+    """
+    The process-wide UserSnapshotCache, or None when JWT_USER_CACHE['ENABLED']
+    is off or its CACHE_ALIAS is process-local or the database.
+    """
+    global _user_cache
+    config = {**DEFAULTS, **getattr(settings, 'JWT_USER_CACHE', {})}
+    if not config['ENABLED'] or not saves_queries(config['CACHE_ALIAS']):
+        return None
+    if _user_cache is None:
+        _user_cache = UserSnapshotCache(
+            config['CACHE_ALIAS'],
+            max_entries=config['MAX_ENTRIES'],
+            timeout=config['TIMEOUT'],
+        )
+    return _user_cache
+
+
+def invalidate_user(user_id):
+    cache = get_user_cache()
+    if cache is not None:
+        cache.invalidate(user_id)
+
+
+@receiver(setting_changed)
+def reset_user_cache(setting, **kwargs):
+    global _user_cache
+    if setting in ('JWT_USER_CACHE', 'CACHES'):
+        _user_cache = None
@@ -9,6 +9,8 @@ from django.views.decorators.http import require_GET
 from django.http import JsonResponse
 from django.middleware.csrf import get_token
 
+from .blacklist import blacklist_metrics
+
 # Create your views here.
 @require_GET
 def csrf_token_view(request):
@@ -31,4 +33,13 @@ class TestConnection(APIView):
     authentication_classes = []
     def get(self, request):
         return Response({'connected': True})
-    
\ No newline at end of file
+    
+
+class BlacklistMetricsView(APIView):
+    """Hit rate of the refresh-token blacklist cache in this worker (admins only)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.user.is_admin:
+            return Response({'detail': 'Only admins can view blacklist metrics.'}, status=403)
+        return Response(blacklist_metrics())
@@ -9,3 +9,14 @@ python manage.py collectstatic --no-input
 
 # Apply database migrations
 python manage.py migrate
+
+# Build the search documents (Data/search.py) once; run_jobs indexes later changes
+python manage.py rebuild_search_index --if-empty
+
+# Fallback cache table; set CACHE_URL=redis://... for the response, session and
+# JWT user caches, which stay off on it (Database/caches.py)
+python manage.py createcachetable
+
+# Processes to run afterwards (Procfile):
+#   web:    gunicorn Database.wsgi
+#   worker: python manage.py run_jobs   (background jobs, Jobs/queue.py)
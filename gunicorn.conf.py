@@ -0,0 +1,30 @@
+"""
+Gunicorn settings, picked up from the working directory:
+
+    gunicorn Database.wsgi
+    gunicorn Database.asgi:application -k uvicorn.workers.UvicornWorker
+
+The Procfile runs it as `web`, next to the `worker` process that runs the
+background jobs (`manage.py run_jobs`, Jobs/queue.py); without a worker,
+rollups and the leaderboard are never refreshed.
+
+Each worker keeps its own database connections (Database/connections.py):
+one per thread, request threads and ASYNC_QUERY_THREADS alike, with
+persistent connections, or a pool of up to GUNICORN_THREADS +
+ASYNC_QUERY_THREADS connections with DB_POOL=1.  Size WEB_CONCURRENCY x
+(GUNICORN_THREADS + ASYNC_QUERY_THREADS) to the database's max_connections.
+"""
+import os
+
+# gunicorn's own defaults, spelled out since the connection count follows from them
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+
+
+def post_fork(server, worker):
+    # Only a --preload master has loaded Django, and may have connected while doing so
+    if not server.cfg.preload_app:
+        return
+    from Database.connections import close_inherited_connections
+
+    close_inherited_connections()